@@ -5,6 +5,7 @@ from .models import (
     CourseSchedule,
     CourseContent,
     CourseAssessmentComponent,
+    CourseGrade,
     Enrollment,
     CourseAttendance
 )
@@ -54,6 +55,13 @@ class CourseAssessmentComponentAdmin(admin.ModelAdmin):
     course_display.short_description = "Course"
 
 
+@admin.register(CourseGrade)
+class CourseGradeAdmin(admin.ModelAdmin):
+    list_display = ("enrollment", "component", "score")
+    list_filter = ("component__type",)
+    search_fields = ("enrollment__student__user__username", "enrollment__offering__course__code")
+    raw_id_fields = ("enrollment", "component")
+
 
 
 @admin.register(Enrollment)
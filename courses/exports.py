@@ -0,0 +1,131 @@
+# courses/exports.py
+"""
+Akış halinde CSV / XLSX dışa aktarım.
+
+Satırlar üreteçlerden gelir; kaynak sorgular .iterator(chunk_size=...) ile
+sunucu tarafında parça parça okunur, bu sayede bellek kullanımı kohort
+büyüklüğünden bağımsızdır. CSV doğrudan StreamingHttpResponse ile yazılır;
+XLSX, openpyxl'in write-only modunda geçici dosyaya yazılıp parça parça
+gönderilir (zip biçimi sonradan yazılan bir dizin tablosu gerektirir).
+"""
+import csv
+import tempfile
+from itertools import groupby
+
+from django.http import FileResponse, HttpResponseBadRequest, StreamingHttpResponse
+
+from courses.models import CourseAssessmentComponent, CourseGrade, Enrollment
+
+try:
+    import openpyxl
+except ImportError:  # openpyxl opsiyonel; yoksa sadece CSV üretilir
+    openpyxl = None
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = ("csv", "xlsx")
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class _Echo:
+    """csv.writer için yazılanı geri döndüren sahte dosya"""
+
+    def write(self, value):
+        return value
+
+
+def full_name(first_name, last_name, username):
+    """SimpleUser.get_full_name'in values_list karşılığı"""
+    return f"{first_name} {last_name}".strip() or username
+
+
+def csv_response(filename, header, rows):
+    writer = csv.writer(_Echo())
+
+    def stream():
+        # Excel'in Türkçe karakterleri doğru açması için BOM
+        yield "\ufeff" + writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(filename, header, rows):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(list(header))
+    for row in rows:
+        sheet.append(list(row))
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=f"{filename}.xlsx", content_type=XLSX_CONTENT_TYPE)
+
+
+def export_response(fmt, filename, header, rows):
+    """fmt: "csv" ya da "xlsx"; geçersiz / kullanılamayan biçimde 400 döner"""
+    if fmt == "csv":
+        return csv_response(filename, header, rows)
+    if fmt == "xlsx" and openpyxl is not None:
+        return xlsx_response(filename, header, rows)
+    return HttpResponseBadRequest("Desteklenmeyen dışa aktarım biçimi.")
+
+
+# ------------------------------------------------------------
+# Şube not tablosu (kayıt × bileşen)
+# ------------------------------------------------------------
+def grade_grid_export(offering):
+    """(header, rows) — rows kayıt sırasında akan bir üreteçtir."""
+    components = list(
+        CourseAssessmentComponent.objects.filter(offering=offering).order_by("type", "id")
+    )
+    header = (
+        ["student_no", "ad_soyad"]
+        + [comp.get_type_display() for comp in components]
+        + ["ağırlıklı_toplam", "tamamlanma"]
+    )
+    return header, _grade_grid_rows(offering, [comp.id for comp in components])
+
+
+def _grade_grid_rows(offering, component_ids):
+    enrollments = (
+        Enrollment.objects
+        .filter(offering=offering)
+        .exclude(status=Enrollment.Status.DROPPED)
+        .order_by("id")
+        .values_list(
+            "id", "student__student_no",
+            "student__user__first_name", "student__user__last_name", "student__user__username",
+            "weighted_total", "completeness",
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    grades = groupby(
+        CourseGrade.objects
+        .filter(enrollment__offering=offering)
+        .order_by("enrollment_id", "id")
+        .values_list("enrollment_id", "component_id", "score")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE),
+        key=lambda row: row[0],
+    )
+
+    # İki sıralı akış enrollment_id üzerinden birleştirilir (merge join)
+    current_id, current_rows = next(grades, (None, ()))
+    for enrollment_id, student_no, first, last, username, weighted_total, completeness in enrollments:
+        while current_id is not None and current_id < enrollment_id:
+            current_id, current_rows = next(grades, (None, ()))
+
+        scores = {}
+        if current_id == enrollment_id:
+            scores = {component_id: score for _, component_id, score in current_rows}
+
+        yield (
+            [student_no, full_name(first, last, username)]
+            + [scores.get(component_id) for component_id in component_ids]
+            + [weighted_total, completeness]
+        )
@@ -0,0 +1,205 @@
+# courses/grade_import.py
+"""
+CSV / XLSX dosyasından toplu not aktarımı.
+
+Dosya satırları (student_no, component, score) akış halinde okunur; bileşen,
+şubenin CourseAssessmentComponent kümesine göre tip kodu ("MIDTERM"),
+görünen adı ("Vize") ya da id ile eşlenir. Önce tüm dosya doğrulanır,
+hata yoksa satırlar IMPORT_CHUNK_SIZE'lık gruplar halinde save_grade_grid
+ile (grup başına bir transaction) yazılır. Bellekte sadece bir grup ve
+değişen hücre anahtarları tutulur. Outcome yeniden hesaplaması için değişen
+hücreler en sonda tek seferde kuyruğa verilir.
+"""
+import csv
+import io
+from pathlib import Path
+
+from courses.models import CourseAssessmentComponent
+from courses.services import (
+    InvalidScoreError, diff_grade_grid, gradeable_enrollments, parse_score, save_grade_grid,
+)
+from outcomes.services import record_grade_changes
+
+try:
+    import openpyxl
+except ImportError:  # openpyxl opsiyonel; yoksa sadece CSV okunur
+    openpyxl = None
+
+IMPORT_CHUNK_SIZE = 1000
+
+# Raporda satır satır gösterilen en fazla hata / değişiklik sayısı (toplamlar ayrıca verilir)
+IMPORT_REPORT_LIMIT = 50
+
+IMPORT_FORMATS = ("csv", "xlsx")
+
+HEADER = ("student_no", "component", "score")
+
+
+class GradeImportError(Exception):
+    """Dosya okunamadığında (biçim, eksik kütüphane) fırlatılır."""
+
+
+def detect_format(filename):
+    suffix = Path(filename or "").suffix.lower().lstrip(".")
+    if suffix not in IMPORT_FORMATS:
+        raise GradeImportError(f"Desteklenmeyen dosya türü: {filename} (csv ya da xlsx olmalı)")
+    return suffix
+
+
+def _cell(value):
+    """XLSX sayısal hücrelerini (123.0) metne çevirir."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def iter_rows(file, fmt):
+    """(satır_no, [hücreler]) üretir; başlık satırı ve boş satırlar atlanır."""
+    if fmt == "xlsx":
+        if openpyxl is None:
+            raise GradeImportError("XLSX okumak için openpyxl kurulu olmalı.")
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from _numbered(workbook.active.iter_rows(values_only=True))
+        finally:
+            workbook.close()
+        return
+
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        yield from _numbered(csv.reader(text))
+    except UnicodeDecodeError:
+        raise GradeImportError("CSV dosyası UTF-8 olarak okunamadı.")
+    finally:
+        # Wrapper kapanırken alttaki dosyayı kapatmasın (ikinci geçişte başa sarılır)
+        text.detach()
+
+
+def _numbered(rows):
+    for line_no, row in enumerate(rows, start=1):
+        values = [_cell(v) for v in row]
+        if not any(values):
+            continue
+        if line_no == 1 and values[0].lower() == HEADER[0]:
+            continue
+        yield line_no, values
+
+
+class GradeRowValidator:
+    """Satırları şubenin kayıt ve bileşenlerine göre (enrollment_id, component_id, score) yapar."""
+
+    def __init__(self, offering):
+        self.students = dict(
+            gradeable_enrollments(offering)
+            .values_list("student__student_no", "id")
+        )
+        self.components = {}
+        self.labels = {}
+        for comp in CourseAssessmentComponent.objects.filter(offering=offering).order_by("-id"):
+            # Aynı tipte birden fazla bileşen varsa tip adı en küçük id'liye eşlenir
+            for key in (comp.type.lower(), comp.get_type_display().lower(), str(comp.id)):
+                self.components[key] = comp.id
+            self.labels[comp.id] = comp.get_type_display()
+        self.student_nos = {enr_id: no for no, enr_id in self.students.items()}
+
+    def describe(self, cell):
+        """(enrollment_id, component_id) → (student_no, bileşen adı) — rapor için"""
+        enrollment_id, component_id = cell
+        return self.student_nos[enrollment_id], self.labels[component_id]
+
+    def validate(self, values):
+        """(cell, score) ya da (None, hata mesajı)"""
+        if len(values) < 3:
+            return None, "Eksik sütun (student_no, component, score olmalı)"
+
+        student_no, component, raw_score = values[:3]
+        enrollment_id = self.students.get(student_no)
+        if enrollment_id is None:
+            return None, f"Öğrenci bu şubede kayıtlı değil: {student_no}"
+
+        component_id = self.components.get(component.lower())
+        if component_id is None:
+            return None, f"Bileşen bu şubede tanımlı değil: {component}"
+
+        # Sonluluk ve 0-100 aralığı parse_score'da denetlenir (NaN / inf satırı hata olarak raporlanır)
+        try:
+            score = parse_score(raw_score)
+        except InvalidScoreError as exc:
+            return None, str(exc)
+        if score is None:
+            return None, f"Geçersiz puan: {raw_score}"
+
+        return (enrollment_id, component_id), score
+
+
+def _chunks(cells, size):
+    chunk = {}
+    for cell, score in cells:
+        chunk[cell] = score
+        if len(chunk) >= size:
+            yield chunk
+            chunk = {}
+    if chunk:
+        yield chunk
+
+
+def import_grades(offering, file, fmt, dry_run=False, skip_invalid=False, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    file: ikili modda açılmış, başa sarılabilir dosya nesnesi.
+    Geçersiz satır varsa (skip_invalid değilse) hiçbir şey yazılmaz.
+    dry_run'da farklar hesaplanır ama yazılmaz.
+    Dönen: {"rows", "valid", "created", "updated", "unchanged", "errors", "error_count",
+            "changes", "written"}
+      errors:  [(satır_no, mesaj)]
+      changes: [(student_no, bileşen, eski puan, yeni puan)] — eski puan yeni hücrede None
+    """
+    validator = GradeRowValidator(offering)
+    report = {
+        "rows": 0, "valid": 0, "created": 0, "updated": 0, "unchanged": 0,
+        "errors": [], "error_count": 0, "changes": [], "written": False,
+    }
+
+    # 1) Doğrulama geçişi: dosya akış halinde okunur, sadece hatalar tutulur
+    for line_no, values in iter_rows(file, fmt):
+        report["rows"] += 1
+        cell, result = validator.validate(values)
+        if cell is None:
+            report["error_count"] += 1
+            if len(report["errors"]) < IMPORT_REPORT_LIMIT:
+                report["errors"].append((line_no, result))
+        else:
+            report["valid"] += 1
+
+    if report["error_count"] and not skip_invalid:
+        return report
+
+    # 2) Yazma geçişi: geçerli satırlar gruplar halinde karşılaştırılıp yazılır
+    file.seek(0)
+    valid_cells = (
+        validated
+        for validated in (validator.validate(values) for _, values in iter_rows(file, fmt))
+        if validated[0] is not None
+    )
+    changed = []
+    for chunk in _chunks(valid_cells, chunk_size):
+        if dry_run:
+            diff = diff_grade_grid(offering, chunk)
+        else:
+            diff = save_grade_grid(offering, chunk)
+            changed.extend((g.enrollment_id, g.component_id) for g in diff["create"] + diff["update"])
+        report["created"] += len(diff["create"])
+        report["updated"] += len(diff["update"])
+        report["unchanged"] += len(diff["unchanged"])
+
+        for grade in diff["create"] + diff["update"]:
+            if len(report["changes"]) >= IMPORT_REPORT_LIMIT:
+                break
+            cell = (grade.enrollment_id, grade.component_id)
+            report["changes"].append((*validator.describe(cell), diff["previous"].get(cell), grade.score))
+
+    if changed:
+        record_grade_changes(changed)
+    report["written"] = not dry_run
+    return report
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.grade_import import IMPORT_CHUNK_SIZE, IMPORT_FORMATS, GradeImportError, detect_format, import_grades
+from courses.models import CourseOffering
+
+
+class Command(BaseCommand):
+    help = (
+        "CSV / XLSX dosyasındaki (student_no, component, score) satırlarını "
+        "şubenin not tablosuna toplu olarak aktarır."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV ya da XLSX dosyası")
+        parser.add_argument("--offering", type=int, required=True, help="Şube (CourseOffering) id")
+        parser.add_argument("--format", choices=IMPORT_FORMATS, help="Dosya uzantısından farklıysa")
+        parser.add_argument("--dry-run", action="store_true", help="Sadece fark raporu, yazma yapılmaz")
+        parser.add_argument("--skip-invalid", action="store_true", help="Geçersiz satırları atlayıp devam et")
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        offering = CourseOffering.objects.filter(pk=options["offering"]).select_related("course").first()
+        if offering is None:
+            raise CommandError(f"Şube bulunamadı: {options['offering']}")
+
+        try:
+            fmt = options["format"] or detect_format(options["path"])
+            with open(options["path"], "rb") as file:
+                report = import_grades(
+                    offering, file, fmt,
+                    dry_run=options["dry_run"],
+                    skip_invalid=options["skip_invalid"],
+                    chunk_size=options["chunk_size"],
+                )
+        except (OSError, GradeImportError) as exc:
+            raise CommandError(str(exc))
+
+        for line_no, message in report["errors"]:
+            self.stdout.write(self.style.WARNING(f"Satır {line_no}: {message}"))
+        if report["error_count"] > len(report["errors"]):
+            self.stdout.write(f"... toplam {report['error_count']} hatalı satır")
+
+        for student_no, component, old, new in report["changes"]:
+            self.stdout.write(f"{student_no} {component}: {'-' if old is None else old} → {new}")
+
+        self.stdout.write(
+            f"{offering.course.code}: {report['rows']} satır, {report['valid']} geçerli — "
+            f"{report['created']} yeni, {report['updated']} güncellenen, {report['unchanged']} aynı"
+        )
+
+        if report["error_count"] and not options["skip_invalid"]:
+            raise CommandError("❌ Hatalı satırlar var, hiçbir not yazılmadı (--skip-invalid ile atlanabilir).")
+        if report["written"]:
+            self.stdout.write(self.style.SUCCESS("✅ Notlar aktarıldı."))
+        else:
+            self.stdout.write("Deneme çalıştırması: değişiklik yazılmadı.")
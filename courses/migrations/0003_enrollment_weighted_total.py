@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:07
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_weighted_totals(apps, schema_editor):
+    """Mevcut kayıtların weighted_total / completeness değerleri CourseGrade'den doldurulur."""
+    CourseGrade = apps.get_model("courses", "CourseGrade")
+    CourseAssessmentComponent = apps.get_model("courses", "CourseAssessmentComponent")
+    Enrollment = apps.get_model("courses", "Enrollment")
+
+    offering_weights = dict(
+        CourseAssessmentComponent.objects
+        .values("offering_id")
+        .annotate(total=Sum("weight"))
+        .order_by()
+        .values_list("offering_id", "total")
+    )
+
+    cells = {}
+    rows = (
+        CourseGrade.objects
+        .filter(score__isnull=False)
+        .order_by("id")
+        .values_list("enrollment_id", "enrollment__offering_id", "component_id", "score", "component__weight")
+    )
+    for enrollment_id, offering_id, component_id, score, weight in rows:
+        cells.setdefault((enrollment_id, offering_id), {})[component_id] = (score, weight)
+
+    quantum = Decimal("0.01")
+    updates = []
+    for (enrollment_id, offering_id), components in cells.items():
+        total = sum(score * weight for score, weight in components.values()) / 100
+        weight = sum(weight for _, weight in components.values())
+        offering_weight = offering_weights.get(offering_id)
+        completeness = min(Decimal(weight * 100) / offering_weight, Decimal(100)) if offering_weight else Decimal(0)
+        updates.append(Enrollment(
+            id=enrollment_id,
+            weighted_total=total.quantize(quantum),
+            completeness=completeness.quantize(quantum),
+        ))
+
+    Enrollment.objects.bulk_update(updates, ["weighted_total", "completeness"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_initial'),
+        ('students', '0001_initial'),
+        # Doldurma GradeComponent'ten taşınan notları da görmeli
+        ('grades', '0003_move_component_scores_to_coursegrade'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completeness',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Tamamlanma (%)'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='weighted_total',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Ağırlıklı Toplam'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['offering', 'weighted_total'], name='enrollment_offering_total_idx'),
+        ),
+        migrations.RunPython(fill_weighted_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_enrollment_weighted_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursegrade',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Sık kullanılan filtreler için bileşik indeksler.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_coursegrade_updated_at'),
+        ('outcomes', '0007_program_outcome_attainment'),
+        ('students', '0001_initial'),
+        ('teachers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='componentlearningrelation',
+            index=models.Index(fields=['component', 'learning_outcome'], name='component_lo_relation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courseoffering',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['course'], name='offering_course_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['student', 'status'], name='enrollment_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['offering', 'status'], name='enrollment_offering_status_idx'),
+        ),
+    ]
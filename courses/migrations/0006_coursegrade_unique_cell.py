@@ -0,0 +1,40 @@
+# CourseGrade (kayıt, bileşen) hücresi tekil hale getirilir.
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicate_cells(apps, schema_editor):
+    """
+    Aynı hücrede birden fazla satır varsa en son yazılan (en büyük id) korunur;
+    servisler de bugüne kadar bu satırı geçerli sayıyordu.
+    """
+    CourseGrade = apps.get_model("courses", "CourseGrade")
+
+    duplicates = (
+        CourseGrade.objects
+        .values("enrollment_id", "component_id")
+        .annotate(n=Count("id"), keep=Max("id"))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    for cell in duplicates:
+        CourseGrade.objects.filter(
+            enrollment_id=cell["enrollment_id"],
+            component_id=cell["component_id"],
+        ).exclude(id=cell["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_cells, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='coursegrade',
+            constraint=models.UniqueConstraint(fields=('enrollment', 'component'), name='unique_course_grade_cell'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:40
+
+from django.db import migrations, models
+from django.db.models import Min, OuterRef, Subquery
+
+
+def fill_cube_built_at(apps, schema_editor):
+    """Küp satırı olan şubelerin yazılma zamanı mevcut satırlardan doldurulur."""
+    CourseOffering = apps.get_model("courses", "CourseOffering")
+    ProgramOutcomeAttainment = apps.get_model("outcomes", "ProgramOutcomeAttainment")
+
+    CourseOffering.objects.filter(po_attainment__isnull=False).update(
+        outcome_cube_built_at=Subquery(
+            ProgramOutcomeAttainment.objects
+            .filter(offering=OuterRef("pk"))
+            .values("offering")
+            .annotate(built=Min("updated_at"))
+            .values("built")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_coursegrade_unique_cell'),
+        ('outcomes', '0007_program_outcome_attainment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courseoffering',
+            name='grades_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='courseoffering',
+            name='outcome_cube_built_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_cube_built_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_offering_change_stamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='grade_stats_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='courseoffering',
+            name='grade_stats_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -58,6 +58,9 @@ class Course(models.Model):
         related_name="created_courses"
     )
 
+    # Ders bazında not istatistikleri önbellek anahtarının sürümü (grades.statistics)
+    grade_stats_version = models.PositiveIntegerField(default=0, editable=False)
+
     def __str__(self):
         return f"{self.code} - {self.name} ({self.get_course_type_display()})"
 
@@ -76,6 +79,14 @@ class CourseGrade(models.Model):
     )
     component = models.ForeignKey("courses.CourseAssessmentComponent", on_delete=models.CASCADE)
     score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    # Saklanan PO skorlarının güncelliği buna göre kontrol edilir (bulk_update'te elle verilir)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Bir kaydın her bileşen için tek notu olur; (kayıt, bileşen) aramaları bu indeksi kullanır
+            models.UniqueConstraint(fields=["enrollment", "component"], name="unique_course_grade_cell"),
+        ]
 
     def __str__(self):
         return f"{self.enrollment.student} - {self.component.type} - {self.score}"
@@ -112,6 +123,20 @@ class CourseOffering(models.Model):
     )
     location = models.CharField(max_length=200, blank=True)
 
+    # Şubedeki not silme / kayıt değişikliklerinin son zamanı (outcomes sinyalleriyle yazılır)
+    grades_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # PO başarı küpünün (outcomes.cube) bu şube için son yazıldığı zaman; hiç hücre çıkmasa da yazılır
+    outcome_cube_built_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Şube not istatistikleri önbellek anahtarının sürümü; not değişince artırılır (grades.statistics)
+    grade_stats_version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Dersin aktif şubeleri; is_active=True filtresi SQL'de yalın sütun olarak
+            # yazıldığı için (course, is_active) yerine kısmi indeks kullanılır
+            models.Index(fields=["course"], condition=models.Q(is_active=True), name="offering_course_active_idx"),
+        ]
+
     def __str__(self):
         return f"{self.course.code}-{self.section or '1'} ({self.semester} {self.year})"
 
@@ -246,8 +271,24 @@ class Enrollment(models.Model):
     )
     enrolled_at = models.DateTimeField(auto_now_add=True)
 
+    # CourseGrade'den türetilir (grades.services.recalculate_enrollment_grades):
+    # girilmiş bileşenlerin Σ puan × ağırlık / 100 toplamı ve notu girilmiş ağırlık yüzdesi
+    weighted_total = models.DecimalField(
+        max_digits=5, decimal_places=2, null=True, blank=True, verbose_name="Ağırlıklı Toplam"
+    )
+    completeness = models.DecimalField(
+        max_digits=5, decimal_places=2, default=0, verbose_name="Tamamlanma (%)"
+    )
+
     class Meta:
         unique_together = ("student", "offering")
+        indexes = [
+            # Şube içi sıralama, risk filtresi ve histogram sorguları
+            models.Index(fields=["offering", "weighted_total"], name="enrollment_offering_total_idx"),
+            # Öğrencinin aktif kayıtları (PO motoru, transkript) ve şubenin aktif kayıtları
+            models.Index(fields=["student", "status"], name="enrollment_student_status_idx"),
+            models.Index(fields=["offering", "status"], name="enrollment_offering_status_idx"),
+        ]
 
     def clean(self):
         if (
@@ -300,6 +341,12 @@ class ComponentLearningRelation(models.Model):
     )
     weight = models.FloatField(default=0, verbose_name="Etki Oranı (%)")
 
+    class Meta:
+        indexes = [
+            # Graf yüklemesi bileşenden LO'ya gider
+            models.Index(fields=["component", "learning_outcome"], name="component_lo_relation_idx"),
+        ]
+
     def __str__(self):
         return f"{self.component} → {self.learning_outcome} (%{self.weight})"
 
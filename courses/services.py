@@ -0,0 +1,286 @@
+# courses/services.py
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import Floor, Rank
+from django.utils import timezone
+
+from courses.models import CourseGrade, Enrollment
+from grades.services import recalculate_enrollment_grades
+
+# Bulk yazma işlemlerinde tek INSERT/UPDATE'e giren satır sayısı
+GRADE_BATCH_SIZE = 500
+
+SCORE_QUANTUM = Decimal("0.01")
+
+# Notu girilebilen / değiştirilebilen kayıt durumları (grid, form ve dosya aktarımı);
+# tamamlanmış (kapanmış) kaydın notu değiştirilemez
+GRADEABLE_STATUSES = [Enrollment.Status.ENROLLED]
+
+# Kabul edilen puan aralığı (CourseGrade.score)
+SCORE_MIN = Decimal(0)
+SCORE_MAX = Decimal(100)
+
+# Girilmiş notların ağırlıklı ortalaması bu değerin altındaysa öğrenci risk altında
+AT_RISK_THRESHOLD = 50
+
+
+class InvalidScoreError(ValueError):
+    """Sayı olmayan, sonlu olmayan (NaN / Infinity) ya da 0-100 dışındaki puan."""
+
+
+def parse_score(value):
+    """
+    Formdan / dosyadan gelen not değerini CourseGrade.score hassasiyetine çevirir.
+    Boş değer için None döner; geçersiz değerde InvalidScoreError fırlatır.
+    """
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        score = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise InvalidScoreError(f"Geçersiz puan: {value}")
+    # Decimal "NaN" / "Infinity" metnini hatasız okur; karşılaştırmadan önce elenir
+    if not score.is_finite() or not SCORE_MIN <= score <= SCORE_MAX:
+        raise InvalidScoreError(f"Puan {SCORE_MIN}-{SCORE_MAX} arasında olmalı: {value}")
+    return score.quantize(SCORE_QUANTUM)
+
+
+def diff_grade_grid(offering, cells):
+    """
+    Not tablosunu veritabanındaki mevcut satırlarla karşılaştırır.
+    cells: {(enrollment_id, component_id): Decimal}
+    Dönen: {"create": [CourseGrade], "update": [CourseGrade], "unchanged": [(enr_id, comp_id)],
+            "previous": {(enr_id, comp_id): güncellenen hücrenin eski puanı}}
+    Sadece cells içindeki kayıtların satırları okunur (toplu aktarımda grup grup çağrılır).
+    """
+    existing = {}
+    grades = CourseGrade.objects.filter(
+        enrollment__offering=offering,
+        enrollment_id__in={enr_id for enr_id, _ in cells},
+    )
+    for grade in grades.order_by("id"):
+        # (kayıt, bileşen) tekil: unique_course_grade_cell
+        existing[(grade.enrollment_id, grade.component_id)] = grade
+
+    to_create, to_update, unchanged = [], [], []
+    previous = {}
+
+    for (enr_id, comp_id), score in cells.items():
+        grade = existing.get((enr_id, comp_id))
+
+        if grade is None:
+            to_create.append(CourseGrade(enrollment_id=enr_id, component_id=comp_id, score=score))
+        elif grade.score != score:
+            previous[(enr_id, comp_id)] = grade.score
+            grade.score = score
+            to_update.append(grade)
+        else:
+            unchanged.append((enr_id, comp_id))
+
+    return {"create": to_create, "update": to_update, "unchanged": unchanged, "previous": previous}
+
+
+def save_grade_grid(offering, cells):
+    """
+    Not tablosunu tek transaction'da bulk_create / bulk_update ile kaydeder.
+    Değişmeyen hücrelere hiç dokunulmaz; değişen kayıtların Grade satırları
+    (toplam, harf notu) aynı transaction içinde yeniden hesaplanır.
+    Yeni hücreler (kayıt, bileşen) üzerinden upsert edilir: aynı hücreyi aynı
+    anda kaydeden iki istekten sonraki, IntegrityError yerine puanı günceller.
+    Dönen: diff_grade_grid sonucu
+    """
+    diff = diff_grade_grid(offering, cells)
+    if not diff["create"] and not diff["update"]:
+        return diff
+
+    with transaction.atomic():
+        if diff["create"]:
+            CourseGrade.objects.bulk_create(
+                diff["create"],
+                batch_size=GRADE_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=["enrollment", "component"],
+                update_fields=["score", "updated_at"],
+            )
+        if diff["update"]:
+            now = timezone.now()
+            for grade in diff["update"]:
+                grade.updated_at = now
+            CourseGrade.objects.bulk_update(diff["update"], ["score", "updated_at"], batch_size=GRADE_BATCH_SIZE)
+
+        # bulk işlemler post_save tetiklemez; Grade'ler burada tek seferde hesaplanır
+        recalculate_enrollment_grades(g.enrollment_id for g in diff["create"] + diff["update"])
+
+    return diff
+
+
+# ------------------------------------------------------------
+# Enrollment.weighted_total üzerinden indeksli sorgular
+# ------------------------------------------------------------
+def ranked_enrollments(offering):
+    """Şubedeki kayıtlar ağırlıklı toplama göre azalan, rank annotasyonlu"""
+    return (
+        Enrollment.objects
+        .filter(offering=offering, weighted_total__isnull=False)
+        .annotate(rank=Window(expression=Rank(), order_by=F("weighted_total").desc()))
+        .select_related("student__user")
+        .order_by("-weighted_total", "id")
+    )
+
+
+def at_risk_enrollments(offering, threshold=AT_RISK_THRESHOLD, min_completeness=0):
+    """
+    Girilmiş notlarına göre başarısı threshold'un altında kalan kayıtlar:
+    weighted_total < completeness × threshold / 100
+    """
+    return (
+        Enrollment.objects
+        .filter(
+            offering=offering,
+            weighted_total__isnull=False,
+            completeness__gt=0,
+            completeness__gte=min_completeness,
+            weighted_total__lt=F("completeness") * threshold / 100,
+        )
+        .select_related("student__user")
+        .order_by("weighted_total", "id")
+    )
+
+
+def weighted_total_histogram(offering, bin_size=10):
+    """{aralık alt sınırı: kayıt sayısı} — tek GROUP BY sorgusu"""
+    rows = (
+        Enrollment.objects
+        .filter(offering=offering, weighted_total__isnull=False)
+        .annotate(bucket=Floor(F("weighted_total") / bin_size))
+        .values("bucket")
+        .annotate(count=Count("id"))
+        .order_by("bucket")
+    )
+    # 100 puan son aralığa dahil edilir
+    last = (100 - 1) // bin_size
+    histogram = {}
+    for row in rows:
+        lower = min(int(row["bucket"]), last) * bin_size
+        histogram[lower] = histogram.get(lower, 0) + row["count"]
+    return histogram
+
+
+# ------------------------------------------------------------
+# Not tablosu JSON API (anahtar tabanlı sayfalama, kısmi kayıt)
+# ------------------------------------------------------------
+GRID_PAGE_SIZE = 50
+GRID_MAX_PAGE_SIZE = 200
+
+# Tek istekte kaydedilebilecek en fazla hücre
+GRID_MAX_CELLS = 2000
+
+
+def gradeable_enrollments(offering):
+    """Şubenin notu girilebilen kayıtları (GRADEABLE_STATUSES)"""
+    return Enrollment.objects.filter(offering=offering, status__in=GRADEABLE_STATUSES)
+
+
+def grade_grid_rows(offering, enrollment_ids):
+    """Verilen kayıtlar için JSON satırları (id sırasında); 3 sorgu"""
+    enrollments = list(
+        gradeable_enrollments(offering)
+        .filter(id__in=enrollment_ids)
+        .order_by("id")
+        .values_list(
+            "id", "student__student_no",
+            "student__user__first_name", "student__user__last_name", "student__user__username",
+            "weighted_total", "completeness",
+        )
+    )
+    ids = [row[0] for row in enrollments]
+
+    scores = {}
+    grades = CourseGrade.objects.filter(enrollment_id__in=ids).order_by("id")
+    for enrollment_id, component_id, score in grades.values_list("enrollment_id", "component_id", "score"):
+        scores.setdefault(enrollment_id, {})[str(component_id)] = None if score is None else str(score)
+
+    at_risk = set(at_risk_enrollments(offering).filter(id__in=ids).values_list("id", flat=True))
+
+    return [
+        {
+            "enrollment": enrollment_id,
+            "student_no": student_no,
+            "name": f"{first} {last}".strip() or username,
+            "scores": scores.get(enrollment_id, {}),
+            "weighted_total": None if weighted_total is None else str(weighted_total),
+            "completeness": str(completeness),
+            "at_risk": enrollment_id in at_risk,
+        }
+        for enrollment_id, student_no, first, last, username, weighted_total, completeness in enrollments
+    ]
+
+
+def grade_grid_page(offering, after=None, limit=GRID_PAGE_SIZE):
+    """
+    Kayıt id'sine göre anahtar tabanlı (keyset) sayfa:
+    {"rows": [...], "next": sonraki sayfanın after değeri ya da None}
+    OFFSET kullanılmaz; sayfa derinliğinden bağımsız olarak (offering, id) üzerinden okunur.
+    """
+    limit = max(1, min(limit, GRID_MAX_PAGE_SIZE))
+    page = gradeable_enrollments(offering).order_by("id")
+    if after is not None:
+        page = page.filter(id__gt=after)
+    ids = list(page.values_list("id", flat=True)[:limit + 1])
+
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+    return {
+        "rows": grade_grid_rows(offering, ids),
+        "next": ids[-1] if has_more else None,
+    }
+
+
+def _cell_id(value):
+    """JSON'dan gelen id; tam sayı değilse (bool, metin, liste) None"""
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def save_grade_cells(offering, cells):
+    """
+    Sadece değiştirilen hücreleri kaydeder.
+    cells: [{"enrollment": id, "component": id, "score": "72.5"}]
+    Dönen: {"diff": save_grade_grid sonucu, "errors": [{"index", "error"}]}
+    Her öğe yerinde doğrulanır; index gönderilen dizideki sıradır.
+    Geçersiz hücreler atlanır, geçerliler yazılır.
+    """
+    posted = [
+        (cell, _cell_id(cell.get("enrollment")), _cell_id(cell.get("component")))
+        if isinstance(cell, dict) else (None, None, None)
+        for cell in cells
+    ]
+    enrollment_ids = set(
+        gradeable_enrollments(offering)
+        .filter(id__in={enr_id for _, enr_id, _ in posted if enr_id is not None})
+        .values_list("id", flat=True)
+    )
+    component_ids = set(offering.assessment_components.values_list("id", flat=True))
+
+    valid, errors = {}, []
+    for index, (cell, enr_id, comp_id) in enumerate(posted):
+        if cell is None:
+            errors.append({"index": index, "error": "Hücre bir nesne olmalı."})
+        elif enr_id not in enrollment_ids:
+            errors.append({"index": index, "error": "Kayıt bu şubede değil."})
+        elif comp_id not in component_ids:
+            errors.append({"index": index, "error": "Bileşen bu şubede değil."})
+        else:
+            try:
+                score = parse_score(cell.get("score"))
+            except InvalidScoreError as exc:
+                errors.append({"index": index, "error": str(exc)})
+                continue
+            if score is None:
+                errors.append({"index": index, "error": "Puan boş olamaz."})
+            else:
+                valid[(enr_id, comp_id)] = score
+
+    diff = save_grade_grid(offering, valid) if valid else {"create": [], "update": [], "unchanged": [], "previous": {}}
+    return {"diff": diff, "errors": errors}
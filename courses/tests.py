@@ -1,3 +1,318 @@
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import SimpleUser
+from academics.models import Level
+from grades.models import Grade
+from outcomes.models import OutcomeGradeChange
+from grades.scales import letter_scales
+from hod.models import Head
+from students.models import Student
+from .models import (
+    ComponentLearningRelation,
+    Course,
+    CourseOffering,
+    CourseAssessmentComponent,
+    CourseGrade,
+    Enrollment,
+    LearningProgramRelation,
+)
+from . import services
+from .grade_import import import_grades
+from .services import (
+    InvalidScoreError,
+    at_risk_enrollments,
+    parse_score,
+    ranked_enrollments,
+    save_grade_grid,
+    weighted_total_histogram,
+)
+
+
+class GradeGridSaveTest(TestCase):
+    def setUp(self):
+        level = Level.objects.create(number=1, name="1. Sınıf")
+        course = Course.objects.create(code="CSE101", name="Programlama", level=level, course_type="DEPARTMENT")
+        self.offering = CourseOffering.objects.create(course=course, year=2025, semester="FALL")
+        self.midterm = CourseAssessmentComponent.objects.create(offering=self.offering, type="MIDTERM", weight=40)
+        self.final = CourseAssessmentComponent.objects.create(offering=self.offering, type="FINAL", weight=60)
+
+        self.enrollments = []
+        for i in range(3):
+            user = SimpleUser.objects.create(username=f"ogr{i}", password="123", role="STUDENT")
+            student = Student.objects.create(user=user, student_no=str(i))
+            self.enrollments.append(Enrollment.objects.create(student=student, offering=self.offering))
+        letter_scales.clear()
+
+    def test_parse_score(self):
+        self.assertEqual(parse_score("72.456"), Decimal("72.46"))
+        self.assertIsNone(parse_score(" "))
+        self.assertEqual(parse_score("100"), Decimal("100.00"))
+        for raw in ("abc", "NaN", "-inf", "Infinity", "sNaN", "100.01", "-1", "1e30"):
+            with self.assertRaises(InvalidScoreError, msg=raw):
+                parse_score(raw)
+
+    def test_save_grid_creates_updates_and_skips_unchanged(self):
+        e1, e2, e3 = self.enrollments
+        CourseGrade.objects.create(enrollment=e1, component=self.midterm, score=Decimal("50.00"))
+        CourseGrade.objects.create(enrollment=e2, component=self.midterm, score=Decimal("60.00"))
+
+        cells = {
+            (e1.id, self.midterm.id): Decimal("50.00"),   # aynı
+            (e2.id, self.midterm.id): Decimal("65.00"),   # güncelleme
+            (e3.id, self.midterm.id): Decimal("70.00"),   # yeni
+            (e3.id, self.final.id): Decimal("80.00"),     # yeni
+        }
+
+        # 1 okuma + SAVEPOINT/RELEASE + 1 INSERT + 1 UPDATE
+        # + Grade hesabı: bileşenler, kayıtlar, ağırlıklar, kayıt toplamları, grade'ler,
+        # skala, INSERT, UPDATE, istatistik sürümleri (şube + ders), bölüm özet önbelleği
+        # (not sistemi yukarıdaki kayıtlarla önbelleğe alındı; skala ilk kez e3 tamamlanınca
+        # yüklenir, kısmi notlar harf almaz)
+        with self.assertNumQueries(16):
+            diff = save_grade_grid(self.offering, cells)
+
+        self.assertEqual(len(diff["create"]), 2)
+        self.assertEqual(len(diff["update"]), 1)
+        self.assertEqual(diff["unchanged"], [(e1.id, self.midterm.id)])
+
+        scores = {
+            (g.enrollment_id, g.component_id): g.score
+            for g in CourseGrade.objects.all()
+        }
+        self.assertEqual(scores, cells)
+        # Sadece notu değişen kayıtların Grade'i yazılır: e1'in sinyalle açılan satırı aynen kalır
+        totals = dict(Grade.objects.values_list("student__username", "total_score"))
+        self.assertEqual(totals, {"ogr0": 20.0, "ogr1": 26.0, "ogr2": 76.0})
+
+        with self.assertNumQueries(1):
+            diff = save_grade_grid(self.offering, cells)
+        self.assertEqual(len(diff["unchanged"]), 4)
+
+    def test_concurrent_insert_of_same_cell_is_upserted(self):
+        e1 = self.enrollments[0]
+        real_diff = services.diff_grade_grid
+
+        def diff_then_race(offering, cells):
+            diff = real_diff(offering, cells)
+            # Diff okunduktan sonra başka bir istek aynı hücreyi ekler
+            CourseGrade.objects.create(enrollment=e1, component=self.midterm, score=Decimal("10.00"))
+            return diff
+
+        with patch("courses.services.diff_grade_grid", side_effect=diff_then_race):
+            save_grade_grid(self.offering, {(e1.id, self.midterm.id): Decimal("55.00")})
+
+        self.assertEqual(
+            list(CourseGrade.objects.values_list("enrollment_id", "score")), [(e1.id, Decimal("55.00"))]
+        )
+        self.assertEqual(Enrollment.objects.get(pk=e1.pk).weighted_total, Decimal("22.00"))
+
+    def test_weighted_total_and_completeness_follow_grid(self):
+        e1, e2, e3 = self.enrollments
+        save_grade_grid(self.offering, {
+            (e1.id, self.midterm.id): Decimal("90.00"),
+            (e1.id, self.final.id): Decimal("80.00"),
+            (e2.id, self.midterm.id): Decimal("30.00"),
+            (e3.id, self.midterm.id): Decimal("70.00"),
+            (e3.id, self.final.id): Decimal("100.00"),
+        })
+
+        progress = {
+            e.id: (e.weighted_total, e.completeness)
+            for e in Enrollment.objects.filter(offering=self.offering)
+        }
+        self.assertEqual(progress[e1.id], (Decimal("84.00"), Decimal("100.00")))
+        self.assertEqual(progress[e2.id], (Decimal("12.00"), Decimal("40.00")))
+        self.assertEqual(progress[e3.id], (Decimal("88.00"), Decimal("100.00")))
+
+        self.assertEqual([(e.id, e.rank) for e in ranked_enrollments(self.offering)], [(e3.id, 1), (e1.id, 2), (e2.id, 3)])
+        self.assertEqual([e.id for e in at_risk_enrollments(self.offering)], [e2.id])
+        self.assertEqual(weighted_total_histogram(self.offering), {10: 1, 80: 2})
+
+        # Ağırlık değişimi commit sonrası tüm şubenin toplamlarını yeniler
+        with self.captureOnCommitCallbacks(execute=True):
+            self.final.weight = 40
+            self.final.save()
+        e1.refresh_from_db()
+        self.assertEqual((e1.weighted_total, e1.completeness), (Decimal("68.00"), Decimal("100.00")))
+
+
+class GradeImportTest(TestCase):
+    def setUp(self):
+        level = Level.objects.create(number=1, name="1. Sınıf")
+        course = Course.objects.create(code="CSE101", name="Programlama", level=level, course_type="DEPARTMENT")
+        self.offering = CourseOffering.objects.create(course=course, year=2025, semester="FALL")
+        self.midterm = CourseAssessmentComponent.objects.create(offering=self.offering, type="MIDTERM", weight=40)
+        self.final = CourseAssessmentComponent.objects.create(offering=self.offering, type="FINAL", weight=60)
+
+        self.enrollments = []
+        for i in range(3):
+            user = SimpleUser.objects.create(username=f"ogr{i}", password="123", role="STUDENT")
+            student = Student.objects.create(user=user, student_no=f"S{i}")
+            self.enrollments.append(Enrollment.objects.create(student=student, offering=self.offering))
+        CourseGrade.objects.create(enrollment=self.enrollments[0], component=self.midterm, score=Decimal("50.00"))
+
+    def _csv(self, text):
+        return io.BytesIO(text.encode("utf-8"))
+
+    def test_dry_run_reports_diff_without_writing(self):
+        data = self._csv("student_no,component,score\nS0,MIDTERM,60\nS1,Vize,70\nS2,final,80.5\nS0,FINAL,\n")
+        report = import_grades(self.offering, data, "csv", dry_run=True)
+
+        self.assertEqual(report["error_count"], 1)
+        self.assertEqual(report["errors"], [(5, "Geçersiz puan: ")])
+        self.assertEqual(CourseGrade.objects.count(), 1)
+
+        report = import_grades(self.offering, data, "csv", dry_run=True, skip_invalid=True)
+        self.assertEqual((report["created"], report["updated"], report["unchanged"]), (2, 1, 0))
+        self.assertIn(("S0", "Vize", Decimal("50.00"), Decimal("60.00")), report["changes"])
+        self.assertFalse(report["written"])
+        self.assertEqual(CourseGrade.objects.count(), 1)
+
+    def test_non_finite_and_out_of_range_rows_are_reported(self):
+        data = self._csv("S0,MIDTERM,nan\nS1,MIDTERM,inf\nS2,MIDTERM,-Infinity\nS0,FINAL,101\nS1,FINAL,abc\n")
+        report = import_grades(self.offering, data, "csv")
+
+        self.assertEqual(report["errors"], [
+            (1, "Puan 0-100 arasında olmalı: nan"),
+            (2, "Puan 0-100 arasında olmalı: inf"),
+            (3, "Puan 0-100 arasında olmalı: -Infinity"),
+            (4, "Puan 0-100 arasında olmalı: 101"),
+            (5, "Geçersiz puan: abc"),
+        ])
+        self.assertFalse(report["written"])
+        self.assertEqual(CourseGrade.objects.count(), 1)
+
+    def test_closed_enrollment_cannot_be_graded_by_upload(self):
+        # Grid ile aynı kural: tamamlanmış kaydın notu dosyayla da değiştirilemez
+        Enrollment.objects.filter(pk=self.enrollments[2].pk).update(status=Enrollment.Status.COMPLETED)
+        report = import_grades(self.offering, self._csv("S2,MIDTERM,70\n"), "csv")
+
+        self.assertEqual(report["errors"], [(1, "Öğrenci bu şubede kayıtlı değil: S2")])
+        self.assertFalse(CourseGrade.objects.filter(enrollment=self.enrollments[2]).exists())
+
+    def test_import_writes_in_chunks_and_queues_outcomes_once(self):
+        rows = ["student_no,component,score"] + [
+            f"S{i},{comp},{70 + i}" for i in range(3) for comp in ("MIDTERM", "FINAL")
+        ]
+        data = self._csv("\n".join(rows))
+
+        report = import_grades(self.offering, data, "csv", chunk_size=4)
+
+        self.assertTrue(report["written"])
+        self.assertEqual((report["created"], report["updated"]), (5, 1))
+        self.assertEqual(CourseGrade.objects.count(), 6)
+        self.assertEqual(OutcomeGradeChange.objects.count(), 6)
+        self.assertEqual(Grade.objects.get(student__username="ogr2").total_score, 72.0)
+
+        # Aynı dosya tekrar yüklenirse yazma ve kuyruk kaydı olmaz
+        data.seek(0)
+        report = import_grades(self.offering, data, "csv")
+        self.assertEqual(report["unchanged"], 6)
+        self.assertEqual(OutcomeGradeChange.objects.count(), 6)
+
+    def test_command_rejects_invalid_rows(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("S0,MIDTERM,55\nS9,MIDTERM,40\nS1,MIDTERM,NaN\n")
+        self.addCleanup(os.unlink, f.name)
+
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command("import_grades", f.name, offering=self.offering.id, stdout=out)
+        self.assertIn("Öğrenci bu şubede kayıtlı değil: S9", out.getvalue())
+        self.assertIn("Satır 3: Puan 0-100 arasında olmalı: NaN", out.getvalue())
+        self.assertEqual(CourseGrade.objects.get(enrollment=self.enrollments[0]).score, Decimal("50.00"))
+
+        call_command("import_grades", f.name, offering=self.offering.id, skip_invalid=True, stdout=out)
+        self.assertEqual(CourseGrade.objects.get(enrollment=self.enrollments[0]).score, Decimal("55.00"))
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN çıktısı SQLite'a özgü")
+class HotPathQueryPlanTest(TestCase):
+    """Sık çalışan filtrelerin tablo taraması yerine indeks kullandığını EXPLAIN ile doğrular."""
+
+    def assertIndexScans(self, queryset, expected):
+        """expected: {tablo: beklenen indeks adı ya da None (herhangi bir indeks)}"""
+        plan = queryset.explain()
+        for table, index in expected.items():
+            steps = [line for line in plan.splitlines() if f" {table} " in f"{line} "]
+            self.assertTrue(steps, f"{table} planda yok:\n{plan}")
+            for step in steps:
+                self.assertIn(f"SEARCH {table} USING ", step, plan)
+                if index is not None:
+                    self.assertRegex(step, rf"INDEX {index}\b", plan)
+
+    def test_enrollment_filters(self):
+        self.assertIndexScans(
+            Enrollment.objects.filter(student_id__in=[1, 2], status=Enrollment.Status.ENROLLED),
+            {"courses_enrollment": "enrollment_student_status_idx"},
+        )
+        self.assertIndexScans(
+            Enrollment.objects.filter(offering_id=1, status=Enrollment.Status.ENROLLED),
+            {"courses_enrollment": "enrollment_offering_status_idx"},
+        )
+
+    def test_course_grade_cell_lookup(self):
+        self.assertIndexScans(
+            CourseGrade.objects.filter(enrollment_id=1, component_id=2),
+            {"courses_coursegrade": None},
+        )
+        self.assertIn("(enrollment_id=? AND component_id=?)", CourseGrade.objects.filter(enrollment_id=1, component_id=2).explain())
+
+        # PO motorunun not okuması: öğrencinin aktif kayıtları üzerinden
+        self.assertIndexScans(
+            CourseGrade.objects.filter(
+                enrollment__student_id__in=[1, 2],
+                enrollment__status=Enrollment.Status.ENROLLED,
+                component__offering_id=F("enrollment__offering_id"),
+            ).values_list("enrollment_id", "component_id", "score"),
+            {"courses_enrollment": "enrollment_student_status_idx", "courses_coursegrade": None},
+        )
+
+    def test_outcome_graph_loading(self):
+        self.assertIndexScans(
+            ComponentLearningRelation.objects
+            .filter(component__offering_id__in=[1, 2])
+            .values_list("component_id", "learning_outcome_id", "weight"),
+            {"courses_componentlearningrelation": "component_lo_relation_idx"},
+        )
+        self.assertIndexScans(
+            LearningProgramRelation.objects
+            .filter(learning_outcome_id__in=[1, 2])
+            .values_list("learning_outcome_id", "program_outcome_id", "program_outcome__department_id", "weight"),
+            {"courses_learningprogramrelation": None, "outcomes_programoutcome": None},
+        )
+
+    def test_active_offerings_and_head_lookup(self):
+        self.assertIndexScans(
+            CourseOffering.objects.filter(course_id=1, is_active=True),
+            {"courses_courseoffering": "offering_course_active_idx"},
+        )
+        self.assertIndexScans(
+            Head.objects.filter(teacher__user__username="hod", is_active=True),
+            {"accounts_simpleuser": None, "teachers_teacher": None, "hod_head": None},
+        )
+
+    def test_course_grade_cell_is_unique(self):
+        level = Level.objects.create(number=1, name="1. Sınıf")
+        course = Course.objects.create(code="CSE101", name="Programlama", level=level, course_type="DEPARTMENT")
+        offering = CourseOffering.objects.create(course=course, year=2025, semester="FALL")
+        component = CourseAssessmentComponent.objects.create(offering=offering, type="MIDTERM", weight=40)
+        student = Student.objects.create(
+            user=SimpleUser.objects.create(username="ogr", password="x", role="STUDENT"), student_no="1"
+        )
+        enrollment = Enrollment.objects.create(student=student, offering=offering)
+
+        CourseGrade.objects.create(enrollment=enrollment, component=component, score=50)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CourseGrade.objects.create(enrollment=enrollment, component=component, score=60)
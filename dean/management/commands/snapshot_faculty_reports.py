@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from dean.services import current_semester, take_faculty_snapshot
+from faculty.models import Faculty
+
+
+class Command(BaseCommand):
+    help = (
+        "Her fakülte için öğrenci / öğretmen sayısı ve ortalama GPA'yı "
+        "yeni bir FacultyReport satırı olarak kaydeder (periyodik çalıştırılır)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--faculty", type=int, help="Sadece bu fakülte id")
+        parser.add_argument("--semester", type=str, help="Dönem etiketi (varsayılan: bugünün dönemi)")
+
+    def handle(self, *args, **options):
+        faculties = Faculty.objects.order_by("id")
+        if options["faculty"]:
+            faculties = faculties.filter(pk=options["faculty"])
+
+        semester = options["semester"] or current_semester()
+        for faculty in faculties:
+            report = take_faculty_snapshot(faculty, semester)
+            self.stdout.write(
+                f"{faculty.full_name}: {report.total_students} öğrenci, "
+                f"{report.total_teachers} öğretmen, GPA {report.average_gpa}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {semester} fakülte raporları kaydedildi."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dean', '0001_initial'),
+        ('faculty', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='facultyreport',
+            index=models.Index(fields=['faculty', '-created_at'], name='facultyreport_faculty_time_idx'),
+        ),
+    ]
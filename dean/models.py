@@ -36,3 +36,12 @@ class FacultyReport(models.Model):
     average_gpa = models.DecimalField(max_digits=3, decimal_places=2)
     semester = models.CharField(max_length=20)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # dean.services.take_faculty_snapshot ile periyodik olarak eklenir; satırlar güncellenmez
+    class Meta:
+        indexes = [
+            models.Index(fields=["faculty", "-created_at"], name="facultyreport_faculty_time_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.faculty} - {self.semester}"
@@ -0,0 +1,136 @@
+# dean/services.py
+"""
+Dekan paneli için fakülte geneli özetler.
+
+department_overview bölüm başına PO sayısı, öğrenci sayısı, ortalama PO
+başarısı ve GPA'yı ilişkili alt sorgularla tek sorguda hesaplar; bölüm sayısı
+arttıkça sorgu sayısı artmaz. take_faculty_snapshot ise fakülte toplamlarını
+FacultyReport'a ekler (snapshot_faculty_reports komutuyla periyodik çalışır),
+panel geçmişi bu satırlardan okur.
+
+Öğrenci PO raporları saklanan StudentProgramOutcomeScore satırlarından
+okunur; sadece son not / eşleme değişikliğinden eski kalan öğrenciler
+yeniden hesaplanır (tek öğrenci sayfası ve bölüm paketi aynı yolu kullanır).
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Avg, Count, ExpressionWrapper, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from dean.models import FacultyReport
+from departments.models import Department
+from grades.models import Grade, TranscriptManager
+from outcomes.models import ProgramOutcome, StudentProgramOutcomeScore
+from outcomes.services import refresh_stale_program_outcomes
+from students.models import Student
+from teachers.models import Teacher
+
+# Panelde gösterilen en fazla snapshot sayısı
+FACULTY_REPORT_HISTORY = 8
+
+# Ay → dönem kodu (Kış okulu Ocak'ta)
+SEMESTER_BY_MONTH = {1: "WINTER", 7: "SUMMER", 8: "SUMMER", 9: "FALL", 10: "FALL", 11: "FALL", 12: "FALL"}
+
+
+def current_semester(today=None):
+    """FacultyReport.semester etiketi: "2025-FALL" gibi"""
+    today = today or date.today()
+    return f"{today.year}-{SEMESTER_BY_MONTH.get(today.month, 'SPRING')}"
+
+
+def _per_department(queryset, department_field, aggregate, output_field=None):
+    """Bölüm başına tek değer döndüren ilişkili alt sorgu"""
+    return Subquery(
+        queryset
+        .filter(**{department_field: OuterRef("pk")})
+        .order_by()
+        .values(department_field)
+        .annotate(value=aggregate)
+        .values("value")[:1],
+        output_field=output_field,
+    )
+
+
+def department_overview(faculty):
+    """
+    Fakültenin bölümleri; her biri po_count, student_count, avg_po_score
+    (öğrenci PO skorlarının ortalaması) ve gpa ile annotate edilmiş — tek sorgu.
+    """
+    credits = Sum("offering__course__credit")
+    points = TranscriptManager._gpa_totals()["points"]
+    return (
+        Department.objects
+        .filter(faculty=faculty)
+        .annotate(
+            po_count=Coalesce(_per_department(ProgramOutcome.objects.all(), "department", Count("pk")), 0),
+            student_count=Coalesce(
+                _per_department(Student.objects.all(), "departments", Count("pk", distinct=True)), 0
+            ),
+            avg_po_score=_per_department(
+                StudentProgramOutcomeScore.objects.all(),
+                "program_outcome__department",
+                Avg("score"),
+                FloatField(),
+            ),
+            gpa=_per_department(
+                TranscriptManager._graded(Grade.objects.all()),
+                "student__student__departments",
+                ExpressionWrapper(points / NullIf(credits, Value(0.0)), output_field=FloatField()),
+                FloatField(),
+            ),
+        )
+        .order_by("code")
+    )
+
+
+def faculty_trend(faculty, limit=FACULTY_REPORT_HISTORY):
+    """Son snapshot'lar, eskiden yeniye"""
+    reports = FacultyReport.objects.filter(faculty=faculty).order_by("-created_at", "-id")[:limit]
+    return list(reports)[::-1]
+
+
+def take_faculty_snapshot(faculty, semester=None):
+    """Fakültenin güncel öğrenci / öğretmen sayısı ve GPA'sını yeni bir FacultyReport olarak kaydeder."""
+    students = Student.objects.filter(departments__faculty=faculty)
+    # IN (alt sorgu): iki bölümlü öğrencinin notları iki kez toplanmasın
+    totals = TranscriptManager._graded(
+        Grade.objects.filter(student__student__in=students)
+    ).aggregate(**TranscriptManager._gpa_totals())
+
+    return FacultyReport.objects.create(
+        faculty=faculty,
+        semester=semester or current_semester(),
+        total_students=students.values("pk").distinct().count(),
+        total_teachers=Teacher.objects.filter(department__faculty=faculty).count(),
+        average_gpa=Decimal(str(TranscriptManager._gpa(totals["points"] or 0.0, totals["credits"]))),
+    )
+
+
+def student_po_reports(students, department=None):
+    """
+    {student_id: [{"po_id", "code", "description", "coverage", "score"}]} —
+    eskimiş vektörler önce yenilenir, satırlar tek sorguda okunur.
+    department verilirse sadece o bölümün PO'ları listelenir.
+    """
+    student_ids = list(dict.fromkeys(getattr(s, "pk", s) for s in students))
+    refresh_stale_program_outcomes(student_ids)
+
+    scores = StudentProgramOutcomeScore.objects.filter(student_id__in=student_ids)
+    if department is not None:
+        scores = scores.filter(program_outcome__department=department)
+
+    reports = {student_id: [] for student_id in student_ids}
+    rows = scores.order_by("student_id", "program_outcome_id").values_list(
+        "student_id", "program_outcome_id", "program_outcome__code",
+        "program_outcome__description", "coverage", "score",
+    )
+    for student_id, po_id, code, description, coverage, score in rows:
+        reports[student_id].append({
+            "po_id": po_id,
+            "code": code,
+            "description": description,
+            "coverage": round(coverage, 2),
+            "score": round(score, 2),
+        })
+    return reports
@@ -1,9 +1,17 @@
+from decimal import Decimal
+
 from django.test import TestCase, Client
 from django.urls import reverse
 from accounts.models import SimpleUser
+from academics.models import Level
+from courses.models import Course, CourseOffering
+from grades.models import Grade
+from outcomes.models import ProgramOutcome
+from students.models import Student
 from teachers.models import Teacher
 from departments.models import Department, Faculty
 from .models import Dean
+from .services import department_overview, faculty_trend, take_faculty_snapshot
 
 class DeanViewTest(TestCase):
     def setUp(self):
@@ -59,9 +67,67 @@ class DeanViewTest(TestCase):
         response = self.client.get(reverse('dean:dashboard'))
         self.assertEqual(response.status_code, 302)
 
+    def test_department_po_pack(self):
+        self.set_dean_session()
+        response = self.client.get(reverse('dean:department_po_pack', args=[self.dept.id]))
+        self.assertEqual(response.status_code, 200)
+
+        # Başka fakültenin bölümü açılamaz
+        other = Department.objects.create(code="MED", faculty=Faculty.objects.create(full_name="Tıp"))
+        response = self.client.get(reverse('dean:department_po_pack', args=[other.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_po_attainment_api(self):
+        self.set_dean_session()
+        response = self.client.get(reverse('dean:po_attainment_api'))
+        self.assertEqual(response.json(), {"level": "faculty", "rows": []})
+
+        response = self.client.get(reverse('dean:po_attainment_api'), {"level": "component"})
+        self.assertEqual(response.status_code, 400)
+
     def test_student_list_view(self):
         """Öğrenci listeleme fonksiyonunu test et."""
         self.set_dean_session()
         url = reverse('dean:student_list')
         response = self.client.get(url)
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+class DeanOverviewTest(TestCase):
+
+    def setUp(self):
+        self.faculty = Faculty.objects.create(full_name="Mühendislik")
+        level = Level.objects.get_or_create(number=1, name="Lisans")[0]
+        self.departments = []
+        for code in ("CENG", "EEE"):
+            dept = Department.objects.create(code=code, name=code, faculty=self.faculty)
+            ProgramOutcome.objects.create(department=dept, code=1, description="x")
+            self.departments.append(dept)
+        ceng = self.departments[0]
+        ProgramOutcome.objects.create(department=ceng, code=2, description="y")
+        Teacher.objects.create(user=SimpleUser.objects.create(username="hoca", password="x"), department=ceng)
+
+        course = Course.objects.create(code="CENG101", name="Programlama", level=level, credit=4)
+        offering = CourseOffering.objects.create(course=course, year=2025, semester="FALL")
+        for i, gpa in enumerate([4.0, 2.0]):
+            user = SimpleUser.objects.create(username=f"ogr{i}", password="x", role="STUDENT")
+            student = Student.objects.create(user=user, student_no=f"S{i}")
+            student.departments.add(ceng)
+            Grade.objects.create(student=user, offering=offering, total_score=80, gpa_value=gpa, letter_grade="BB")
+        # İki bölümlü öğrenci fakülte toplamında bir kez sayılır
+        student.departments.add(self.departments[1])
+
+    def test_department_overview_single_query(self):
+        with self.assertNumQueries(1):
+            rows = {d.code: d for d in department_overview(self.faculty)}
+
+        self.assertEqual((rows["CENG"].po_count, rows["CENG"].student_count), (2, 2))
+        self.assertEqual(rows["CENG"].gpa, 3.0)
+        self.assertEqual((rows["EEE"].po_count, rows["EEE"].student_count, rows["EEE"].gpa), (1, 1, 2.0))
+
+    def test_snapshot_adds_faculty_report(self):
+        report = take_faculty_snapshot(self.faculty, "2025-FALL")
+        self.assertEqual((report.total_students, report.total_teachers), (2, 1))
+        self.assertEqual(report.average_gpa, Decimal("3.00"))
+
+        take_faculty_snapshot(self.faculty, "2026-SPRING")
+        self.assertEqual([r.semester for r in faculty_trend(self.faculty)], ["2025-FALL", "2026-SPRING"])
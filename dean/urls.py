@@ -8,6 +8,9 @@ urlpatterns = [
     # 🎯 Sadece dashboard kalsın
     path("", views.dekan_dashboard, name="dashboard"),
     path("students/", views.student_list, name="student_list"),
+    path("students/export/gpa/", views.export_gpa_list, name="export_gpa_list"),
     path("students/<int:student_id>/program-outcomes/", views.student_po_report, name="student_po_report"),
+    path("departments/<int:department_id>/po-pack/", views.department_po_pack, name="department_po_pack"),
+    path("api/po-attainment/", views.po_attainment_api, name="po_attainment_api"),
     path("program-outcomes/", program_outcome_list, name="program_outcome_list")
 ]
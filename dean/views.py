@@ -3,15 +3,19 @@ from django.db.models import Q
 import tempfile
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from departments.models import Department, DepartmentCourse
+from departments.models import Department
 from courses.models import CourseGrade, ComponentLearningProgramRelation
 
 from students.models import Student
 from .models import Dean
 from .forms import TeacherForm
-from outcomes.models import ProgramOutcome, StudentProgramOutcomeScore
+from outcomes.models import ProgramOutcome
 from outcomes.management.commands.import_outcomes import OutcomeImporter
-from outcomes.services import compute_and_save_student_program_outcomes
+from courses.exports import export_response
+from grades.exports import faculty_gpa_export
+from dean.services import department_overview, faculty_trend, student_po_reports
+from django.http import JsonResponse
+from outcomes.cube import CubeQueryError, attainment_drilldown
 
 def is_dean_logged(request):
     return request.session.get("role") == "DEAN"
@@ -68,27 +72,16 @@ def dekan_dashboard(request):
         os.unlink(tmp_path)
         return redirect("dean:dashboard")
 
-    departments = Department.objects.filter(faculty=dean.faculty)
-    department_courses = DepartmentCourse.objects.filter(department__faculty=dean.faculty)
-
-    department_stats = []
-    total_outcomes = 0
-    for dep in departments:
-        count = ProgramOutcome.objects.filter(department=dep).count()
-        total_outcomes += count
-        department_stats.append({
-            "code": dep.code,
-            "name": dep.name,
-            "count": count
-        })
+    # Bölüm özetleri tek sorguda, geçmiş FacultyReport snapshot'larından
+    department_stats = list(department_overview(dean.faculty))
 
     context = {
         "username": username,
         "dean": dean,
-        "departments": departments,
-        "department_courses": department_courses,
+        "departments": department_stats,
         "department_stats": department_stats,
-        "total_outcomes": total_outcomes,
+        "total_outcomes": sum(d.po_count for d in department_stats),
+        "faculty_trend": faculty_trend(dean.faculty),
     }
 
     return render(request, "dean/dashboard.html", context)
@@ -99,32 +92,41 @@ def student_po_report(request, student_id):
     if not is_dean_logged(request):
         return redirect("login")
 
-    student = get_object_or_404(Student, id=student_id)
-
-    compute_and_save_student_program_outcomes(student)
-
-    scores = (
-        StudentProgramOutcomeScore.objects
-        .filter(student=student)
-        .select_related("program_outcome")
-        .order_by("program_outcome__id")
-    )
+    student = get_object_or_404(Student.objects.select_related("user"), id=student_id)
 
-    rows = []
-    for s in scores:
-        rows.append({
-            "po_id": s.program_outcome.id,
-            "code": s.program_outcome.code,
-            "description": s.program_outcome.description,
-            "coverage": round(s.coverage, 2),
-            "score": round(s.score, 2),
-        })
+    # Saklanan skorlar okunur; sadece not / eşleme değiştiyse yeniden hesaplanır
+    rows = student_po_reports([student])[student.pk]
 
     return render(request, "dean/student_po_report.html", {
         "student": student,
         "rows": rows,
     })
 
+def department_po_pack(request, department_id):
+    """Bölüm öğrencilerinin PO raporları, yazdırılabilir tek sayfa"""
+    if not is_dean_logged(request):
+        return redirect("login")
+
+    username = request.session.get("username")
+    dean = Dean.objects.filter(teacher__user__username=username).select_related("faculty").first()
+    if not dean:
+        messages.error(request, "Dekan profili bulunamadı.")
+        return redirect("login")
+
+    department = get_object_or_404(Department, id=department_id, faculty=dean.faculty)
+    students = list(
+        Student.objects
+        .filter(departments=department)
+        .select_related("user")
+        .order_by("student_no")
+    )
+    reports = student_po_reports(students, department=department)
+
+    return render(request, "dean/department_po_pack.html", {
+        "department": department,
+        "pack": [(student, reports[student.pk]) for student in students],
+    })
+
 def student_list(request):
     if not is_dean_logged(request):
         return redirect("login")
@@ -165,14 +167,47 @@ def student_list(request):
         "selected_department": selected_department,
         "students": qs,
         "q": q,
-        "department_courses": [],
         "department_stats": [],
         "total_outcomes": ProgramOutcome.objects.filter(department__faculty=dean.faculty).count(),
     }
-    print("STUDENT COUNT:", qs.count())
 
     return render(request, "dean/dashboard.html", context)
 
+def export_gpa_list(request):
+    """Fakültedeki tüm öğrencilerin GPA listesi — ?format=csv|xlsx"""
+    if not is_dean_logged(request):
+        return redirect("login")
+
+    username = request.session.get("username")
+    dean = Dean.objects.filter(teacher__user__username=username).select_related("faculty").first()
+    if not dean:
+        messages.error(request, "Dekan profili bulunamadı.")
+        return redirect("login")
+
+    header, rows = faculty_gpa_export(dean.faculty)
+    return export_response(request.GET.get("format", "csv"), "fakulte_gpa_listesi", header, rows)
+
+def po_attainment_api(request):
+    """
+    PO başarı küpü — ?level=faculty|department|course|component
+    ve isteğe bağlı department, program_outcome, course, year, semester, cohort_level.
+    Sorgular dekanın fakültesiyle sınırlıdır.
+    """
+    if not is_dean_logged(request):
+        return JsonResponse({"error": "Yetkisiz."}, status=403)
+
+    username = request.session.get("username")
+    faculty_id = Dean.objects.filter(teacher__user__username=username).values_list("faculty_id", flat=True).first()
+    if faculty_id is None:
+        return JsonResponse({"error": "Dekan profili bulunamadı."}, status=403)
+
+    level = request.GET.get("level", "faculty")
+    try:
+        rows = attainment_drilldown(level, request.GET, scope={"department__faculty_id": faculty_id})
+    except CubeQueryError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"level": level, "rows": rows})
+
 def add_teacher(request):
     if not is_dean_logged(request):
         return redirect("login")
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='departmentstatistic',
+            name='computed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Hesaplanma Zamanı'),
+        ),
+        migrations.AddField(
+            model_name='departmentstatistic',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Kayıt Sayısı'),
+        ),
+        migrations.AddField(
+            model_name='departmentstatistic',
+            name='offering_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Aktif Şube Sayısı'),
+        ),
+    ]
@@ -45,12 +45,16 @@ class DepartmentStatistic(models.Model):
     )
     student_count = models.PositiveIntegerField(default=0)
     teacher_count = models.PositiveIntegerField(default=0)
+    offering_count = models.PositiveIntegerField(default=0, verbose_name="Aktif Şube Sayısı")
+    enrollment_count = models.PositiveIntegerField(default=0, verbose_name="Kayıt Sayısı")
     success_rate = models.DecimalField(
         max_digits=5,
         decimal_places=2,
         default=0.00,
         verbose_name="Başarı Oranı (%)"
     )
+    # hod.services.refresh_department_statistic ile doldurulur
+    computed_at = models.DateTimeField(null=True, blank=True, verbose_name="Hesaplanma Zamanı")
 
     def __str__(self):
         return f"{self.department.name} İstatistikleri"
@@ -1,17 +1,6 @@
 from urllib import request
 from django.contrib import admin
-from .models import Grade, GradeComponent, LetterGradeScale
-
-
-# ================================
-# INLINE — GradeComponent
-# ================================
-class GradeComponentInline(admin.TabularInline):
-    model = GradeComponent
-    extra = 0
-    autocomplete_fields = ["component"]  # CourseAssessmentComponent seçimi kolay olsun
-    fields = ["component", "score"]
-    readonly_fields = []
+from .models import Grade, LetterGradeScale
 
 
 # ================================
@@ -31,8 +20,6 @@ class GradeAdmin(admin.ModelAdmin):
     list_filter = ("offering__course__code", "letter_grade")
     search_fields = ("student__username", "student__full_name", "offering__course__code")
 
-    inlines = [GradeComponentInline]
-
     readonly_fields = ("total_score", "letter_grade", "gpa_value")
 
     fieldsets = (
@@ -44,30 +31,14 @@ class GradeAdmin(admin.ModelAdmin):
         }),
     )
 
-    def save_related(self, request, form, formsets, change):
-        super().save_related(request, form, formsets, change)
-        form.instance.save()
-
 
 # ================================
 # LETTER GRADE SCALE ADMIN
 # ================================
 @admin.register(LetterGradeScale)
 class LetterGradeScaleAdmin(admin.ModelAdmin):
-    list_display = ("letter", "min_score", "max_score", "gpa_value")
+    list_display = ("letter", "system", "min_score", "max_score", "gpa_value")
     list_editable = ("min_score", "max_score", "gpa_value")
-    ordering = ("-gpa_value",)
+    ordering = ("system", "-gpa_value")
     search_fields = ("letter",)
-    list_filter = ("gpa_value",)
-
-
-# ================================
-# GRADE COMPONENT ADMIN
-# ================================
-@admin.register(GradeComponent)
-class GradeComponentAdmin(admin.ModelAdmin):
-    list_display = ("grade", "component", "score")
-    search_fields = ("grade__student__username", "component__type")
-    list_filter = ("component__type",)
-
-
+    list_filter = ("system", "gpa_value")
@@ -0,0 +1,52 @@
+# grades/exports.py
+"""Fakülte GPA listesi dışa aktarımı."""
+from itertools import groupby
+
+from django.db.models import Min, Q
+
+from courses.exports import EXPORT_CHUNK_SIZE, full_name
+from grades.models import Grade, TranscriptManager
+from students.models import Student
+
+
+def faculty_gpa_export(faculty):
+    """(header, rows) — GPA'lar GROUP BY ile, öğrenciler kullanıcı id sırasında akar."""
+    header = ["student_no", "ad_soyad", "bölüm", "kredi", "gpa"]
+    return header, _faculty_gpa_rows(faculty)
+
+
+def _faculty_gpa_rows(faculty):
+    faculty_students = Student.objects.filter(departments__faculty=faculty)
+    students = (
+        faculty_students
+        .values("user_id", "student_no", "user__first_name", "user__last_name", "user__username")
+        .annotate(department=Min("departments__code", filter=Q(departments__faculty=faculty)))
+        .order_by("user_id")
+        .values_list(
+            "user_id", "student_no", "user__first_name", "user__last_name", "user__username", "department",
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    # IN (alt sorgu): iki bölümlü öğrencinin notları iki kez toplanmasın
+    totals = groupby(
+        TranscriptManager._graded(Grade.objects.filter(student__student__in=faculty_students))
+        .values("student_id")
+        .annotate(**TranscriptManager._gpa_totals())
+        .order_by("student_id")
+        .values_list("student_id", "credits", "points")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE),
+        key=lambda row: row[0],
+    )
+
+    current_id, current_rows = next(totals, (None, ()))
+    for user_id, student_no, first, last, username, department in students:
+        while current_id is not None and current_id < user_id:
+            current_id, current_rows = next(totals, (None, ()))
+
+        credits, points = 0, 0.0
+        if current_id == user_id:
+            _, credits, points = next(iter(current_rows))
+        yield [
+            student_no, full_name(first, last, username), department,
+            credits or 0, TranscriptManager._gpa(points or 0.0, credits),
+        ]
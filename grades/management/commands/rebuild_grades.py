@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from grades.services import rebuild_grades
+
+
+class Command(BaseCommand):
+    help = (
+        "Grade satırlarını (toplam puan, harf notu, katsayı) CourseGrade "
+        "bileşen notlarından yeniden hesaplar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--offering", type=int, action="append", help="Sadece bu şube id'leri")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            written = rebuild_grades(options["offering"])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {written} not satırı güncellendi."))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lettergradescale',
+            name='system',
+            field=models.CharField(default='AA-FF', max_length=50, verbose_name='Not Sistemi'),
+        ),
+        migrations.AlterField(
+            model_name='lettergradescale',
+            name='letter',
+            field=models.CharField(max_length=2),
+        ),
+        migrations.AlterUniqueTogether(
+            name='lettergradescale',
+            unique_together={('system', 'letter')},
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Bileşen notları grades.GradeComponent'ten courses.CourseGrade'e taşınır.
+
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def move_component_scores(apps, schema_editor):
+    """
+    Her GradeComponent satırı, öğrencinin o şubedeki kaydı üzerinden CourseGrade'e
+    kopyalanır. Kayıt yoksa COMPLETED durumunda açılır; aynı hücrede zaten
+    CourseGrade varsa o korunur. Student kaydı olmayan kullanıcıların notları
+    taşınamaz (CourseGrade kayda bağlıdır) ve atlanır.
+    """
+    GradeComponent = apps.get_model("grades", "GradeComponent")
+    CourseGrade = apps.get_model("courses", "CourseGrade")
+    Enrollment = apps.get_model("courses", "Enrollment")
+    Student = apps.get_model("students", "Student")
+
+    students = dict(Student.objects.values_list("user_id", "id"))
+    enrollments = {
+        (student_id, offering_id): enrollment_id
+        for enrollment_id, student_id, offering_id in Enrollment.objects.values_list("id", "student_id", "offering_id")
+    }
+    cells = set(CourseGrade.objects.values_list("enrollment_id", "component_id"))
+
+    rows = []
+    components = (
+        GradeComponent.objects
+        .order_by("id")
+        .values_list("grade__student_id", "grade__offering_id", "component_id", "component__offering_id", "score")
+    )
+    for user_id, offering_id, component_id, component_offering_id, score in components:
+        student_id = students.get(user_id)
+        if student_id is None or component_offering_id != offering_id:
+            continue
+
+        key = (student_id, offering_id)
+        if key not in enrollments:
+            enrollments[key] = Enrollment.objects.create(
+                student_id=student_id, offering_id=offering_id, status="COMPLETED"
+            ).id
+        enrollment_id = enrollments[key]
+
+        if (enrollment_id, component_id) in cells:
+            continue
+        cells.add((enrollment_id, component_id))
+        rows.append(CourseGrade(
+            enrollment_id=enrollment_id,
+            component_id=component_id,
+            score=None if score is None else Decimal(str(round(score, 2))),
+        ))
+
+    CourseGrade.objects.bulk_create(rows, batch_size=500)
+
+
+def restore_component_scores(apps, schema_editor):
+    """Geri alma: mevcut Grade'lerin bileşen notları CourseGrade'den geri yazılır."""
+    Grade = apps.get_model("grades", "Grade")
+    GradeComponent = apps.get_model("grades", "GradeComponent")
+    CourseGrade = apps.get_model("courses", "CourseGrade")
+
+    grades = {
+        (user_id, offering_id): grade_id
+        for grade_id, user_id, offering_id in Grade.objects.values_list("id", "student_id", "offering_id")
+    }
+    rows = {}
+    scores = (
+        CourseGrade.objects
+        .order_by("id")
+        .values_list("enrollment__student__user_id", "enrollment__offering_id", "component_id", "score")
+    )
+    for user_id, offering_id, component_id, score in scores:
+        grade_id = grades.get((user_id, offering_id))
+        if grade_id is None:
+            continue
+        rows[(grade_id, component_id)] = GradeComponent(
+            grade_id=grade_id,
+            component_id=component_id,
+            score=None if score is None else float(score),
+        )
+
+    GradeComponent.objects.bulk_create(rows.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("grades", "0002_lettergradescale_system"),
+        ("courses", "0002_initial"),
+        ("students", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(move_component_scores, restore_component_scores),
+        migrations.DeleteModel(name="GradeComponent"),
+    ]
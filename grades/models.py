@@ -1,9 +1,8 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from accounts.models import SimpleUser
-from courses.models import CourseOffering, CourseAssessmentComponent
-from django.core.exceptions import ValidationError
-from django.db.models.signals import post_save, post_delete
+from courses.models import CourseOffering
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 
  
@@ -12,8 +11,9 @@ from django.dispatch import receiver
 # ============================================================
 class Grade(models.Model):
     """
-    Bir öğrencinin bir şubedeki notlarını tutar.
-    Artık NOTLAR DİNAMİK, bileşenler GradeComponent tablosunda tutulur.
+    Bir öğrencinin bir şubedeki sonuç notunu tutar.
+    Bileşen notları courses.CourseGrade'de; bu tablo onlardan hesaplanır
+    (bkz. grades.services.recalculate_enrollment_grades).
     """
 
     student = models.ForeignKey(
@@ -44,36 +44,29 @@ class Grade(models.Model):
     # DİNAMİK NOT HESAPLAMA
     # ========================
     def calculate_total(self):
-        components = self.component_grades.select_related("component")
-
-        if not components.exists():
+        """CourseGrade bileşenlerinden ağırlıklı toplam; eksik not varsa None"""
+        from courses.models import Enrollment
+        from grades.services import weighted_totals
+
+        enrollment_id = (
+            Enrollment.objects
+            .filter(student__user_id=self.student_id, offering_id=self.offering_id)
+            .values_list("id", flat=True)
+            .first()
+        )
+        if enrollment_id is None:
             return None
-
-        total = 0
-
-        for c in components:
-            if c.score is None:
-                return None  # tüm bileşenler girilmemişse hesaplama yok
-
-            weight = c.component.weight / 100
-            total += c.score * weight
-
-        return round(total, 2)
+        return weighted_totals([enrollment_id]).get(enrollment_id)
 
     def assign_letter_grade(self):
-        """Harf notu bulma"""
+        """Harf notu bulma (fakültenin derlenmiş skalası üzerinden)"""
         if self.total_score is None:
             return None, None
 
-        scale = LetterGradeScale.objects.filter(
-            min_score__lte=self.total_score,
-            max_score__gte=self.total_score
-        ).first()
-
-        if scale:
-            return scale.letter, scale.gpa_value
+        from grades.scales import cached_grading_systems, get_letter_scale
 
-        return "FF", 0.0
+        system = cached_grading_systems([self.offering_id])[self.offering_id]
+        return get_letter_scale(system).resolve(self.total_score)
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
@@ -83,81 +76,155 @@ class Grade(models.Model):
         return f"{self.student} → {self.offering} ({self.letter_grade})"
 
 
-# ============================================================
-# DİNAMİK NOT TABLOSU (Vize, Final, Quiz, Proje vs)
-# ============================================================
-class GradeComponent(models.Model):
-    grade = models.ForeignKey(
-        Grade,
-        on_delete=models.CASCADE,
-        related_name="component_grades"
-    )
-
-    component = models.ForeignKey(
-        CourseAssessmentComponent,
-        on_delete=models.CASCADE
-    )
-
-    score = models.FloatField(null=True, blank=True)
-
-    class Meta:
-        unique_together = ("grade", "component")
-
-    def clean(self):
-        if self.component.offering != self.grade.offering:
-            raise ValidationError(
-                "Bu bileşen, bu dersin değerlendirme sistemine ait değil."
-            )
-        
-    
-
-
-    def __str__(self):
-        return f"{self.grade.student} - {self.component.get_type_display()} : {self.score}"
-
-
 # ============================================================
 # HARF NOTU TABLOSU (AA-FF)
 # ============================================================
 class LetterGradeScale(models.Model):
 
-    letter = models.CharField(max_length=2, unique=True)
+    # FacultySettings.grading_system ile eşleşir; her fakülte kendi skalasını kullanabilir
+    system = models.CharField(max_length=50, default="AA-FF", verbose_name="Not Sistemi")
+    letter = models.CharField(max_length=2)
     min_score = models.FloatField()
     max_score = models.FloatField()
     gpa_value = models.FloatField(help_text="4.0 sistemi katsayısı")
 
     class Meta:
         ordering = ["-gpa_value"]
+        unique_together = ("system", "letter")
 
     def __str__(self):
         return f"{self.letter} ({self.min_score}-{self.max_score})"
 
 
+class LetterScaleVersion(models.Model):
+    """
+    Tek satırlık sürüm damgası. Skala, fakülte not sistemi veya ders-bölüm
+    bağı değişince artırılır; süreç içindeki derlenmiş skala ve şube → sistem
+    eşlemesi bu sürüm değişince tüm süreçlerde yeniden okunur.
+    """
+
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def bump(cls):
+        if not cls.objects.filter(pk=1).update(version=models.F("version") + 1):
+            cls.objects.get_or_create(pk=1, defaults={"version": 1})
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+
 # ============================================================
 # TRANSCRIPT / GPA HESAPLAYICI
 # ============================================================
 class TranscriptManager:
 
+    # Takvim yılı içinde dönemlerin sırası (Kış okulu Ocak'ta)
+    SEMESTER_ORDER = {"WINTER": 0, "SPRING": 1, "SUMMER": 2, "FALL": 3}
+
     @staticmethod
-    def calculate_gpa(student):
-        grades = Grade.objects.filter(
-            student=student,
-            letter_grade__isnull=False
+    def _graded(queryset):
+        """Harf notu verilmiş ve kredisi tanımlı Grade'ler"""
+        return queryset.filter(
+            letter_grade__isnull=False,
+            offering__course__credit__isnull=False,
         )
 
-        if not grades.exists():
+    @staticmethod
+    def _gpa_totals():
+        return {
+            "credits": models.Sum("offering__course__credit"),
+            "points": models.Sum(
+                models.F("gpa_value") * models.F("offering__course__credit"),
+                output_field=models.FloatField(),
+            ),
+        }
+
+    @staticmethod
+    def _gpa(points, credits):
+        if not credits:
             return 0.0
+        return round(points / credits, 2)
+
+    @staticmethod
+    def calculate_gpa(student):
+        return TranscriptManager.gpa_summary(student)["gpa"]
+
+    @staticmethod
+    def gpa_summary(student):
+        """Tek aggregate sorgusuyla {"gpa", "credits", "points"}"""
+        totals = TranscriptManager._graded(
+            Grade.objects.filter(student=student)
+        ).aggregate(**TranscriptManager._gpa_totals())
+
+        credits = totals["credits"] or 0
+        points = totals["points"] or 0.0
+        return {
+            "gpa": TranscriptManager._gpa(points, credits),
+            "credits": credits,
+            "points": round(points, 2),
+        }
 
-        total_points = 0
-        total_credits = 0
+    @staticmethod
+    def semester_gpas(student):
+        """
+        Yıl / dönem bazında gruplanmış tek sorgu. Kronolojik sırada:
+        [{"year", "semester", "credits", "term_gpa", "cumulative_credits", "cumulative_gpa"}]
+        """
+        rows = (
+            TranscriptManager._graded(Grade.objects.filter(student=student))
+            .values("offering__year", "offering__semester")
+            .annotate(**TranscriptManager._gpa_totals())
+            .order_by()
+        )
+        rows = sorted(
+            rows,
+            key=lambda r: (r["offering__year"], TranscriptManager.SEMESTER_ORDER.get(r["offering__semester"], 9)),
+        )
 
-        for g in grades:
-            credit = g.offering.course.credit
-            total_points += g.gpa_value * credit
-            total_credits += credit
+        result = []
+        running_points, running_credits = 0.0, 0
+        for row in rows:
+            running_points += row["points"] or 0.0
+            running_credits += row["credits"] or 0
+            result.append({
+                "year": row["offering__year"],
+                "semester": row["offering__semester"],
+                "credits": row["credits"] or 0,
+                "term_gpa": TranscriptManager._gpa(row["points"] or 0.0, row["credits"]),
+                "cumulative_credits": running_credits,
+                "cumulative_gpa": TranscriptManager._gpa(running_points, running_credits),
+            })
+        return result
 
-        return round(total_points / total_credits, 2)
+    @staticmethod
+    def bulk_gpa(students):
+        """
+        Öğrenci listesinin GPA'ları GROUP BY sorgusuyla: {user_id: gpa}
+        students: SimpleUser nesneleri ya da id'leri. Notu olmayanlar 0.0 döner.
+        """
+        ids = [getattr(s, "pk", s) for s in students]
+        gpas = {user_id: 0.0 for user_id in ids}
+
+        # Çok uzun IN listelerinden kaçınmak için 500'lük gruplar halinde
+        for start in range(0, len(ids), 500):
+            rows = (
+                TranscriptManager._graded(Grade.objects.filter(student_id__in=ids[start:start + 500]))
+                .values("student_id")
+                .annotate(**TranscriptManager._gpa_totals())
+                .order_by()
+            )
+            for row in rows:
+                gpas[row["student_id"]] = TranscriptManager._gpa(row["points"] or 0.0, row["credits"])
+        return gpas
 
+    @staticmethod
+    def rank_by_gpa(students):
+        """Sınıf sıralaması / onur listesi için GPA'ya göre azalan [(user_id, gpa)]"""
+        gpas = TranscriptManager.bulk_gpa(students)
+        return sorted(gpas.items(), key=lambda item: (-item[1], item[0]))
 
     @staticmethod
     def semester_grades(student, year, semester):
@@ -169,32 +236,58 @@ class TranscriptManager:
 
     @staticmethod
     def course_statistics(offering):
-        grades = Grade.objects.filter(
-            offering=offering,
-            total_score__isnull=False
-        )
+        """Şube istatistikleri; birden fazla şube için grades.statistics.grade_statistics"""
+        from grades.statistics import grade_statistics
 
-        if not grades:
-            return {}
+        return grade_statistics([offering.pk])[offering.pk]
 
-        scores = [g.total_score for g in grades]
+@receiver([post_save, post_delete], sender="courses.CourseGrade")
+def recalc_grade(sender, instance, **kwargs):
+    from grades.services import (
+        component_rebuild_pending, defer_grade_recalculation, recalculate_enrollment_grades,
+    )
 
-        return {
-            "ortalama": round(sum(scores) / len(scores), 2),
-            "min": min(scores),
-            "max": max(scores),
-            "geçen_sayısı": grades.filter(gpa_value__gt=0).count(),
-            "kalan_sayısı": grades.filter(gpa_value=0).count(),
-        }
+    # Bileşeni silinen notlar şubenin commit sonrası yeniden hesabına dahildir
+    if kwargs.get("signal") is post_delete and component_rebuild_pending(instance.component_id):
+        return
+    # deferred_grade_recalculation bloğu içinde hesap blok sonuna bırakılır
+    if defer_grade_recalculation(instance.enrollment_id):
+        return
 
-@receiver([post_save, post_delete], sender=GradeComponent)
-def recalc_grade(sender, instance, **kwargs):
-    grade = instance.grade
-    grade.total_score = grade.calculate_total()
-    if grade.total_score is not None:
-        grade.letter_grade, grade.gpa_value = grade.assign_letter_grade()
-    else:
-        grade.letter_grade = None
-        grade.gpa_value = None
-    grade.save(update_fields=["total_score", "letter_grade", "gpa_value"])
+    recalculate_enrollment_grades([instance.enrollment_id])
+
+
+@receiver([post_save, post_delete], sender="courses.CourseAssessmentComponent")
+def recalc_offering_grades(sender, instance, **kwargs):
+    from grades.services import schedule_offering_rebuild
+
+    # Ağırlık değişince şubedeki tüm toplamlar ve tamamlanma oranları değişir;
+    # hesap commit sonrasına, şube başına bir kez bırakılır
+    schedule_offering_rebuild(instance.offering_id)
+
+
+@receiver(pre_delete, sender="courses.CourseAssessmentComponent")
+def hold_cascaded_grade_recalcs(sender, instance, **kwargs):
+    from grades.services import schedule_offering_rebuild
+
+    schedule_offering_rebuild(instance.offering_id, deleted_component_id=instance.pk)
+
+
+
+@receiver([post_save, post_delete], sender=LetterGradeScale)
+@receiver([post_save, post_delete], sender="dean.FacultySettings")
+@receiver([post_save, post_delete], sender="departments.DepartmentCourse")
+@receiver([post_save, post_delete], sender="departments.Department")
+def invalidate_letter_scales(sender, **kwargs):
+    from grades.scales import letter_scales
+
+    # Sürüm artışı diğer süreçlerin önbelleğini de geçersiz kılar
+    LetterScaleVersion.bump()
+    letter_scales.clear()
+
+
+@receiver([post_save, post_delete], sender=Grade)
+def invalidate_grade_statistics_on_change(sender, instance, **kwargs):
+    from grades.statistics import invalidate_grade_statistics
 
+    invalidate_grade_statistics([instance.offering_id])
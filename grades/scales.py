@@ -0,0 +1,200 @@
+# grades/scales.py
+"""
+Derlenmiş harf notu skalası.
+
+LetterGradeScale satırları bir kez okunup sıralı sınır dizilerine çevrilir;
+puan → (harf, katsayı) eşlemesi bisect ile veritabanına gitmeden yapılır.
+Skala sistem (FacultySettings.grading_system) bazında, şube → sistem eşlemesi
+de yanında önbellekte tutulur. Değişikliklerde sinyal yerel önbelleği temizler
+ve LetterScaleVersion'ı artırır; diğer süreçler sürümü en geç
+LETTER_SCALE_VERSION_CHECK saniyede bir okuyup değişmişse önbelleği boşaltır.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from courses.models import CourseOffering
+from grades.models import LetterGradeScale, LetterScaleVersion
+
+try:
+    import numpy as np
+except ImportError:  # NumPy opsiyonel; yoksa tek tek bisect kullanılır
+    np = None
+
+DEFAULT_GRADING_SYSTEM = "AA-FF"
+
+# Hiçbir aralığa düşmeyen puanlar için (Grade.assign_letter_grade'in eski davranışı)
+FAILING_RESULT = ("FF", 0.0)
+
+
+class CompiledLetterScale:
+    """
+    Aralıklar sınır noktalarına bölünür:
+      at_point[i]  — puan tam olarak bounds[i] ise sonuç
+      between[i]   — bounds[i] < puan < bounds[i+1] ise sonuç
+    Çakışan aralıklarda en yüksek katsayılı aralık kazanır (eski sorgu ile aynı).
+    """
+
+    def __init__(self, rows):
+        # rows: [(letter, min_score, max_score, gpa_value)] — gpa_value azalan sırada
+        self.rows = list(rows)
+        self.bounds = sorted({v for _, lo, hi, _ in self.rows for v in (lo, hi)})
+        self.at_point = [self._winner(v) for v in self.bounds]
+        self.between = [
+            self._winner((self.bounds[i] + self.bounds[i + 1]) / 2)
+            for i in range(len(self.bounds) - 1)
+        ]
+
+    def _winner(self, score):
+        for letter, min_score, max_score, gpa_value in self.rows:
+            if min_score <= score <= max_score:
+                return letter, gpa_value
+        return FAILING_RESULT
+
+    def resolve(self, score):
+        """Tek puan için (harf, katsayı); puan None ise (None, None)."""
+        if score is None:
+            return None, None
+        i = bisect_left(self.bounds, score)
+        if i < len(self.bounds) and self.bounds[i] == score:
+            return self.at_point[i]
+        if i == 0 or i == len(self.bounds):
+            return FAILING_RESULT
+        return self.between[i - 1]
+
+    def resolve_many(self, scores):
+        """
+        Bir şubenin tüm puanları için sonuç listesi. NumPy varsa sınır
+        araması searchsorted ile tek seferde yapılır.
+        """
+        scores = list(scores)
+        if np is None or not self.bounds:
+            return [self.resolve(s) for s in scores]
+
+        present = [i for i, s in enumerate(scores) if s is not None]
+        values = np.array([scores[i] for i in present], dtype=float)
+        bounds = np.array(self.bounds, dtype=float)
+        idx = np.searchsorted(bounds, values, side="left")
+        exact = (idx < len(bounds)) & (bounds[np.minimum(idx, len(bounds) - 1)] == values)
+
+        results = [(None, None)] * len(scores)
+        for pos, i, is_exact in zip(present, idx.tolist(), exact.tolist()):
+            if is_exact:
+                results[pos] = self.at_point[i]
+            elif i == 0 or i == len(self.bounds):
+                results[pos] = FAILING_RESULT
+            else:
+                results[pos] = self.between[i - 1]
+        return results
+
+
+class LetterScaleCache:
+    """
+    Sistem adı → CompiledLetterScale ve şube id → sistem adı. Sinyalle ve
+    veritabanındaki sürüm damgası değişince temizlenir.
+    """
+
+    def __init__(self, check_interval=5):
+        self.check_interval = check_interval
+        self._scales = {}
+        self._systems = {}
+        self._version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        """Kontrol aralığı dolduysa sürümü okur; başka süreç artırdıysa önbelleği boşaltır."""
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return
+
+        version = LetterScaleVersion.current()
+        with self._lock:
+            if version != self._version:
+                self._scales.clear()
+                self._systems.clear()
+                self._version = version
+            self._checked_at = now
+
+    def get(self, system):
+        self._sync()
+        with self._lock:
+            cached = self._scales.get(system)
+        if cached is not None:
+            return cached
+
+        scale = self._load(system)
+        with self._lock:
+            self._scales[system] = scale
+        return scale
+
+    def systems_for(self, offering_ids):
+        """{offering_id: not sistemi}; önbellekte olmayan şubeler tek sorguda okunur."""
+        self._sync()
+        with self._lock:
+            systems = {oid: self._systems[oid] for oid in offering_ids if oid in self._systems}
+        missing = [oid for oid in offering_ids if oid not in systems]
+        if missing:
+            loaded = grading_systems_for_offerings(missing)
+            with self._lock:
+                self._systems.update(loaded)
+            systems.update(loaded)
+        return systems
+
+    def _load(self, system):
+        rows = list(
+            LetterGradeScale.objects
+            .filter(system=system)
+            .order_by("-gpa_value", "id")
+            .values_list("letter", "min_score", "max_score", "gpa_value")
+        )
+        # Fakültenin sistemi için skala tanımlanmamışsa varsayılan skala kullanılır
+        if not rows and system != DEFAULT_GRADING_SYSTEM:
+            return self.get(DEFAULT_GRADING_SYSTEM)
+        return CompiledLetterScale(rows)
+
+    def clear(self):
+        # Sürüm bir sonraki erişimde yeniden okunur
+        with self._lock:
+            self._scales.clear()
+            self._systems.clear()
+            self._checked_at = None
+
+
+letter_scales = LetterScaleCache(getattr(settings, "LETTER_SCALE_VERSION_CHECK", 5))
+
+
+def get_letter_scale(system=DEFAULT_GRADING_SYSTEM):
+    return letter_scales.get(system or DEFAULT_GRADING_SYSTEM)
+
+
+def cached_grading_systems(offering_ids):
+    """grading_systems_for_offerings'in önbellekli hâli."""
+    return letter_scales.systems_for(list(offering_ids))
+
+
+def grading_systems_for_offerings(offering_ids):
+    """
+    {offering_id: not sistemi} — dersin bağlı olduğu bölümün fakültesindeki
+    FacultySettings.grading_system; ayar yoksa varsayılan sistem.
+    """
+    systems = {oid: DEFAULT_GRADING_SYSTEM for oid in offering_ids}
+    rows = (
+        CourseOffering.objects
+        .filter(
+            id__in=list(systems),
+            course__course_departments__department__faculty__facultysettings__isnull=False,
+        )
+        .order_by("id", "-course__course_departments__department_id")
+        .values_list(
+            "id",
+            "course__course_departments__department__faculty__facultysettings__grading_system",
+        )
+    )
+    # Birden fazla bölüme bağlı derste en küçük id'li bölüm esas alınır
+    for offering_id, system in rows:
+        systems[offering_id] = system or DEFAULT_GRADING_SYSTEM
+    return systems
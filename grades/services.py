@@ -0,0 +1,265 @@
+# grades/services.py
+"""
+Grade satırları courses.CourseGrade'den türetilir.
+
+Bileşen notları tek yerde — CourseGrade (kayıt × bileşen) — tutulur;
+outcomes motoru da aynı satırları okur. Grade, (öğrenci, şube) başına
+toplam puan / harf notu / katsayıyı saklayan hesaplanmış tablodur ve
+CourseGrade değiştikçe recalculate_enrollment_grades ile güncellenir.
+Aynı geçişte Enrollment.weighted_total / completeness sütunları da yazılır.
+
+Harf notu ve katsayı sadece şubenin tüm bileşenleri notlandığında
+(completeness == 100) verilir; dönem ortasındaki kısmi toplam gösterim için
+total_score'da durur ama GPA / geçme oranlarına FF olarak girmez.
+"""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+
+from courses.models import CourseAssessmentComponent, CourseGrade, Enrollment
+from grades.models import Grade
+from grades.scales import cached_grading_systems, get_letter_scale
+from grades.signals import grades_recalculated
+from grades.statistics import invalidate_grade_statistics
+
+# Toplu yeniden hesaplamada tek sorguya giren kayıt (Enrollment) sayısı
+GRADE_RECALC_BATCH_SIZE = 500
+
+SCORE_QUANTUM = Decimal("0.01")
+
+# Harf notu verilebilmesi için gereken tamamlanma oranı
+COMPLETE = Decimal("100.00")
+
+_deferred = threading.local()
+_pending_rebuild = threading.local()
+
+
+def defer_grade_recalculation(enrollment_id):
+    """
+    Ertelenmiş bir blok içindeysek enrollment_id'yi kirli olarak işaretler ve True döner.
+    recalc_grade sinyali bu sayede her satırda hesap yapmaz.
+    """
+    dirty = getattr(_deferred, "dirty", None)
+    if dirty is None:
+        return False
+    dirty.add(enrollment_id)
+    return True
+
+
+@contextmanager
+def deferred_grade_recalculation():
+    """
+    Blok boyunca CourseGrade kayıt/silmelerinde Grade yeniden hesaplanmaz;
+    etkilenen kayıtların Grade'leri blok sonunda tek seferde hesaplanıp yazılır.
+
+    bulk_create / bulk_update sinyal tetiklemediği için, bu işlemlerle
+    değişen Enrollment id'leri dönen kümeye elle eklenmelidir:
+
+        with deferred_grade_recalculation() as dirty:
+            CourseGrade.objects.bulk_create(rows)
+            dirty.update(r.enrollment_id for r in rows)
+
+    İç içe bloklarda hesaplama en dıştaki blok bitince yapılır. Blok hata
+    ile biterse hesaplama yapılmaz.
+    """
+    if getattr(_deferred, "dirty", None) is not None:
+        yield _deferred.dirty
+        return
+
+    dirty = _deferred.dirty = set()
+    try:
+        yield dirty
+    finally:
+        _deferred.dirty = None
+
+    recalculate_enrollment_grades(dirty)
+
+
+def _component_scores(enrollment_ids):
+    """
+    {enrollment_id: {component_id: (puan, ağırlık)}} — bileşen sırasında.
+    """
+    cells = {}
+    rows = (
+        CourseGrade.objects
+        .filter(enrollment_id__in=enrollment_ids)
+        .order_by("id")
+        .values_list("enrollment_id", "component_id", "score", "component__weight")
+    )
+    for enrollment_id, component_id, score, weight in rows:
+        cells.setdefault(enrollment_id, {})[component_id] = (score, weight)
+    return cells
+
+
+def _total(components):
+    """Grade.total_score: Σ puan × ağırlık / 100; eksik (None) not varsa None"""
+    total = 0
+    for score, weight in components.values():
+        if score is None:
+            return None
+        total += float(score) * (weight / 100)
+    return round(total, 2)
+
+
+def _progress(components, offering_weight):
+    """(weighted_total, completeness) — sadece girilmiş notlar üzerinden"""
+    entered = [(score, weight) for score, weight in components.values() if score is not None]
+    if not entered:
+        return None, Decimal("0.00")
+
+    weighted_total = sum(score * weight for score, weight in entered) / 100
+    graded_weight = sum(weight for _, weight in entered)
+    completeness = min(Decimal(graded_weight * 100) / offering_weight, Decimal(100)) if offering_weight else Decimal(0)
+    return weighted_total.quantize(SCORE_QUANTUM), completeness.quantize(SCORE_QUANTUM)
+
+
+def weighted_totals(enrollment_ids):
+    """{enrollment_id: Grade toplamı}; hiç notu olmayan kayıt sonuçta yer almaz"""
+    return {
+        enrollment_id: _total(components)
+        for enrollment_id, components in _component_scores(enrollment_ids).items()
+    }
+
+
+def recalculate_enrollment_grades(enrollment_ids):
+    """
+    Verilen kayıtların Grade satırlarını ve Enrollment.weighted_total /
+    completeness sütunlarını CourseGrade'den set-based olarak hesaplar.
+    Bileşen notları tek seferde okunur, harf notu tüm bileşenler notlandıysa
+    fakültenin derlenmiş skalasından bulunur; Grade'i olmayan notlu kayıtlar için satır açılır, mevcut satırlardan
+    sadece değişenler yazılır.
+    Dönen: oluşturulan + güncellenen Grade sayısı
+    """
+    enrollment_ids = sorted(set(enrollment_ids))
+    if not enrollment_ids:
+        return 0
+
+    written = 0
+    changed_offerings = set()
+    for start in range(0, len(enrollment_ids), GRADE_RECALC_BATCH_SIZE):
+        chunk = enrollment_ids[start:start + GRADE_RECALC_BATCH_SIZE]
+
+        cells = _component_scores(chunk)
+        enrollments = list(
+            Enrollment.objects
+            .filter(id__in=chunk)
+            .values_list("id", "student__user_id", "offering_id", "weighted_total", "completeness")
+        )
+        if not enrollments:
+            continue
+        offering_ids = {offering_id for _, _, offering_id, _, _ in enrollments}
+        offering_weights = dict(
+            CourseAssessmentComponent.objects
+            .filter(offering_id__in=offering_ids)
+            .values("offering_id")
+            .annotate(total=Sum("weight"))
+            .order_by()
+            .values_list("offering_id", "total")
+        )
+
+        progress, complete = [], set()
+        for enrollment_id, _, offering_id, weighted_total, completeness in enrollments:
+            values = _progress(cells.get(enrollment_id, {}), offering_weights.get(offering_id))
+            if values[1] >= COMPLETE:
+                complete.add(enrollment_id)
+            if (weighted_total, completeness) != values:
+                progress.append(Enrollment(id=enrollment_id, weighted_total=values[0], completeness=values[1]))
+        if progress:
+            Enrollment.objects.bulk_update(progress, ["weighted_total", "completeness"])
+
+        existing = {
+            (g.student_id, g.offering_id): g
+            for g in Grade.objects.filter(
+                student_id__in={user_id for _, user_id, _, _, _ in enrollments},
+                offering_id__in=offering_ids,
+            ).only("id", "student_id", "offering_id", "total_score", "letter_grade", "gpa_value")
+        }
+        systems = cached_grading_systems(offering_ids)
+
+        to_create, to_update = [], []
+        for enrollment_id, user_id, offering_id, _, _ in enrollments:
+            grade = existing.get((user_id, offering_id))
+            # Hiç notu girilmemiş kayıt için boş Grade açılmaz
+            if grade is None and enrollment_id not in cells:
+                continue
+
+            total = _total(cells[enrollment_id]) if enrollment_id in cells else None
+            # Eksik bileşen varken harf notu yayınlanmaz (kısmi toplam FF sayılmasın)
+            if enrollment_id in complete:
+                letter, gpa_value = get_letter_scale(systems[offering_id]).resolve(total)
+            else:
+                letter, gpa_value = None, None
+
+            if grade is None:
+                to_create.append(Grade(
+                    student_id=user_id, offering_id=offering_id,
+                    total_score=total, letter_grade=letter, gpa_value=gpa_value,
+                ))
+            elif (grade.total_score, grade.letter_grade, grade.gpa_value) != (total, letter, gpa_value):
+                grade.total_score, grade.letter_grade, grade.gpa_value = total, letter, gpa_value
+                to_update.append(grade)
+
+        if to_create:
+            Grade.objects.bulk_create(to_create)
+        if to_update:
+            Grade.objects.bulk_update(to_update, ["total_score", "letter_grade", "gpa_value"])
+
+        changed = to_create + to_update
+        if changed:
+            # bulk işlemler sinyal göndermez; istatistik sürümü elle artırılır
+            invalidate_grade_statistics({g.offering_id for g in changed})
+            changed_offerings.update(g.offering_id for g in changed)
+            written += len(changed)
+
+    if changed_offerings:
+        grades_recalculated.send(sender=Grade, offering_ids=changed_offerings)
+
+    return written
+
+
+def _flush_offering_rebuilds():
+    """Commit sonrası bekleyen şubelerin Grade'leri tek geçişte yeniden hesaplanır."""
+    pending = getattr(_pending_rebuild, "changes", None)
+    _pending_rebuild.changes = None
+    if pending is not None:
+        rebuild_grades(pending[0])
+
+
+def schedule_offering_rebuild(offering_id, deleted_component_id=None):
+    """
+    Bileşen değişince şubenin Grade'leri commit sonrası bir kez yeniden
+    hesaplanır; aynı transaction'daki tüm bileşen değişiklikleri tek
+    yeniden hesaplamada toplanır. Silinen bileşenin cascade ile silinen
+    CourseGrade satırları için ayrıca satır satır hesap yapılmaz.
+    """
+    pending = getattr(_pending_rebuild, "changes", None)
+    if pending is None or not transaction.get_connection().in_atomic_block:
+        # Transaction dışında kalan küme geri alınmış bir transaction'dan artakalmıştır
+        pending = _pending_rebuild.changes = (set(), set())
+    pending[0].add(offering_id)
+    if deleted_component_id is not None:
+        pending[1].add(deleted_component_id)
+
+    # Her çağrı kendi callback'ini kaydeder (savepoint geri alınırsa onunla düşer);
+    # ilk çalışan kümeyi boşaltır, diğerleri boş geçer
+    transaction.on_commit(_flush_offering_rebuilds)
+
+
+def component_rebuild_pending(component_id):
+    """Bileşen silinirken cascade ile silinen notların şube yeniden hesabını bekleyip beklemediği"""
+    pending = getattr(_pending_rebuild, "changes", None)
+    return pending is not None and component_id in pending[1]
+
+
+def rebuild_grades(offering_ids=None):
+    """
+    Tüm (ya da verilen şubelerdeki) kayıtların Grade satırlarını
+    CourseGrade'den yeniden hesaplar. Dönen: yazılan Grade sayısı
+    """
+    enrollments = Enrollment.objects.all()
+    if offering_ids is not None:
+        enrollments = enrollments.filter(offering_id__in=list(offering_ids))
+    return recalculate_enrollment_grades(enrollments.values_list("id", flat=True))
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Toplu not hesaplamalarından sonra gönderilir (bulk_update post_save tetiklemez).
+# Argüman: offering_ids — notları değişen şubelerin id kümesi
+grades_recalculated = Signal()
@@ -0,0 +1,155 @@
+# grades/statistics.py
+"""
+Şube / ders bazında not istatistikleri.
+
+İstenen tüm şubeler (ya da dersler) için ortalama, min, max, standart sapma,
+geçen/kalan sayısı GROUP BY ile tek sorguda; harf notu dağılımı ikinci,
+yüzdelikler üçüncü sorguda hesaplanır — şube sayısından bağımsız olarak.
+Sonuçlar Django cache'inde tutulur. Anahtar, şubenin / dersin
+grade_stats_version sütununu içerir; bir Grade değişince sürüm veritabanında
+artırılır (bkz. invalidate_grade_statistics). Böylece süreç içi (LocMem)
+önbellek kullanan diğer worker'lar da bir sonraki okumada yeni anahtara
+geçer; eski girdiler GRADE_STATISTICS_CACHE_TIMEOUT sonunda düşer.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, FloatField, Max, Min, Q
+
+from courses.models import Course, CourseOffering
+from grades.models import Grade
+
+# Gruplanabilecek alanlar: istatistik şube ya da ders bazında istenebilir
+STAT_GROUPS = {
+    "offering": "offering_id",
+    "course": "offering__course_id",
+}
+
+STAT_QUANTILES = (25, 50, 75, 90)
+
+STAT_BATCH_SIZE = 500
+
+# Sürüm sütununun tutulduğu model
+STAT_VERSION_MODELS = {
+    "offering": CourseOffering,
+    "course": Course,
+}
+
+
+def _cache_key(by, key_id, version):
+    return f"grade_stats:{by}:{key_id}:v{version}"
+
+
+def _versions(ids, by):
+    """{id: grade_stats_version} — tek sorgu; olmayan id için 0"""
+    versions = dict.fromkeys(ids, 0)
+    versions.update(
+        STAT_VERSION_MODELS[by].objects
+        .filter(pk__in=ids)
+        .values_list("pk", "grade_stats_version")
+    )
+    return versions
+
+
+def _quantile(ordered, pct):
+    """Sıralı listede doğrusal enterpolasyonlu yüzdelik."""
+    if len(ordered) == 1:
+        return ordered[0]
+    pos = (len(ordered) - 1) * pct / 100
+    low = math.floor(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def _compute(ids, field):
+    stats = {}
+    for start in range(0, len(ids), STAT_BATCH_SIZE):
+        chunk = ids[start:start + STAT_BATCH_SIZE]
+        # Harf notu verilmemiş (eksik bileşenli) kısmi toplamlar sonuç sayılmaz
+        graded = Grade.objects.filter(**{f"{field}__in": chunk}, letter_grade__isnull=False)
+
+        rows = (
+            graded.values(field)
+            .annotate(
+                count=Count("id"),
+                mean=Avg("total_score"),
+                low=Min("total_score"),
+                high=Max("total_score"),
+                mean_sq=Avg(F("total_score") * F("total_score"), output_field=FloatField()),
+                passed=Count("id", filter=Q(gpa_value__gt=0)),
+                failed=Count("id", filter=Q(gpa_value=0)),
+            )
+            .order_by()
+        )
+        for row in rows:
+            variance = max(row["mean_sq"] - row["mean"] ** 2, 0.0)
+            stats[row[field]] = {
+                "öğrenci_sayısı": row["count"],
+                "ortalama": round(row["mean"], 2),
+                "min": row["low"],
+                "max": row["high"],
+                "std_sapma": round(math.sqrt(variance), 2),
+                "geçen_sayısı": row["passed"],
+                "kalan_sayısı": row["failed"],
+                "histogram": {},
+                "yüzdelikler": {},
+            }
+
+        letters = (
+            graded
+            .values(field, "letter_grade")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for row in letters:
+            stats[row[field]]["histogram"][row["letter_grade"]] = row["count"]
+
+        scores = {}
+        for key_id, score in graded.order_by(field, "total_score").values_list(field, "total_score"):
+            scores.setdefault(key_id, []).append(score)
+        for key_id, ordered in scores.items():
+            stats[key_id]["yüzdelikler"] = {
+                f"p{pct}": round(_quantile(ordered, pct), 2) for pct in STAT_QUANTILES
+            }
+
+    return stats
+
+
+def grade_statistics(ids, by="offering"):
+    """
+    {id: istatistik} — by="offering" için şube id'leri, by="course" için ders id'leri.
+    Notu olmayan şube/ders için {} döner (TranscriptManager.course_statistics ile aynı).
+    """
+    field = STAT_GROUPS[by]
+    ids = list(dict.fromkeys(ids))
+    keys = {key_id: _cache_key(by, key_id, version) for key_id, version in _versions(ids, by).items()}
+
+    cached = cache.get_many(list(keys.values()))
+    result = {key_id: cached[key] for key_id, key in keys.items() if key in cached}
+
+    missing = [key_id for key_id in ids if key_id not in result]
+    if missing:
+        computed = _compute(missing, field)
+        fresh = {key_id: computed.get(key_id, {}) for key_id in missing}
+        cache.set_many(
+            {keys[key_id]: value for key_id, value in fresh.items()},
+            getattr(settings, "GRADE_STATISTICS_CACHE_TIMEOUT", 3600),
+        )
+        result.update(fresh)
+
+    return result
+
+
+def invalidate_grade_statistics(offering_ids):
+    """
+    Şubelerin ve bağlı oldukları derslerin istatistik sürümünü artırır;
+    tüm süreçlerdeki önbellek girdileri bir sonraki okumada geçersiz olur.
+    """
+    offering_ids = set(offering_ids)
+    if not offering_ids:
+        return
+    CourseOffering.objects.filter(id__in=offering_ids).update(grade_stats_version=F("grade_stats_version") + 1)
+    Course.objects.filter(
+        id__in=CourseOffering.objects.filter(id__in=offering_ids).values("course_id")
+    ).update(grade_stats_version=F("grade_stats_version") + 1)
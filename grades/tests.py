@@ -1,3 +1,337 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db.models import F
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import SimpleUser
+from academics.models import Level
+from courses.models import Course, CourseOffering, CourseAssessmentComponent, CourseGrade, Enrollment
+from courses.services import save_grade_grid
+from dean.models import FacultySettings
+from departments.models import Department, DepartmentCourse, Faculty
+from students.models import Student
+from .exports import faculty_gpa_export
+from .models import Grade, LetterGradeScale, LetterScaleVersion, TranscriptManager
+from .statistics import grade_statistics
+from .scales import CompiledLetterScale, cached_grading_systems, get_letter_scale, letter_scales
+from .services import deferred_grade_recalculation, rebuild_grades, recalculate_enrollment_grades
+
+
+class DeferredGradeRecalculationTest(TestCase):
+
+    def setUp(self):
+        level = Level.objects.create(number=1, name="1. Sınıf")
+        course = Course.objects.create(code="CSE101", name="Programlama", level=level, course_type="DEPARTMENT")
+        self.offering = CourseOffering.objects.create(course=course, year=2025, semester="FALL")
+        self.midterm = CourseAssessmentComponent.objects.create(offering=self.offering, type="MIDTERM", weight=40)
+        self.final = CourseAssessmentComponent.objects.create(offering=self.offering, type="FINAL", weight=60)
+
+        LetterGradeScale.objects.create(letter="AA", min_score=90, max_score=100, gpa_value=4.0)
+        LetterGradeScale.objects.create(letter="BB", min_score=70, max_score=89.99, gpa_value=3.0)
+        LetterGradeScale.objects.create(letter="CC", min_score=50, max_score=69.99, gpa_value=2.0)
+
+        self.enrollments = []
+        for i in range(3):
+            user = SimpleUser.objects.create(username=f"ogr{i}", password="x", role="STUDENT")
+            student = Student.objects.create(user=user, student_no=f"S{i}")
+            self.enrollments.append(Enrollment.objects.create(student=student, offering=self.offering))
+
+    def _grade(self, enrollment):
+        return Grade.objects.get(student=enrollment.student.user, offering=self.offering)
+
+    def test_signal_recalculates_each_save_outside_block(self):
+        enrollment = self.enrollments[0]
+        self.assertFalse(Grade.objects.exists())
+
+        CourseGrade.objects.create(enrollment=enrollment, component=self.midterm, score=80)
+        grade = self._grade(enrollment)
+        # Final girilmeden kısmi toplam gösterilir ama harf notu verilmez
+        self.assertEqual((grade.total_score, grade.letter_grade, grade.gpa_value), (32.0, None, None))
+
+        CourseGrade.objects.create(enrollment=enrollment, component=self.final, score=100)
+        grade.refresh_from_db()
+        self.assertEqual((grade.total_score, grade.letter_grade, grade.gpa_value), (92.0, "AA", 4.0))
+        self.assertEqual(grade.calculate_total(), 92.0)
+
+    def test_component_changes_rebuild_offering_once_after_commit(self):
+        save_grade_grid(self.offering, {
+            (enrollment.id, comp.id): Decimal(score)
+            for enrollment in self.enrollments
+            for comp, score in [(self.midterm, "50"), (self.final, "95")]
+        })
+
+        with patch("grades.services.recalculate_enrollment_grades",
+                   wraps=recalculate_enrollment_grades) as recalc:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.midterm.weight = 100
+                self.midterm.save()
+                # Silinen bileşenin notları cascade ile silinir; satır satır hesap yapılmaz
+                self.final.delete()
+                self.assertEqual(recalc.call_count, 0)
+
+        self.assertEqual(recalc.call_count, 1)
+        grade = self._grade(self.enrollments[0])
+        self.assertEqual((grade.total_score, grade.letter_grade), (50.0, "CC"))
+
+    def test_block_recalculates_once_at_exit(self):
+        with deferred_grade_recalculation() as dirty:
+            for enrollment, (midterm, final) in zip(self.enrollments, [(80, 100), (60, 75), (50, None)]):
+                CourseGrade.objects.create(enrollment=enrollment, component=self.midterm, score=midterm)
+                CourseGrade.objects.create(enrollment=enrollment, component=self.final, score=final)
+
+            self.assertEqual(dirty, {e.id for e in self.enrollments})
+            self.assertFalse(Grade.objects.exists())
+
+        results = [
+            (g.total_score, g.letter_grade, g.gpa_value)
+            for g in map(self._grade, self.enrollments)
+        ]
+        self.assertEqual(results, [(92.0, "AA", 4.0), (69.0, "CC", 2.0), (None, None, None)])
+
+    def test_partially_graded_student_excluded_from_gpa(self):
+        Course.objects.filter(pk=self.offering.course_id).update(credit=4)
+        done, partial = self.enrollments[:2]
+        save_grade_grid(self.offering, {
+            (done.id, self.midterm.id): Decimal("80"),
+            (done.id, self.final.id): Decimal("100"),
+            (partial.id, self.midterm.id): Decimal("80"),
+        })
+
+        partial.refresh_from_db()
+        self.assertEqual((partial.weighted_total, partial.completeness), (Decimal("32.00"), Decimal("40.00")))
+        self.assertEqual(
+            (self._grade(partial).total_score, self._grade(partial).letter_grade), (32.0, None)
+        )
+        self.assertEqual(TranscriptManager.calculate_gpa(partial.student.user), 0.0)
+        self.assertEqual(TranscriptManager.calculate_gpa(done.student.user), 4.0)
+        self.assertEqual(grade_statistics([self.offering.id])[self.offering.id]["histogram"], {"AA": 1})
+
+        # Final girilince harf notu yayınlanır
+        save_grade_grid(self.offering, {(partial.id, self.final.id): Decimal("100")})
+        self.assertEqual(self._grade(partial).letter_grade, "AA")
+        self.assertEqual(TranscriptManager.calculate_gpa(partial.student.user), 4.0)
+
+    def test_grid_save_and_query_count(self):
+        cells = {
+            (enrollment.id, comp.id): Decimal(score)
+            for enrollment in self.enrollments
+            for comp, score in [(self.midterm, "90"), (self.final, "95")]
+        }
+        save_grade_grid(self.offering, cells)
+
+        self.assertEqual(
+            set(Grade.objects.values_list("letter_grade", flat=True)), {"AA"}
+        )
+        # Bileşenler + kayıtlar + ağırlıklar + grade'ler; not sistemi önbellekte,
+        # değişiklik yoksa yazma yapılmaz
+        with self.assertNumQueries(4):
+            self.assertEqual(recalculate_enrollment_grades(e.id for e in self.enrollments), 0)
+
+        CourseGrade.objects.filter(enrollment=self.enrollments[0], component=self.final).update(score=50)
+        self.assertEqual(rebuild_grades([self.offering.id]), 1)
+        self.assertEqual(self._grade(self.enrollments[0]).letter_grade, "CC")
+
+
+class LetterScaleResolverTest(TestCase):
+
+    def setUp(self):
+        for letter, lo, hi, gpa in [("AA", 90, 100, 4.0), ("BA", 85, 89.99, 3.5), ("BB", 75, 84.99, 3.0)]:
+            LetterGradeScale.objects.create(letter=letter, min_score=lo, max_score=hi, gpa_value=gpa)
+
+    def test_matches_range_query(self):
+        scale = get_letter_scale()
+        for score in [0, 74.99, 75, 80, 84.99, 84.995, 85, 89.99, 90, 100, 100.5]:
+            expected = LetterGradeScale.objects.filter(min_score__lte=score, max_score__gte=score).first()
+            expected = (expected.letter, expected.gpa_value) if expected else ("FF", 0.0)
+            self.assertEqual(scale.resolve(score), expected, score)
+
+    def test_overlapping_ranges_prefer_highest_gpa(self):
+        scale = CompiledLetterScale([("AA", 80, 100, 4.0), ("BB", 70, 85, 3.0)])
+        self.assertEqual(scale.resolve(82), ("AA", 4.0))
+        self.assertEqual(scale.resolve(75), ("BB", 3.0))
+        expected = [("AA", 4.0), (None, None), ("BB", 3.0), ("FF", 0.0)]
+        self.assertEqual(scale.resolve_many([82, None, 75, 10]), expected)
+        # NumPy yokken tek tek bisect yoluna düşer
+        with patch("grades.scales.np", None):
+            self.assertEqual(scale.resolve_many([82, None, 75, 10]), expected)
+
+    def test_no_queries_after_compile_and_admin_change_invalidates(self):
+        get_letter_scale()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_letter_scale().resolve(86), ("BA", 3.5))
+
+        LetterGradeScale.objects.filter(letter="BA").get().delete()
+        self.assertEqual(get_letter_scale().resolve(86), ("FF", 0.0))
+
+    def test_faculty_grading_system(self):
+        faculty = Faculty.objects.create(full_name="Tıp")
+        department = Department.objects.create(code="MED", name="Tıp", faculty=faculty)
+        level = Level.objects.create(number=1, name="1. Sınıf")
+        course = Course.objects.create(code="MED101", name="Anatomi", level=level, course_type="DEPARTMENT")
+        DepartmentCourse.objects.create(department=department, course=course)
+        offering = CourseOffering.objects.create(course=course, year=2025, semester="FALL")
+        other = CourseOffering.objects.create(
+            course=Course.objects.create(code="GEN101", name="Genel", level=level, course_type="POOL"),
+            year=2025, semester="FALL",
+        )
+
+        FacultySettings.objects.create(faculty=faculty, grading_system="GECTI-KALDI")
+        LetterGradeScale.objects.create(system="GECTI-KALDI", letter="G", min_score=60, max_score=100, gpa_value=4.0)
+
+        systems = cached_grading_systems([offering.id, other.id])
+        self.assertEqual(systems, {offering.id: "GECTI-KALDI", other.id: "AA-FF"})
+        self.assertEqual(get_letter_scale(systems[offering.id]).resolve(86), ("G", 4.0))
+        self.assertEqual(get_letter_scale(systems[other.id]).resolve(86), ("BA", 3.5))
+        # Skala tanımlanmamış sistem varsayılana düşer
+        self.assertEqual(get_letter_scale("YOK").resolve(86), ("BA", 3.5))
+
+        # Sistem eşlemesi de önbellekte; fakülte ayarı değişince temizlenir
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_grading_systems([offering.id])[offering.id], "GECTI-KALDI")
+        FacultySettings.objects.filter(faculty=faculty).get().delete()
+        self.assertEqual(cached_grading_systems([offering.id])[offering.id], "AA-FF")
+
+    def test_version_bump_from_another_process_reloads(self):
+        self.assertEqual(get_letter_scale().resolve(86), ("BA", 3.5))
+
+        # Başka süreçteki değişiklik: sinyal bu süreçte çalışmaz, sadece satırlar ve sürüm değişir
+        LetterGradeScale.objects.filter(letter="BA").update(min_score=87)
+        LetterScaleVersion.objects.filter(pk=1).update(version=F("version") + 1)
+        self.assertEqual(get_letter_scale().resolve(86), ("BA", 3.5))
+
+        letter_scales._checked_at -= letter_scales.check_interval
+        self.assertEqual(get_letter_scale().resolve(86), ("FF", 0.0))
+
+
+class TranscriptGpaTest(TestCase):
+
+    def setUp(self):
+        level = Level.objects.create(number=1, name="1. Sınıf")
+        self.student = SimpleUser.objects.create(username="ogr", password="x", role="STUDENT")
+        self.other = SimpleUser.objects.create(username="ogr2", password="x", role="STUDENT")
+
+        def graded(user, code, credit, year, semester, letter, gpa):
+            course = Course.objects.get_or_create(
+                code=code, defaults={"name": code, "level": level, "course_type": "DEPARTMENT", "credit": credit}
+            )[0]
+            offering = CourseOffering.objects.create(course=course, year=year, semester=semester)
+            Grade.objects.create(student=user, offering=offering, letter_grade=letter, gpa_value=gpa)
+
+        graded(self.student, "C1", 4, 2024, "FALL", "AA", 4.0)
+        graded(self.student, "C2", 3, 2025, "SPRING", "CC", 2.0)
+        graded(self.student, "C3", 2, 2025, "SPRING", "BB", 3.0)
+        graded(self.other, "C1", 4, 2024, "FALL", "BB", 3.0)
+
+        # Harf notu verilmemiş kayıt hesaba katılmaz
+        Grade.objects.create(
+            student=self.student,
+            offering=CourseOffering.objects.create(course=Course.objects.get(code="C3"), year=2025, semester="FALL"),
+        )
+
+    def test_gpa_in_single_query(self):
+        with self.assertNumQueries(1):
+            summary = TranscriptManager.gpa_summary(self.student)
+        # (16 + 6 + 6) / 9
+        self.assertEqual(summary, {"gpa": 3.11, "credits": 9, "points": 28.0})
+        self.assertEqual(TranscriptManager.calculate_gpa(self.student), 3.11)
+
+    def test_semester_gpas(self):
+        with self.assertNumQueries(1):
+            terms = TranscriptManager.semester_gpas(self.student)
+
+        self.assertEqual([(t["year"], t["semester"]) for t in terms], [(2024, "FALL"), (2025, "SPRING")])
+        self.assertEqual(terms[0]["term_gpa"], 4.0)
+        self.assertEqual(terms[1]["term_gpa"], 2.4)
+        self.assertEqual(terms[1]["cumulative_gpa"], 3.11)
+        self.assertEqual(terms[1]["cumulative_credits"], 9)
+
+    def test_bulk_gpa_and_ranking(self):
+        nobody = SimpleUser.objects.create(username="yeni", password="x", role="STUDENT")
+
+        with self.assertNumQueries(1):
+            gpas = TranscriptManager.bulk_gpa([self.student, self.other.id, nobody])
+
+        self.assertEqual(gpas, {self.student.id: 3.11, self.other.id: 3.0, nobody.id: 0.0})
+        self.assertEqual(
+            [user_id for user_id, _ in TranscriptManager.rank_by_gpa([nobody, self.other, self.student])],
+            [self.student.id, self.other.id, nobody.id],
+        )
+
+
+    def test_faculty_gpa_export_counts_each_student_once(self):
+        faculty = Faculty.objects.create(full_name="Mühendislik")
+        cse = Department.objects.create(code="CSE", name="Bilgisayar", faculty=faculty)
+        swe = Department.objects.create(code="SWE", name="Yazılım", faculty=faculty)
+
+        # İki bölüme kayıtlı öğrencinin notları iki kez toplanmamalı
+        student = Student.objects.create(user=self.student, student_no="100")
+        student.departments.add(cse, swe)
+        Student.objects.create(user=self.other, student_no="200").departments.add(swe)
+
+        header, rows = faculty_gpa_export(faculty)
+        self.assertEqual(header, ["student_no", "ad_soyad", "bölüm", "kredi", "gpa"])
+        self.assertEqual(list(rows), [["100", "ogr", "CSE", 9, 3.11], ["200", "ogr2", "SWE", 4, 3.0]])
+
+
+class GradeStatisticsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        level = Level.objects.create(number=1, name="1. Sınıf")
+        self.course = Course.objects.create(code="CSE101", name="Programlama", level=level, course_type="DEPARTMENT")
+        self.a = CourseOffering.objects.create(course=self.course, year=2025, semester="FALL", section="A")
+        self.b = CourseOffering.objects.create(course=self.course, year=2025, semester="FALL", section="B")
+        self.empty = CourseOffering.objects.create(course=self.course, year=2024, semester="FALL")
+
+        rows = [
+            (self.a, 95, "AA", 4.0), (self.a, 80, "BB", 3.0), (self.a, 60, "CC", 2.0), (self.a, 30, "FF", 0.0),
+            (self.b, 70, "BB", 3.0), (self.b, 40, "FF", 0.0),
+        ]
+        for i, (offering, score, letter, gpa) in enumerate(rows):
+            Grade.objects.create(
+                student=SimpleUser.objects.create(username=f"ogr{i}", password="x", role="STUDENT"),
+                offering=offering, total_score=score, letter_grade=letter, gpa_value=gpa,
+            )
+
+    def test_many_offerings_with_constant_queries(self):
+        # Sürümler + özet + harf dağılımı + yüzdelikler
+        with self.assertNumQueries(4):
+            stats = grade_statistics([self.a.id, self.b.id, self.empty.id])
+
+        a = stats[self.a.id]
+        self.assertEqual((a["öğrenci_sayısı"], a["ortalama"], a["min"], a["max"]), (4, 66.25, 30, 95))
+        self.assertEqual((a["geçen_sayısı"], a["kalan_sayısı"]), (3, 1))
+        self.assertEqual(a["std_sapma"], 24.33)
+        self.assertEqual(a["yüzdelikler"]["p50"], 70.0)
+        self.assertEqual(a["histogram"], {"AA": 1, "BB": 1, "CC": 1, "FF": 1})
+        self.assertEqual(stats[self.empty.id], {})
+
+        course = grade_statistics([self.course.id], by="course")[self.course.id]
+        self.assertEqual(course["öğrenci_sayısı"], 6)
+        self.assertEqual(course["histogram"]["BB"], 2)
+
+    def test_cached_until_grade_changes(self):
+        self.assertEqual(TranscriptManager.course_statistics(self.b)["max"], 70)
+        # Önbellekten: sadece sürüm kontrolü
+        with self.assertNumQueries(1):
+            TranscriptManager.course_statistics(self.b)
+
+        grade = Grade.objects.filter(offering=self.b, total_score=40).get()
+        grade.total_score = 90
+        grade.save()
+
+        self.assertEqual(TranscriptManager.course_statistics(self.b)["max"], 90)
+        self.assertEqual(grade_statistics([self.course.id], by="course")[self.course.id]["max"], 95)
+
+    def test_version_bump_from_another_process_bypasses_local_cache(self):
+        self.assertEqual(grade_statistics([self.course.id], by="course")[self.course.id]["max"], 95)
+
+        # Başka bir worker notu değiştirip sürümü artırmış gibi: bu sürecin önbelleği silinmedi
+        Grade.objects.filter(offering=self.b, total_score=70).update(total_score=99)
+        CourseOffering.objects.filter(pk=self.b.pk).update(grade_stats_version=F("grade_stats_version") + 1)
+        Course.objects.filter(pk=self.course.pk).update(grade_stats_version=F("grade_stats_version") + 1)
+
+        self.assertEqual(TranscriptManager.course_statistics(self.b)["max"], 99)
+        self.assertEqual(grade_statistics([self.course.id], by="course")[self.course.id]["max"], 99)
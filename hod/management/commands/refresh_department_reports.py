@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from departments.models import Department
+from hod.services import refresh_department_reports
+
+
+class Command(BaseCommand):
+    help = (
+        "Bölümlerin CourseStatistic, TeacherPerformance ve DepartmentStatistic "
+        "tablolarını notlardan yeniden hesaplar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--department", type=str, help="Sadece bu bölüm kodu")
+
+    def handle(self, *args, **options):
+        departments = Department.objects.order_by("code")
+
+        if options["department"]:
+            departments = departments.filter(code__iexact=options["department"])
+            if not departments.exists():
+                self.stdout.write(self.style.ERROR(f"❌ Bölüm bulunamadı: {options['department']}"))
+                return
+
+        for department in departments:
+            result = refresh_department_reports(department)
+            self.stdout.write(
+                f"{department.code}: {result['course_statistics']} ders, "
+                f"{result['teacher_performance']} öğretmen satırı"
+            )
+
+        self.stdout.write(self.style.SUCCESS("✅ Bölüm raporları güncellendi."))
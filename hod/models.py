@@ -3,7 +3,10 @@ from accounts.models import SimpleUser
 from departments.models import Department, DepartmentCourse, DepartmentStatistic
 from courses.models import Course
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from grades.signals import grades_recalculated
 from teachers.models import Teacher
 
 class Head(models.Model):
@@ -112,3 +115,38 @@ class HeadReportLog(models.Model):
     def __str__(self):
         return f"{self.report_type} ({self.created_at})"
 
+
+# ----------------------------------------------------
+# 🔄 Not değişince rapor tablolarının artımlı yenilenmesi
+# (settings.HOD_REPORTS_AUTO_REFRESH açıksa)
+# ----------------------------------------------------
+@receiver([post_save, post_delete], sender="grades.Grade")
+def refresh_reports_after_grade_change(sender, instance, **kwargs):
+    from hod.services import schedule_report_refresh
+
+    schedule_report_refresh([instance.offering_id])
+
+
+@receiver(grades_recalculated)
+def refresh_reports_after_bulk_recalculation(sender, offering_ids, **kwargs):
+    from hod.services import schedule_report_refresh
+
+    schedule_report_refresh(offering_ids)
+
+
+# ----------------------------------------------------
+# 🧹 Kayıt / not değişince bölüm özet önbelleğinin silinmesi
+# ----------------------------------------------------
+@receiver([post_save, post_delete], sender="courses.Enrollment")
+@receiver([post_save, post_delete], sender="grades.Grade")
+def invalidate_statistics_after_change(sender, instance, **kwargs):
+    from hod.services import invalidate_department_statistics
+
+    invalidate_department_statistics([instance.offering_id])
+
+
+@receiver(grades_recalculated)
+def invalidate_statistics_after_bulk_recalculation(sender, offering_ids, **kwargs):
+    from hod.services import invalidate_department_statistics
+
+    invalidate_department_statistics(offering_ids)
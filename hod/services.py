@@ -0,0 +1,317 @@
+# hod/services.py
+"""
+CourseStatistic, TeacherPerformance ve DepartmentStatistic tablolarını
+ham notlardan toplu SQL ile dolduran yenileme akışı.
+
+Bölüm başkanı ekranları bu hazır satırları okur; hesaplama
+refresh_department_reports komutuyla ya da (HOD_REPORTS_AUTO_REFRESH açıksa)
+not değişikliklerinden sonra sadece etkilenen dersler için yapılır.
+
+Bölüm özet sayıları (öğrenci, öğretmen, şube, kayıt, başarı oranı) ise
+department_statistics ile tek sorguda hesaplanır, DepartmentStatistic'e
+yazılır ve Django cache'inde HOD_STATISTICS_CACHE_TTL süresince tutulur;
+kayıt ya da not değişince ilgili bölümlerin önbelleği silinir.
+"""
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from courses.models import CourseAttendance, CourseOffering, Enrollment
+from departments.models import Department, DepartmentCourse, DepartmentStatistic
+from grades.models import Grade
+from hod.models import CourseStatistic, TeacherPerformance
+from teachers.models import Teacher
+
+REPORT_BATCH_SIZE = 500
+
+# TeacherPerformance.semester sayısal; şubelerdeki dönem kodlarının karşılığı
+OFFERING_SEMESTER_NUMBERS = {"FALL": 1, "SPRING": 2, "SUMMER": 3, "WINTER": 4}
+
+# Öğrenci sayısına katılan kayıt durumları
+COUNTED_ENROLLMENT_STATUSES = [Enrollment.Status.ENROLLED, Enrollment.Status.COMPLETED]
+
+
+def _rate(part, total):
+    return round(part * 100.0 / total, 2) if total else 0.0
+
+
+def _graded_totals(queryset, *group_by):
+    """Notlanmış Grade'ler için grup başına sayı, ortalama, geçen ve kalan."""
+    return (
+        queryset.filter(letter_grade__isnull=False)
+        .values(*group_by)
+        .annotate(
+            graded=Count("id"),
+            avg=Avg("total_score"),
+            passed=Count("id", filter=Q(gpa_value__gt=0)),
+            failed=Count("id", filter=Q(gpa_value=0)),
+        )
+        .order_by()
+    )
+
+
+def refresh_course_statistics(department, course_ids=None):
+    """
+    Bölümün dersleri için CourseStatistic satırlarını upsert eder.
+    course_ids verilirse sadece o dersler yenilenir. Dönen: yazılan satır sayısı
+    """
+    dept_courses = DepartmentCourse.objects.filter(department=department)
+    if course_ids is not None:
+        dept_courses = dept_courses.filter(course_id__in=course_ids)
+    dept_courses = list(dept_courses.values_list("course_id", "semester"))
+    if not dept_courses:
+        return 0
+
+    ids = sorted({course_id for course_id, _ in dept_courses})
+
+    grades = {
+        row["offering__course_id"]: row
+        for row in _graded_totals(Grade.objects.filter(offering__course_id__in=ids), "offering__course_id")
+    }
+    students = dict(
+        Enrollment.objects
+        .filter(offering__course_id__in=ids, status__in=COUNTED_ENROLLMENT_STATUSES)
+        .values("offering__course_id")
+        .annotate(n=Count("student_id", distinct=True))
+        .order_by()
+        .values_list("offering__course_id", "n")
+    )
+
+    rows = []
+    for course_id, semester in dept_courses:
+        g = grades.get(course_id, {})
+        graded = g.get("graded", 0)
+        rows.append(CourseStatistic(
+            course_id=course_id,
+            department=department,
+            semester=semester,
+            avg_score=round(g.get("avg") or 0.0, 2),
+            pass_rate=_rate(g.get("passed", 0), graded),
+            fail_rate=_rate(g.get("failed", 0), graded),
+            total_students=students.get(course_id, 0),
+        ))
+
+    CourseStatistic.objects.bulk_create(
+        rows,
+        batch_size=REPORT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["course", "department", "semester"],
+        update_fields=["avg_score", "pass_rate", "fail_rate", "total_students", "updated_at"],
+    )
+    return len(rows)
+
+
+def refresh_teacher_performance(department, course_ids=None):
+    """
+    Bölüm derslerinin şubelerinde ders veren her öğretmen için
+    (öğretmen, ders, dönem, yıl) bazında başarı ve devam oranlarını upsert eder.
+    student_feedback_score bu akışta değiştirilmez.
+    """
+    ids = DepartmentCourse.objects.filter(department=department)
+    if course_ids is not None:
+        ids = ids.filter(course_id__in=course_ids)
+    ids = sorted(set(ids.values_list("course_id", flat=True)))
+    if not ids:
+        return 0
+
+    keys = (
+        "offering__instructors", "offering__course_id",
+        "offering__year", "offering__semester",
+    )
+    success = _graded_totals(
+        Grade.objects.filter(offering__course_id__in=ids, offering__instructors__isnull=False),
+        *keys,
+    )
+    attendance = (
+        CourseAttendance.objects
+        .filter(enrollment__offering__course_id__in=ids, enrollment__offering__instructors__isnull=False)
+        .values(*(f"enrollment__{key}" for key in keys))
+        .annotate(total=Count("id"), attended=Count("id", filter=Q(attended=True)))
+        .order_by()
+    )
+
+    perf = {}
+    for row in success:
+        key = tuple(row[k] for k in keys)
+        perf.setdefault(key, {})["success"] = _rate(row["passed"], row["graded"])
+    for row in attendance:
+        key = tuple(row[f"enrollment__{k}"] for k in keys)
+        perf.setdefault(key, {})["attendance"] = _rate(row["attended"], row["total"])
+
+    rows = [
+        TeacherPerformance(
+            teacher_id=teacher_id,
+            course_id=course_id,
+            year=year,
+            semester=OFFERING_SEMESTER_NUMBERS.get(semester, 1),
+            avg_success_rate=values.get("success", 0.0),
+            avg_attendance_rate=values.get("attendance", 0.0),
+        )
+        for (teacher_id, course_id, year, semester), values in sorted(perf.items())
+    ]
+    TeacherPerformance.objects.bulk_create(
+        rows,
+        batch_size=REPORT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["teacher", "course", "semester", "year"],
+        update_fields=["avg_success_rate", "avg_attendance_rate", "updated_at"],
+    )
+    return len(rows)
+
+
+def _count(queryset, department_field, counted="pk"):
+    """Bölüm başına (counted alanında tekil) sayım için ilişkili alt sorgu (tek ana sorguya gömülür)"""
+    return Coalesce(
+        Subquery(
+            queryset
+            .filter(**{department_field: OuterRef("pk")})
+            .order_by()
+            .values(department_field)
+            .annotate(n=Count(counted, distinct=True))
+            .values("n")[:1],
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def department_statistics(departments):
+    """
+    {department_id: {"student_count", "teacher_count", "offering_count",
+    "enrollment_count", "success_rate"}} — istenen tüm bölümler için tek sorgu.
+    student_count, bölümün derslerinin şubelerine kayıtlı tekil öğrenci sayısıdır
+    (bölüme üye öğrenci sayısı değil).
+    """
+    dept = "course__course_departments__department"
+    graded = Grade.objects.filter(letter_grade__isnull=False)
+    rows = (
+        Department.objects
+        .filter(pk__in=[getattr(d, "pk", d) for d in departments])
+        .annotate(
+            student_count=_count(Enrollment.objects.all(), f"offering__{dept}", "student_id"),
+            teacher_count=_count(Teacher.objects.all(), "department"),
+            offering_count=_count(CourseOffering.objects.filter(is_active=True), dept),
+            enrollment_count=_count(
+                Enrollment.objects.filter(status__in=COUNTED_ENROLLMENT_STATUSES), f"offering__{dept}"
+            ),
+            graded=_count(graded, f"offering__{dept}"),
+            passed=_count(graded.filter(gpa_value__gt=0), f"offering__{dept}"),
+        )
+        .values_list(
+            "pk", "student_count", "teacher_count", "offering_count", "enrollment_count", "graded", "passed",
+        )
+    )
+    return {
+        pk: {
+            "student_count": students,
+            "teacher_count": teachers,
+            "offering_count": offerings,
+            "enrollment_count": enrollments,
+            "success_rate": _rate(passed, graded),
+        }
+        for pk, students, teachers, offerings, enrollments, graded, passed in rows
+    }
+
+
+def _statistics_cache_key(department_id):
+    return f"hod_stats:{department_id}"
+
+
+def refresh_department_statistic(department):
+    """Özet sayıları hesaplar, DepartmentStatistic'e yazar ve önbelleği tazeler."""
+    values = department_statistics([department])[department.pk]
+    values["computed_at"] = timezone.now()
+
+    DepartmentStatistic.objects.update_or_create(
+        department=department,
+        defaults={**values, "success_rate": Decimal(str(values["success_rate"]))},
+    )
+    cache.set(
+        _statistics_cache_key(department.pk),
+        values,
+        getattr(settings, "HOD_STATISTICS_CACHE_TTL", 300),
+    )
+    return values
+
+
+def get_department_statistics(department):
+    """Önbellekte varsa oradan, yoksa yeniden hesaplanmış özet sayılar (+ computed_at)."""
+    values = cache.get(_statistics_cache_key(department.pk))
+    if values is None:
+        values = refresh_department_statistic(department)
+    return values
+
+
+def invalidate_department_statistics(offering_ids):
+    """Şubelerin bağlı olduğu bölümlerin özet önbelleğini siler."""
+    department_ids = set(
+        DepartmentCourse.objects
+        .filter(course__offerings__id__in=list(offering_ids))
+        .values_list("department_id", flat=True)
+    )
+    cache.delete_many([_statistics_cache_key(pk) for pk in department_ids])
+
+
+def refresh_department_reports(department, course_ids=None):
+    """Bölümün tüm rapor tablolarını tek transaction'da yeniler."""
+    with transaction.atomic():
+        courses = refresh_course_statistics(department, course_ids)
+        teachers = refresh_teacher_performance(department, course_ids)
+        refresh_department_statistic(department)
+    return {"course_statistics": courses, "teacher_performance": teachers}
+
+
+def refresh_reports_for_offerings(offering_ids):
+    """Artımlı yenileme: sadece bu şubelerin derslerini ve bölümlerini yeniler."""
+    pairs = (
+        DepartmentCourse.objects
+        .filter(course__offerings__id__in=list(offering_ids))
+        .values_list("department_id", "course_id")
+        .distinct()
+    )
+    courses_by_department = {}
+    for department_id, course_id in pairs:
+        courses_by_department.setdefault(department_id, set()).add(course_id)
+
+    for department in Department.objects.filter(id__in=courses_by_department):
+        refresh_department_reports(department, courses_by_department[department.id])
+    return len(courses_by_department)
+
+
+_pending = threading.local()
+
+
+def _flush_report_refresh():
+    """Commit sonrası bekleyen şubeleri boşaltıp yeniler; küme boşsa iş yapmaz."""
+    ids = getattr(_pending, "offering_ids", None)
+    _pending.offering_ids = set()
+    if ids:
+        refresh_reports_for_offerings(ids)
+
+
+def schedule_report_refresh(offering_ids):
+    """
+    Not değişikliklerinden sonra çağrılır. HOD_REPORTS_AUTO_REFRESH açıksa
+    aynı transaction içindeki tüm değişiklikler thread'e özel bir kümede
+    toplanır ve commit sonrası tek seferde yenilenir.
+    """
+    if not getattr(settings, "HOD_REPORTS_AUTO_REFRESH", False):
+        return
+
+    connection = transaction.get_connection()
+    pending = getattr(_pending, "offering_ids", None)
+    if pending is None or not connection.in_atomic_block:
+        # Transaction dışında kalan küme geri alınmış bir transaction'dan
+        # artakalmıştır (commit olsaydı callback boşaltırdı); atılır.
+        pending = _pending.offering_ids = set()
+    pending.update(offering_ids)
+
+    # Her çağrı kendi callback'ini kaydeder: savepoint geri alınırsa onunla
+    # birlikte düşer, kalanlardan ilk çalışan kümeyi boşaltır, diğerleri boş geçer.
+    transaction.on_commit(_flush_report_refresh)
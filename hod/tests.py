@@ -1,10 +1,19 @@
-from django.test import TestCase, Client
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from accounts.models import SimpleUser
 from teachers.models import Teacher
 from departments.models import Department, Faculty, DepartmentStatistic, DepartmentCourse
 from courses.models import Course, Level
-from .models import Head
+from courses.models import CourseOffering, CourseSchedule, CourseAttendance, Enrollment
+from grades.models import Grade
+from students.models import Student
+from . import services
+from .models import Head, CourseStatistic, TeacherPerformance
+from .services import department_statistics, get_department_statistics, refresh_department_reports
 
 
 class HODViewTest(TestCase):
@@ -94,4 +103,121 @@ class HODViewTest(TestCase):
         url = reverse('hod:teacher_detail', args=[self.teacher.id])
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertContains(response, "teacher_user")
\ No newline at end of file
+        self.assertContains(response, "teacher_user")
+
+class DepartmentReportRefreshTest(TestCase):
+
+    def setUp(self):
+        faculty = Faculty.objects.create(full_name="Mühendislik")
+        level = Level.objects.get_or_create(number=1, name="Lisans")[0]
+        self.department = Department.objects.create(code="SWE", name="Yazılım", faculty=faculty)
+        self.teacher = Teacher.objects.create(
+            user=SimpleUser.objects.create(username="hoca", password="x", role="TEACHER"),
+            department=self.department,
+        )
+        self.course = Course.objects.create(code="SWE101", name="Programlama", level=level, course_type="DEPARTMENT")
+        DepartmentCourse.objects.create(department=self.department, course=self.course, semester=1)
+        self.offering = CourseOffering.objects.create(course=self.course, year=2025, semester="FALL")
+        self.offering.instructors.add(self.teacher)
+        schedule = CourseSchedule.objects.create(
+            offering=self.offering, day="MON", start_time="09:00", end_time="10:00"
+        )
+
+        for i, (score, gpa, attended) in enumerate([(90, 4.0, True), (70, 3.0, True), (30, 0.0, False)]):
+            user = SimpleUser.objects.create(username=f"ogr{i}", password="x", role="STUDENT")
+            student = Student.objects.create(user=user, student_no=f"S{i}")
+            student.departments.add(self.department)
+            enrollment = Enrollment.objects.create(student=student, offering=self.offering)
+            CourseAttendance.objects.create(enrollment=enrollment, schedule=schedule, attended=attended)
+            self.last_grade = Grade.objects.create(
+                student=user, offering=self.offering, total_score=score, gpa_value=gpa, letter_grade="XX"
+            )
+
+    def test_department_statistics_single_query(self):
+        with self.assertNumQueries(1):
+            values = department_statistics([self.department])[self.department.pk]
+
+        self.assertEqual(values, {
+            "student_count": 3, "teacher_count": 1, "offering_count": 1,
+            "enrollment_count": 3, "success_rate": 66.67,
+        })
+
+    def test_student_count_is_enrolled_students(self):
+        # Bölüme üye ama derse kayıtsız öğrenci sayılmaz; başka bölümden kayıtlı öğrenci sayılır
+        member = Student.objects.create(
+            user=SimpleUser.objects.create(username="uye", password="x", role="STUDENT"), student_no="S9",
+        )
+        member.departments.add(self.department)
+        visitor = Student.objects.create(
+            user=SimpleUser.objects.create(username="misafir", password="x", role="STUDENT"), student_no="S8",
+        )
+        Enrollment.objects.create(student=visitor, offering=self.offering)
+
+        values = department_statistics([self.department])[self.department.pk]
+        self.assertEqual(values["student_count"], 4)
+
+    def test_statistics_cached_until_grade_changes(self):
+        cache.clear()
+        stats = get_department_statistics(self.department)
+        self.assertIsNotNone(self.department.statistics.computed_at)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_department_statistics(self.department), stats)
+
+        self.last_grade.gpa_value = 2.0
+        self.last_grade.save()
+        self.assertEqual(get_department_statistics(self.department)["success_rate"], 100.0)
+
+    def test_refresh_fills_report_tables(self):
+        result = refresh_department_reports(self.department)
+        self.assertEqual(result, {"course_statistics": 1, "teacher_performance": 1})
+
+        stat = CourseStatistic.objects.get(course=self.course, department=self.department)
+        self.assertEqual((stat.avg_score, stat.total_students), (63.33, 3))
+        self.assertEqual((stat.pass_rate, stat.fail_rate), (66.67, 33.33))
+
+        perf = TeacherPerformance.objects.get(teacher=self.teacher, course=self.course)
+        self.assertEqual((perf.year, perf.semester), (2025, 1))
+        self.assertEqual((perf.avg_success_rate, perf.avg_attendance_rate), (66.67, 66.67))
+
+        dept_stat = self.department.statistics
+        self.assertEqual((dept_stat.student_count, dept_stat.teacher_count), (3, 1))
+        self.assertEqual(float(dept_stat.success_rate), 66.67)
+
+        # İkinci çalıştırma satır çoğaltmaz, günceller
+        refresh_department_reports(self.department)
+        self.assertEqual(CourseStatistic.objects.count(), 1)
+        self.assertEqual(TeacherPerformance.objects.count(), 1)
+
+    @override_settings(HOD_REPORTS_AUTO_REFRESH=True)
+    def test_grade_change_refreshes_after_commit(self):
+        refresh_department_reports(self.department)
+
+        with patch("hod.services.refresh_reports_for_offerings",
+                   wraps=services.refresh_reports_for_offerings) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.last_grade.total_score = 60
+                self.last_grade.gpa_value = 2.0
+                self.last_grade.save()
+                Grade.objects.filter(pk=self.last_grade.pk).get().save()
+
+        # Aynı transaction'daki değişiklikler tek yenilemede toplanır
+        self.assertEqual(refresh.call_count, 1)
+        stat = CourseStatistic.objects.get(course=self.course)
+        self.assertEqual(stat.pass_rate, 100.0)
+
+    @override_settings(HOD_REPORTS_AUTO_REFRESH=True)
+    def test_rolled_back_savepoint_does_not_swallow_refresh(self):
+        with patch("hod.services.refresh_reports_for_offerings") as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        self.last_grade.save()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                # Geri alınan savepoint'in callback'i düşer; sonraki değişiklik yine yenilenir
+                self.last_grade.save()
+
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(refresh.call_args.args[0], {self.last_grade.offering_id})
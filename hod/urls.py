@@ -5,6 +5,8 @@ app_name = "hod"
 
 urlpatterns = [
     path("", views.dashboard, name="dashboard"),
+    path("export/po-matrix/", views.export_po_matrix, name="export_po_matrix"),
+    path("api/po-attainment/", views.po_attainment_api, name="po_attainment_api"),
     path("course/create/", views.create_course, name="create_course"),
     path("course/<int:course_id>/", views.course_detail, name="course_detail"),
     path("course/<int:pk>/edit/", views.course_edit, name="course_edit"),
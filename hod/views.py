@@ -8,8 +8,13 @@ from courses.models import Course, CourseOffering, CourseAssessmentComponent, En
 from courses.models import Course, CourseOffering
 from academics.models import Level
 from django.contrib import messages
-from .models import TeacherCourseAssignment
+from .models import TeacherCourseAssignment, CourseStatistic, TeacherPerformance
 from django.utils import timezone
+from courses.exports import export_response
+from outcomes.exports import department_po_matrix_export
+from hod.services import get_department_statistics
+from django.http import JsonResponse
+from outcomes.cube import CubeQueryError, attainment_drilldown
 
 
 # ============================================================
@@ -29,32 +34,22 @@ def dashboard(request):
         return render(request, "hod/no_department.html")
 
     department = hod.department
-    stats, _ = DepartmentStatistic.objects.get_or_create(department=department)
+    # Özet sayılar tek sorguda hesaplanır ve önbellekten okunur
+    stats = get_department_statistics(department)
 
     dept_courses = DepartmentCourse.objects.filter(
         department=department
     ).select_related("course")
 
-    course_list = dept_courses.values_list("course", flat=True)
-
+    # Ders istatistikleri refresh_department_reports ile önceden hesaplanır
+    course_stats = {
+        (cs.course_id, cs.semester): cs
+        for cs in CourseStatistic.objects.filter(department=department)
+    }
+    for dc in dept_courses:
+        dc.stats = course_stats.get((dc.course_id, dc.semester))
 
     teachers = Teacher.objects.filter(department=department)
-    teacher_count = teachers.count()
-
-
-    course_ids = course_list.values_list("id", flat=True)
-
-    student_ids = (
-        Enrollment.objects
-        .filter(offering__course_id__in=course_ids)
-        .values_list("student_id", flat=True)
-    )
-
-    student_count = Student.objects.filter(id__in=student_ids).distinct().count()
-
-
-
-
 
     return render(request, "hod/dashboard.html", {
         "username": username,
@@ -62,8 +57,6 @@ def dashboard(request):
         "stats": stats,
         "dept_courses": dept_courses,
         "teachers": teachers,
-        "teacher_count": teacher_count,
-        "student_count": student_count,
     })
 
 
@@ -515,9 +508,17 @@ def teacher_detail(request, pk):
         .order_by("course__name")
     )
 
+    performance = (
+        TeacherPerformance.objects
+        .filter(teacher=teacher)
+        .select_related("course")
+        .order_by("-year", "-semester", "course__code")
+    )
+
     return render(request, "hod/teacher_detail.html", {
         "teacher": teacher,
         "assigned_courses": assigned_courses,
+        "performance": performance,
     })
 
 def add_schedule(request, offering_id):
@@ -570,3 +571,47 @@ def delete_schedule(request, id):
 
     return redirect("hod:course_detail", course_id)
 
+
+# ============================================================
+# DIŞA AKTARIM
+# ============================================================
+def export_po_matrix(request):
+    """Bölüm PO başarı matrisi (öğrenci × PO) — ?format=csv|xlsx"""
+    if request.session.get("role") != "HOD":
+        return redirect("login")
+
+    hod = Head.objects.filter(
+        teacher__user__username=request.session.get("username"),
+        is_active=True
+    ).select_related("department").first()
+
+    if not hod:
+        return render(request, "hod/no_department.html")
+
+    header, rows = department_po_matrix_export(hod.department)
+    filename = f"{hod.department.code}_po_matrisi"
+    return export_response(request.GET.get("format", "csv"), filename, header, rows)
+
+
+
+def po_attainment_api(request):
+    """
+    Bölümün PO başarı küpü — ?level=department|course|component
+    ve isteğe bağlı program_outcome, course, year, semester, cohort_level.
+    """
+    if request.session.get("role") != "HOD":
+        return JsonResponse({"error": "Yetkisiz."}, status=403)
+
+    department_id = Head.objects.filter(
+        teacher__user__username=request.session.get("username"),
+        is_active=True
+    ).values_list("department_id", flat=True).first()
+    if department_id is None:
+        return JsonResponse({"error": "Bölüm bulunamadı."}, status=403)
+
+    level = request.GET.get("level", "department")
+    try:
+        rows = attainment_drilldown(level, request.GET, scope={"department_id": department_id})
+    except CubeQueryError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"level": level, "rows": rows})
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from monitoring.stats import clear_snapshots, collect_snapshots, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "QueryCountMiddleware'in topladığı view başına sorgu istatistiklerini gösterir. "
+        "Worker'ların QUERY_INSTRUMENTATION_DIR altına yazdığı dosyalar birleştirilir."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--flagged", action="store_true", help="Sadece N+1 / büyüyen view'lar")
+        parser.add_argument("--limit", type=int, default=30)
+        parser.add_argument("--json", action="store_true", help="Sonucu JSON olarak yaz")
+        parser.add_argument("--reset", action="store_true", help="Toplanan ölçümleri sil")
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            removed = clear_snapshots()
+            self.stdout.write(self.style.SUCCESS(f"✅ {removed} ölçüm dosyası silindi."))
+            return
+
+        # Komut kendi isteğini işlemediği için sadece dosyalar okunur
+        rows = summarize(collect_snapshots(include_local=False))
+        if options["flagged"]:
+            rows = [r for r in rows if r["flags"]]
+        rows = rows[:options["limit"]]
+
+        if options["json"]:
+            self.stdout.write(json.dumps(rows, ensure_ascii=False, indent=2))
+            return
+
+        if not rows:
+            self.stdout.write("Henüz ölçüm yok.")
+            return
+
+        for row in rows:
+            line = (
+                f"{row['view']:<55} istek {row['requests']:>6}  "
+                f"sorgu p50/p95/max {row['queries_p50']}/{row['queries_p95']}/{row['queries_max']}  "
+                f"db p95 {row['db_ms_p95']:.1f} ms  süre p95 {row['wall_ms_p95']:.1f} ms"
+            )
+            if row["flags"]:
+                self.stdout.write(self.style.WARNING(f"{line}  [{', '.join(row['flags'])}]"))
+                self.stdout.write(f"    {row['max_repeat']}× {row['repeated_sql'][:160]}")
+            else:
+                self.stdout.write(line)
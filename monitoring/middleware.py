@@ -0,0 +1,59 @@
+# monitoring/middleware.py
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from monitoring.stats import QueryRecorder, registry, write_snapshot
+
+
+def _view_path(match):
+    """ör. hod.views.dashboard; sınıf tabanlı view'larda sınıfın yolu"""
+    view = getattr(match.func, "view_class", match.func)
+    return f"{view.__module__}.{view.__qualname__}"
+
+
+class QueryCountMiddleware:
+    """
+    Her isteğin SQL sorgu sayısını, DB süresini ve toplam süresini ölçer ve
+    çözümlenen view'a (ör. hod.views.dashboard) yazar.
+    settings.QUERY_INSTRUMENTATION kapalıysa Django bu middleware'i hiç yüklemez.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_INSTRUMENTATION", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.flush_every = getattr(settings, "QUERY_INSTRUMENTATION_FLUSH_EVERY", 50)
+        self.handled = 0
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        wall_ms = (perf_counter() - start) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        if match is not None:
+            repeated_sql, repeated = recorder.most_repeated()
+            registry.record(
+                f"{_view_path(match)} [{request.method}]",
+                recorder.count,
+                recorder.db_time * 1000,
+                wall_ms,
+                repeated_sql,
+                repeated,
+            )
+
+            self.handled += 1
+            if self.flush_every and self.handled % self.flush_every == 0:
+                write_snapshot()
+
+        return response
@@ -0,0 +1,234 @@
+# monitoring/stats.py
+"""
+İstek başına SQL sorgu sayısı, DB süresi ve toplam süre istatistikleri.
+
+Her view (ve HTTP metodu) için son N isteğin ölçümü bellekte tutulur ve
+yüzdelikler bu pencere üzerinden hesaplanır. Birden fazla worker varsa her
+süreç kendi penceresini QUERY_INSTRUMENTATION_DIR altına JSON olarak yazar;
+yönetim komutu ve admin sayfası bu dosyaları birleştirerek okur.
+"""
+import json
+import os
+import re
+import statistics
+import threading
+from time import perf_counter
+from collections import Counter, deque
+from pathlib import Path
+
+from django.conf import settings
+
+SNAPSHOT_PREFIX = "query-stats-"
+
+# "IN (%s, %s, %s)" gibi değişken uzunluklu listeler tek kalıba indirilir
+_PARAM_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Aynı sorgunun farklı parametreli çalıştırmalarını tek kalıpta toplar."""
+    return _WHITESPACE.sub(" ", _PARAM_LIST.sub("(%s)", sql)).strip()
+
+
+def percentile(values, pct):
+    """Sıralı olmayan listede en yakın sıra yöntemiyle yüzdelik."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def repeat_threshold():
+    return getattr(settings, "QUERY_INSTRUMENTATION_REPEAT_THRESHOLD", 10)
+
+
+# "büyüyen" için: süre ile sorgu sayısı arasındaki en düşük korelasyon ve en az örnek
+GROWTH_CORRELATION = 0.8
+GROWTH_MIN_SAMPLES = 5
+
+
+def query_time_correlation(queries, wall_ms):
+    """Sorgu sayısı ile toplam süre arasındaki Pearson korelasyonu; hesaplanamıyorsa None."""
+    if len(queries) < GROWTH_MIN_SAMPLES:
+        return None
+    try:
+        return statistics.correlation(queries, wall_ms)
+    except statistics.StatisticsError:  # sabit seri (ör. her istekte aynı sorgu sayısı)
+        return None
+
+
+class QueryRecorder:
+    """connection.execute_wrapper ile takılır; tek isteğin sorgularını sayar."""
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - start
+            self.count += 1
+            self.statements[normalize_sql(sql)] += 1
+
+    def most_repeated(self):
+        """(kalıp, tekrar) — en çok çalıştırılan sorgu kalıbı."""
+        if not self.statements:
+            return "", 0
+        return self.statements.most_common(1)[0]
+
+
+class ViewQueryStats:
+    """View başına sınırlı pencere (deque) tutan, thread-safe kayıt defteri."""
+
+    def __init__(self, window=500):
+        self.window = window
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, queries, db_ms, wall_ms, repeated_sql="", repeated=0):
+        with self._lock:
+            entry = self._views.get(key)
+            if entry is None:
+                entry = self._views[key] = {
+                    "requests": 0,
+                    "samples": deque(maxlen=self.window),
+                    "max_repeat": 0,
+                    "repeated_sql": "",
+                }
+            entry["requests"] += 1
+            entry["samples"].append((queries, round(db_ms, 3), round(wall_ms, 3), repeated))
+            if repeated > entry["max_repeat"]:
+                entry["max_repeat"] = repeated
+                entry["repeated_sql"] = repeated_sql
+
+    def snapshot(self):
+        """JSON'a yazılabilir kopya: {anahtar: {requests, samples, max_repeat, repeated_sql}}"""
+        with self._lock:
+            return {
+                key: {**entry, "samples": [list(s) for s in entry["samples"]]}
+                for key, entry in self._views.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def __len__(self):
+        return len(self._views)
+
+
+registry = ViewQueryStats(getattr(settings, "QUERY_INSTRUMENTATION_WINDOW", 500))
+
+
+def snapshot_dir():
+    path = getattr(settings, "QUERY_INSTRUMENTATION_DIR", None)
+    return Path(path) if path else None
+
+
+def write_snapshot():
+    """Bu sürecin penceresini paylaşılan dizine atomik olarak yazar."""
+    directory = snapshot_dir()
+    if directory is None:
+        return None
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / f"{SNAPSHOT_PREFIX}{os.getpid()}.json"
+    tmp = target.with_suffix(".tmp")
+    tmp.write_text(json.dumps(registry.snapshot(), ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, target)
+    return target
+
+
+def clear_snapshots():
+    registry.reset()
+    directory = snapshot_dir()
+    if directory is None or not directory.exists():
+        return 0
+    removed = 0
+    for path in directory.glob(f"{SNAPSHOT_PREFIX}*.json"):
+        path.unlink()
+        removed += 1
+    return removed
+
+
+def collect_snapshots(include_local=True):
+    """
+    Bu sürecin kaydı ile diğer süreçlerin dosyalarını birleştirir.
+    Kendi dosyamız atlanır; yerine bellekteki güncel pencere kullanılır.
+    """
+    merged = {}
+
+    def merge(views):
+        for key, entry in views.items():
+            target = merged.setdefault(key, {"requests": 0, "samples": [], "max_repeat": 0, "repeated_sql": ""})
+            target["requests"] += entry["requests"]
+            target["samples"].extend(entry["samples"])
+            if entry["max_repeat"] > target["max_repeat"]:
+                target["max_repeat"] = entry["max_repeat"]
+                target["repeated_sql"] = entry["repeated_sql"]
+
+    directory = snapshot_dir()
+    own = f"{SNAPSHOT_PREFIX}{os.getpid()}.json"
+    if directory is not None and directory.exists():
+        for path in sorted(directory.glob(f"{SNAPSHOT_PREFIX}*.json")):
+            if include_local and path.name == own:
+                continue
+            try:
+                merge(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+
+    if include_local:
+        merge(registry.snapshot())
+    return merged
+
+
+def summarize(views=None):
+    """
+    View başına yüzdelik özetleri. flags:
+      "N+1"      — tek istekte aynı sorgu kalıbı eşik kadar tekrarlandı
+      "büyüyen"  — istek süresi sorgu sayısıyla birlikte artıyor (en az
+                   GROWTH_MIN_SAMPLES örnekte Pearson r >= GROWTH_CORRELATION);
+                   veri büyüdükçe sorgu sayısı ve süre beraber büyür
+    En çok sorgu atan view en üstte olacak şekilde sıralanır.
+    """
+    if views is None:
+        views = collect_snapshots()
+
+    threshold = repeat_threshold()
+    rows = []
+    for key, entry in views.items():
+        samples = entry["samples"]
+        queries = [s[0] for s in samples]
+        db_ms = [s[1] for s in samples]
+        wall_ms = [s[2] for s in samples]
+
+        flags = []
+        if entry["max_repeat"] >= threshold:
+            flags.append("N+1")
+        correlation = query_time_correlation(queries, wall_ms)
+        if correlation is not None and correlation >= GROWTH_CORRELATION:
+            flags.append("büyüyen")
+
+        rows.append({
+            "view": key,
+            "requests": entry["requests"],
+            "queries_p50": percentile(queries, 50),
+            "queries_p95": percentile(queries, 95),
+            "queries_max": max(queries, default=0),
+            "db_ms_p50": percentile(db_ms, 50),
+            "db_ms_p95": percentile(db_ms, 95),
+            "wall_ms_p50": percentile(wall_ms, 50),
+            "wall_ms_p95": percentile(wall_ms, 95),
+            "max_repeat": entry["max_repeat"],
+            "repeated_sql": entry["repeated_sql"],
+            "query_time_correlation": None if correlation is None else round(correlation, 2),
+            "flags": flags,
+        })
+
+    rows.sort(key=lambda r: (r["queries_p95"], r["wall_ms_p95"]), reverse=True)
+    return rows
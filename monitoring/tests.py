@@ -0,0 +1,113 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import SimpleUser
+from departments.models import Department, Faculty
+from hod.models import Head
+from teachers.models import Teacher
+from .stats import QueryRecorder, ViewQueryStats, normalize_sql, registry, summarize, write_snapshot
+
+
+class QueryStatsHelpersTest(TestCase):
+
+    def test_normalize_collapses_param_lists(self):
+        self.assertEqual(
+            normalize_sql('SELECT "id" FROM "t" WHERE "id" IN (%s, %s,  %s)'),
+            normalize_sql('SELECT "id" FROM "t" WHERE "id" IN (%s)'),
+        )
+
+    def test_repeated_statement_is_flagged(self):
+        stats = ViewQueryStats(window=10)
+        stats.record("app.views.list [GET]", 3, 1.0, 5.0, "SELECT 1", 1)
+        stats.record("app.views.list [GET]", 25, 4.0, 9.0, "SELECT x WHERE id = %s", 22)
+
+        with override_settings(QUERY_INSTRUMENTATION_REPEAT_THRESHOLD=10):
+            row = summarize(stats.snapshot())[0]
+
+        self.assertEqual(row["requests"], 2)
+        self.assertEqual(row["queries_max"], 25)
+        self.assertEqual(row["max_repeat"], 22)
+        # İki örnekten büyüme sonucu çıkarılmaz
+        self.assertEqual(row["flags"], ["N+1"])
+
+    def test_growth_flag_follows_query_time_correlation(self):
+        stats = ViewQueryStats(window=10)
+        for queries, wall_ms in [(5, 10.0), (10, 19.0), (20, 41.0), (40, 80.0), (80, 170.0)]:
+            stats.record("app.views.growing [GET]", queries, 1.0, wall_ms)
+        # Sorgu sayısı değişse de süre ondan bağımsız
+        for queries, wall_ms in [(5, 90.0), (10, 12.0), (20, 70.0), (40, 15.0), (80, 40.0)]:
+            stats.record("app.views.noisy [GET]", queries, 1.0, wall_ms)
+
+        rows = {r["view"]: r for r in summarize(stats.snapshot())}
+        self.assertEqual(rows["app.views.growing [GET]"]["flags"], ["büyüyen"])
+        self.assertGreater(rows["app.views.growing [GET]"]["query_time_correlation"], 0.99)
+        self.assertEqual(rows["app.views.noisy [GET]"]["flags"], [])
+
+
+@override_settings(QUERY_INSTRUMENTATION=True, QUERY_INSTRUMENTATION_DIR=None)
+class QueryCountMiddlewareTest(TestCase):
+
+    def setUp(self):
+        registry.reset()
+
+        faculty = Faculty.objects.create(full_name="Mühendislik")
+        department = Department.objects.create(code="SWE", name="Yazılım", faculty=faculty)
+        user = SimpleUser.objects.create(username="hod_user", password="123", role="HOD")
+        teacher = Teacher.objects.create(user=user, department=department)
+        Head.objects.create(teacher=teacher, department=department)
+
+        session = self.client.session
+        session["role"] = "HOD"
+        session["username"] = "hod_user"
+        session.save()
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_requests_are_attributed_to_view(self):
+        self.client.get(reverse("hod:dashboard"))
+        self.client.get(reverse("hod:dashboard"))
+
+        rows = {r["view"]: r for r in summarize(registry.snapshot())}
+        row = rows["hod.views.dashboard [GET]"]
+        self.assertEqual(row["requests"], 2)
+        self.assertGreater(row["queries_p50"], 0)
+
+    def test_command_reads_worker_snapshots(self):
+        self.client.get(reverse("hod:dashboard"))
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(QUERY_INSTRUMENTATION_DIR=directory):
+                write_snapshot()
+                out = StringIO()
+                call_command("query_stats", "--json", stdout=out)
+
+        views = [r["view"] for r in json.loads(out.getvalue())]
+        self.assertIn("hod.views.dashboard [GET]", views)
+
+    def test_admin_page_requires_staff(self):
+        url = reverse("query_stats")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.get(reverse("hod:dashboard"))
+
+        admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(admin)
+        response = self.client.get(url)
+        self.assertContains(response, "hod.views.dashboard [GET]")
+
+    def test_recorder_counts_statements(self):
+        recorder = QueryRecorder()
+        from django.db import connection
+
+        with connection.execute_wrapper(recorder):
+            for _ in range(3):
+                SimpleUser.objects.filter(username="hod_user").exists()
+
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(recorder.most_repeated()[1], 3)
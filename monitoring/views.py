@@ -0,0 +1,20 @@
+from django.contrib import admin
+from django.shortcuts import render
+
+from monitoring.stats import repeat_threshold, summarize
+
+
+def query_stats(request):
+    """Admin: view başına sorgu sayısı / süre yüzdelikleri ve N+1 şüphelileri."""
+    rows = summarize()
+    only_flagged = request.GET.get("flagged") == "1"
+    if only_flagged:
+        rows = [r for r in rows if r["flags"]]
+
+    return render(request, "monitoring/query_stats.html", {
+        **admin.site.each_context(request),
+        "title": "Sorgu İstatistikleri",
+        "rows": rows,
+        "only_flagged": only_flagged,
+        "threshold": repeat_threshold(),
+    })
@@ -4,7 +4,7 @@ from django.shortcuts import render
 from django.urls import path
 from django.http import HttpResponseRedirect
 from django.contrib import messages
-from .models import ProgramOutcome
+from .models import ProgramOutcome, OutcomeRecomputeJob, ProgramOutcomeAttainment
 from .management.commands.import_outcomes import OutcomeImporter
 
 
@@ -89,4 +89,21 @@ class ProgramOutcomeAdmin(admin.ModelAdmin):
         """Liste görünümünde kısa açıklama"""
         return obj.description[:80] + '...' if len(obj.description) > 80 else obj.description
 
-    description_short.short_description='Açıklama'
\ No newline at end of file
+    description_short.short_description='Açıklama'
+
+@admin.register(OutcomeRecomputeJob)
+class OutcomeRecomputeJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "student", "status", "worker", "created_at", "finished_at")
+    list_filter = ("status",)
+    search_fields = ("student__student_no",)
+    readonly_fields = ("created_at", "started_at", "finished_at", "error")
+
+
+@admin.register(ProgramOutcomeAttainment)
+class ProgramOutcomeAttainmentAdmin(admin.ModelAdmin):
+    list_display = (
+        "program_outcome", "department", "course", "year", "semester",
+        "cohort_level", "student_count", "mean_score", "mean_coverage", "updated_at",
+    )
+    list_filter = ("department", "year", "semester", "cohort_level")
+    search_fields = ("course__code",)
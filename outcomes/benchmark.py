@@ -0,0 +1,375 @@
+# outcomes/benchmark.py
+"""
+Outcome ve not hesaplamaları için performans ölçümü.
+
+Gerçekçi büyüklükte sentetik veri (fakülte, bölüm, ders, şube, kayıt,
+bileşen, not, LO/PO eşlemeleri) bulk_create ile üretilir; ardından servis
+fonksiyonları ve ekranlar çalıştırılıp süre ve sorgu sayıları toplanır.
+Sonuçlar JSON olarak yazılır, böylece iki çalıştırma karşılaştırılabilir.
+
+Komut: python manage.py benchmark_outcomes --students 20000 --offerings 2000
+"""
+import json
+import platform
+import random
+import statistics
+import time
+from itertools import count
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from academics.models import Level
+from accounts.models import SimpleUser
+from courses.models import (
+    Course,
+    CourseOffering,
+    CourseAssessmentComponent,
+    Enrollment,
+    CourseGrade,
+    ComponentLearningRelation,
+    LearningProgramRelation,
+)
+from courses.services import GRID_MAX_CELLS
+from dean.models import Dean
+from departments.models import Department, DepartmentCourse
+from faculty.models import Faculty
+from hod.models import Head
+from outcomes.graph import graph_cache
+from outcomes.models import LearningOutcome, ProgramOutcome
+from outcomes.services import (
+    compute_student_program_outcomes,
+    compute_and_save_student_program_outcomes,
+    compute_program_outcomes_for_students,
+    compute_and_save_program_outcomes_for_students,
+)
+from students.models import Student
+from teachers.models import Teacher
+
+BENCHMARK_BATCH_SIZE = 1000
+
+# Şube başına bileşenler ve ağırlıkları (toplam %100)
+COMPONENT_LAYOUTS = {
+    2: [("MIDTERM", 40), ("FINAL", 60)],
+    3: [("MIDTERM", 30), ("PROJECT", 20), ("FINAL", 50)],
+    4: [("MIDTERM", 30), ("QUIZ", 10), ("PROJECT", 20), ("FINAL", 40)],
+}
+
+
+def generate_dataset(
+    students=20000,
+    offerings=2000,
+    faculties=4,
+    departments=20,
+    components_per_offering=3,
+    los_per_course=4,
+    pos_per_department=10,
+    courses_per_student=6,
+    prefix="BM",
+    seed=42,
+):
+    """
+    Sentetik veri setini üretir. Her şube ayrı bir derse aittir, dersler
+    bölümlere sırayla dağıtılır; öğrenciler kendi bölümlerinin şubelerine
+    kaydolur ve her bileşenden not alır.
+    Dönen: ölçümlerde kullanılacak örnek kayıtlar ve tablo büyüklükleri.
+    """
+    rng = random.Random(seed)
+    layout = COMPONENT_LAYOUTS[components_per_offering]
+    departments = min(departments, offerings)
+    level, _ = Level.objects.get_or_create(number=1, defaults={"name": "1. Sınıf"})
+
+    faculty_objs = Faculty.objects.bulk_create(
+        [Faculty(full_name=f"{prefix} Fakülte {i}") for i in range(faculties)]
+    )
+    dept_objs = Department.objects.bulk_create([
+        Department(code=f"{prefix}D{i}", name=f"{prefix} Bölüm {i}", faculty=faculty_objs[i % faculties])
+        for i in range(departments)
+    ])
+
+    # Her bölüme bir hoca (aynı zamanda bölüm başkanı), her fakülteye bir dekan
+    users = SimpleUser.objects.bulk_create(
+        [
+            SimpleUser(username=f"{prefix.lower()}_hod_{i}", password="x", role=SimpleUser.Roles.HOD)
+            for i in range(departments)
+        ] + [
+            SimpleUser(username=f"{prefix.lower()}_dean_{i}", password="x", role=SimpleUser.Roles.DEAN)
+            for i in range(faculties)
+        ]
+    )
+    teachers = Teacher.objects.bulk_create(
+        [Teacher(user=users[i], department=dept_objs[i]) for i in range(departments)]
+        + [
+            Teacher(user=users[departments + i], department=dept_objs[i % departments])
+            for i in range(faculties)
+        ]
+    )
+    Head.objects.bulk_create([Head(teacher=teachers[i], department=dept_objs[i]) for i in range(departments)])
+    Dean.objects.bulk_create([
+        Dean(teacher=teachers[departments + i], faculty=faculty_objs[i]) for i in range(faculties)
+    ])
+
+    course_objs = Course.objects.bulk_create([
+        Course(code=f"{prefix}{i}", name=f"{prefix} Ders {i}", level=level, course_type="DEPARTMENT")
+        for i in range(offerings)
+    ], batch_size=BENCHMARK_BATCH_SIZE)
+    course_dept = {c.id: dept_objs[i % departments] for i, c in enumerate(course_objs)}
+    DepartmentCourse.objects.bulk_create([
+        DepartmentCourse(department=course_dept[c.id], course=c) for c in course_objs
+    ], batch_size=BENCHMARK_BATCH_SIZE)
+
+    offering_objs = CourseOffering.objects.bulk_create([
+        CourseOffering(course=c, year=2025, semester="FALL", max_students=students)
+        for c in course_objs
+    ], batch_size=BENCHMARK_BATCH_SIZE)
+    OfferingInstructors = CourseOffering.instructors.through
+    OfferingInstructors.objects.bulk_create([
+        OfferingInstructors(courseoffering_id=o.id, teacher_id=teachers[i % departments].id)
+        for i, o in enumerate(offering_objs)
+    ], batch_size=BENCHMARK_BATCH_SIZE)
+
+    components = CourseAssessmentComponent.objects.bulk_create([
+        CourseAssessmentComponent(offering=o, type=comp_type, weight=weight)
+        for o in offering_objs
+        for comp_type, weight in layout
+    ], batch_size=BENCHMARK_BATCH_SIZE)
+    components_by_offering = {}
+    for comp in components:
+        components_by_offering.setdefault(comp.offering_id, []).append(comp)
+
+    pos = ProgramOutcome.objects.bulk_create([
+        ProgramOutcome(department=d, code=n, description=f"{d.code} PO{n}")
+        for d in dept_objs
+        for n in range(1, pos_per_department + 1)
+    ], batch_size=BENCHMARK_BATCH_SIZE)
+    pos_by_department = {}
+    for po in pos:
+        pos_by_department.setdefault(po.department_id, []).append(po)
+
+    los = LearningOutcome.objects.bulk_create([
+        LearningOutcome(course=c, code=f"LO{n}", description=f"{c.code} LO{n}", order=n)
+        for c in course_objs
+        for n in range(1, los_per_course + 1)
+    ], batch_size=BENCHMARK_BATCH_SIZE)
+    los_by_course = {}
+    for lo in los:
+        los_by_course.setdefault(lo.course_id, []).append(lo)
+
+    comp_relations, program_relations = [], []
+    for o in offering_objs:
+        course_los = los_by_course[o.course_id]
+        for comp in components_by_offering[o.id]:
+            for lo in rng.sample(course_los, min(2, len(course_los))):
+                comp_relations.append(ComponentLearningRelation(
+                    component=comp, learning_outcome=lo, weight=rng.choice([30, 50, 70, 100])
+                ))
+        dept_pos = pos_by_department[course_dept[o.course_id].id]
+        for lo in course_los:
+            for po in rng.sample(dept_pos, min(2, len(dept_pos))):
+                program_relations.append(LearningProgramRelation(
+                    learning_outcome=lo, program_outcome=po, weight=rng.choice([25, 50, 100])
+                ))
+    ComponentLearningRelation.objects.bulk_create(comp_relations, batch_size=BENCHMARK_BATCH_SIZE)
+    LearningProgramRelation.objects.bulk_create(program_relations, batch_size=BENCHMARK_BATCH_SIZE)
+
+    student_users = SimpleUser.objects.bulk_create([
+        SimpleUser(username=f"{prefix.lower()}_student_{i}", password="x", role=SimpleUser.Roles.STUDENT)
+        for i in range(students)
+    ], batch_size=BENCHMARK_BATCH_SIZE)
+    student_objs = Student.objects.bulk_create([
+        Student(user=u, student_no=f"{prefix}{i:08d}", student_level=level)
+        for i, u in enumerate(student_users)
+    ], batch_size=BENCHMARK_BATCH_SIZE)
+
+    offerings_by_department = {}
+    for o in offering_objs:
+        offerings_by_department.setdefault(course_dept[o.course_id].id, []).append(o)
+
+    StudentDepartments = Student.departments.through
+    memberships, enrollments = [], []
+    for i, s in enumerate(student_objs):
+        dept = dept_objs[i % departments]
+        memberships.append(StudentDepartments(student_id=s.id, department_id=dept.id))
+        dept_offerings = offerings_by_department[dept.id]
+        for o in rng.sample(dept_offerings, min(courses_per_student, len(dept_offerings))):
+            enrollments.append(Enrollment(student=s, offering=o, status=Enrollment.Status.ENROLLED))
+    StudentDepartments.objects.bulk_create(memberships, batch_size=BENCHMARK_BATCH_SIZE)
+    enrollments = Enrollment.objects.bulk_create(enrollments, batch_size=BENCHMARK_BATCH_SIZE)
+
+    grades = []
+    for enr in enrollments:
+        for comp in components_by_offering[enr.offering_id]:
+            grades.append(CourseGrade(enrollment=enr, component=comp, score=rng.randint(20, 100)))
+            if len(grades) >= BENCHMARK_BATCH_SIZE * 10:
+                CourseGrade.objects.bulk_create(grades, batch_size=BENCHMARK_BATCH_SIZE)
+                grades = []
+    CourseGrade.objects.bulk_create(grades, batch_size=BENCHMARK_BATCH_SIZE)
+
+    # Ekran ölçümleri için en kalabalık şube seçilir
+    enrollment_counts = {}
+    for enr in enrollments:
+        enrollment_counts[enr.offering_id] = enrollment_counts.get(enr.offering_id, 0) + 1
+    busiest = max(offering_objs, key=lambda o: enrollment_counts.get(o.id, 0))
+
+    return {
+        "student_ids": [s.id for s in student_objs],
+        "offering": busiest,
+        "teacher_username": teachers[offering_objs.index(busiest) % departments].user.username,
+        "hod_username": users[0].username,
+        "dean_username": users[departments].username,
+        "sizes": {
+            "faculties": faculties,
+            "departments": departments,
+            "courses": len(course_objs),
+            "offerings": len(offering_objs),
+            "components": len(components),
+            "learning_outcomes": len(los),
+            "program_outcomes": len(pos),
+            "component_lo_relations": len(comp_relations),
+            "lo_po_relations": len(program_relations),
+            "students": len(student_objs),
+            "enrollments": len(enrollments),
+            "grades": len(enrollments) * len(layout),
+        },
+    }
+
+
+def measure(name, func, repeat=3):
+    """func'ı repeat kez çalıştırır; süre (ms) ve her çalıştırmanın sorgu sayısını döner."""
+    timings, queries = [], []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(ctx.captured_queries))
+
+    return {
+        "name": name,
+        "repeat": repeat,
+        "min_ms": round(min(timings), 2),
+        "median_ms": round(statistics.median(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "queries": queries,
+    }
+
+
+def _logged_in_client(username, role):
+    client = Client()
+    session = client.session
+    session["username"] = username
+    session["role"] = role
+    session.save()
+    return client
+
+
+def run_benchmarks(dataset, repeat=3, sample_size=100, full_rebuild=True):
+    """
+    Veri seti üzerinde servisleri ve ekranları ölçer.
+    İlk çalıştırma graf önbelleği boşken yapılır; queries listesindeki
+    ilk değer soğuk, sonrakiler sıcak önbellek içindir.
+    """
+    student_ids = dataset["student_ids"]
+    student = Student.objects.get(pk=student_ids[0])
+    sample_ids = student_ids[:sample_size]
+    offering = dataset["offering"]
+    results = []
+
+    graph_cache.clear()
+    results.append(measure(
+        "compute_student_program_outcomes",
+        lambda: compute_student_program_outcomes(student), repeat,
+    ))
+    results.append(measure(
+        "compute_and_save_student_program_outcomes",
+        lambda: compute_and_save_student_program_outcomes(student), repeat,
+    ))
+    results.append(measure(
+        f"compute_program_outcomes_for_students[{len(sample_ids)}]",
+        lambda: compute_program_outcomes_for_students(sample_ids), repeat,
+    ))
+    if full_rebuild:
+        results.append(measure(
+            f"compute_and_save_program_outcomes_for_students[{len(student_ids)}]",
+            lambda: compute_and_save_program_outcomes_for_students(student_ids), 1,
+        ))
+
+    # Ekranlar test istemcisiyle çağrılır; oturum rolü doğrudan yazılır
+    enrollment_ids = list(
+        Enrollment.objects
+        .filter(offering=offering, status=Enrollment.Status.ENROLLED)
+        .values_list("id", flat=True)
+    )
+    component_ids = list(
+        CourseAssessmentComponent.objects.filter(offering=offering).values_list("id", flat=True)
+    )
+    runs = count()
+
+    def post_grades():
+        # Her çalıştırmada farklı notlar gönderilir ki tüm hücreler yazılsın;
+        # grid ucunun hücre sınırı aşılmasın diye parça parça gönderilir
+        offset = next(runs) % 2
+        cells = [
+            {"enrollment": enr_id, "component": comp_id, "score": 50 + offset + (enr_id + comp_id) % 40}
+            for enr_id in enrollment_ids
+            for comp_id in component_ids
+        ]
+        url = reverse("teachers:grade_grid_save", args=[offering.id])
+        for start in range(0, len(cells), GRID_MAX_CELLS):
+            teacher_client.post(
+                url, data=json.dumps({"cells": cells[start:start + GRID_MAX_CELLS]}),
+                content_type="application/json",
+            )
+
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+        teacher_client = _logged_in_client(dataset["teacher_username"], "TEACHER")
+        hod_client = _logged_in_client(dataset["hod_username"], "HOD")
+        dean_client = _logged_in_client(dataset["dean_username"], "DEAN")
+
+        results.append(measure(
+            f"grade_grid_save POST[{len(enrollment_ids)}x{len(component_ids)}]", post_grades, repeat,
+        ))
+        results.append(measure(
+            "hod dashboard", lambda: hod_client.get(reverse("hod:dashboard")), repeat,
+        ))
+        results.append(measure(
+            "dean dashboard", lambda: dean_client.get(reverse("dean:dashboard")), repeat,
+        ))
+
+    return {
+        "generated_at": timezone.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+        },
+        "dataset": dataset["sizes"],
+        "results": results,
+    }
+
+
+def compare_reports(previous, current):
+    """
+    İki rapordaki aynı isimli ölçümleri karşılaştırır.
+    Dönen: [(isim, önceki_median_ms, şimdiki_median_ms, değişim_yüzdesi, önceki_sorgu, şimdiki_sorgu)]
+    """
+    before = {r["name"]: r for r in previous.get("results", [])}
+    rows = []
+    for result in current["results"]:
+        old = before.get(result["name"])
+        if not old:
+            continue
+        change = (
+            (result["median_ms"] - old["median_ms"]) / old["median_ms"] * 100
+            if old["median_ms"] else 0.0
+        )
+        rows.append((
+            result["name"], old["median_ms"], result["median_ms"], round(change, 1),
+            old["queries"], result["queries"],
+        ))
+    return rows
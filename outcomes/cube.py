@@ -0,0 +1,364 @@
+# outcomes/cube.py
+"""
+PO başarı küpü (ProgramOutcomeAttainment) ve drill-down sorguları.
+
+Küp şube bazında, PO motorunun kullandığı hesapla (_lo_partials /
+_po_partials) doldurulur: her kaydın o şubedeki bileşen notları
+Component -> LO -> PO grafı üzerinden öğrencinin bölüm PO'larına taşınır,
+(PO, öğrenci sınıfı) başına ortalama skor ve kapsama yazılır. Ders
+bazında dilim gerektiği için öğrenci toplamı olan StudentProgramOutcomeScore
+yerine kaydın kendi notları kullanılır.
+
+Artımlı yenileme: son not (CourseGrade.updated_at), not silme / kayıt
+değişikliği (CourseOffering.grades_changed_at) ya da graf değişikliği
+(OutcomeGraphVersion.updated_at) şubenin son küp yazımından
+(CourseOffering.outcome_cube_built_at) yeni olan şubeler yeniden yazılır;
+geri kalanlara dokunulmaz.
+
+Drill-down seviyeleri fakülte -> bölüm -> ders -> bileşen; ilk üçü küpten
+GROUP BY ile, bileşen seviyesi tek şube grubunun notlarından okunur.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Avg, Count, Exists, F, FloatField, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from courses.models import (
+    ComponentLearningRelation,
+    CourseAssessmentComponent,
+    CourseGrade,
+    CourseOffering,
+    Enrollment,
+)
+from outcomes.graph import current_outcome_graph_changed_at, get_offering_graphs, graph_cache
+from outcomes.models import ProgramOutcome, ProgramOutcomeAttainment
+from outcomes.services import _lo_partials, _po_partials
+from students.models import Student
+
+# Tek geçişte hesaplanan şube sayısı
+CUBE_BATCH_SIZE = 200
+
+# level -> (zorunlu filtre, gruplama alanları)
+DRILLDOWN_LEVELS = {
+    "faculty": ("faculty", ("department_id", "department__code", "program_outcome_id", "program_outcome__code")),
+    "department": ("department", ("program_outcome_id", "program_outcome__code", "course_id", "course__code")),
+    "course": ("course", ("program_outcome_id", "program_outcome__code", "year", "semester", "cohort_level")),
+}
+
+# API'den gelen dilim filtreleri -> küp alanı
+SLICE_FILTERS = {
+    "faculty": "department__faculty_id",
+    "department": "department_id",
+    "program_outcome": "program_outcome_id",
+    "course": "course_id",
+    "year": "year",
+    "semester": "semester",
+    "cohort_level": "cohort_level",
+}
+
+
+# Dilim / yetki alanı (küp alanı) -> Student filtresi; bileşen seviyesi notları
+# drill-down yapılan küp satırıyla aynı öğrencilerle süzmek için
+STUDENT_SLICE_FILTERS = {
+    "department_id": "departments",
+    "department__faculty_id": "departments__faculty_id",
+    "cohort_level": "student_level__number",
+}
+
+# Bileşen seviyesinde öğrenci filtresi olarak değil, doğrudan kullanılan küp alanları
+COMPONENT_LEVEL_FIELDS = ("course_id", "program_outcome_id", "year", "semester")
+
+
+class CubeQueryError(ValueError):
+    """Geçersiz drill-down seviyesi ya da eksik filtre."""
+
+
+# ------------------------------------------------------------
+# Küpün doldurulması
+# ------------------------------------------------------------
+def stale_cube_offerings(offering_ids=None):
+    """
+    Küpü son not, not silme / kayıt ya da graf değişikliğinden eski kalan şube id'leri.
+    Hiç yazılmamış şubeler, eşlenmiş bileşeni ve notu varsa eskimiş sayılır.
+    """
+    offerings = CourseOffering.objects.all()
+    if offering_ids is not None:
+        offerings = offerings.filter(pk__in=list(offering_ids))
+
+    graph_changed = current_outcome_graph_changed_at()
+    rows = (
+        offerings
+        .annotate(
+            graded=Subquery(
+                CourseGrade.objects
+                .filter(enrollment__offering=OuterRef("pk"))
+                .order_by("-updated_at")
+                .values("updated_at")[:1]
+            ),
+            mapped=Exists(ComponentLearningRelation.objects.filter(component__offering=OuterRef("pk"))),
+        )
+        .order_by("pk")
+        .values_list("pk", "outcome_cube_built_at", "graded", "grades_changed_at", "mapped")
+    )
+
+    stale = []
+    for offering_id, built, graded, changed, mapped in rows:
+        if built is None:
+            if graded is not None and mapped:
+                stale.append(offering_id)
+            continue
+        latest = max((t for t in (graded, changed, graph_changed) if t is not None), default=None)
+        if latest is not None and built < latest:
+            stale.append(offering_id)
+    return stale
+
+
+def _cube_cells(offering_ids):
+    """{(offering_id, po_id, department_id, cohort_level): [skor toplamı, kapsama toplamı, öğrenci]}"""
+    enrollments = {
+        enrollment_id: (offering_id, student_id, level or 0)
+        for enrollment_id, offering_id, student_id, level in (
+            Enrollment.objects
+            .filter(offering_id__in=offering_ids, status=Enrollment.Status.ENROLLED)
+            .values_list("id", "offering_id", "student_id", "student__student_level__number")
+        )
+    }
+
+    cells = defaultdict(dict)
+    for enrollment_id, component_id, score in (
+        CourseGrade.objects
+        .filter(enrollment_id__in=list(enrollments), component__offering_id=F("enrollment__offering_id"))
+        .order_by("id")
+        .values_list("enrollment_id", "component_id", "score")
+    ):
+        cells[enrollment_id][component_id] = float(score or 0.0)
+
+    student_departments = defaultdict(set)
+    for student_id, department_id in (
+        Student.departments.through.objects
+        .filter(student_id__in={student_id for _, student_id, _ in enrollments.values()})
+        .values_list("student_id", "department_id")
+    ):
+        student_departments[student_id].add(department_id)
+
+    graph_cache.sync()
+    graphs = get_offering_graphs(offering_ids)
+    po_departments = {
+        po_id: dep_id
+        for graph in graphs.values()
+        for programs in graph["lo_programs"].values()
+        for po_id, dep_id, _ in programs
+    }
+
+    totals = defaultdict(lambda: [0.0, 0.0, 0])
+    for enrollment_id, components in cells.items():
+        offering_id, student_id, level = enrollments[enrollment_id]
+        graph = graphs[offering_id]
+        lo_partials = _lo_partials(sorted(components.items()), graph["comp_relations"])
+        po_scores, po_weights = _po_partials(*lo_partials, graph["lo_programs"], student_departments[student_id])
+        for po_id, weight in po_weights.items():
+            cell = totals[(offering_id, po_id, po_departments[po_id], level)]
+            cell[0] += po_scores[po_id]
+            cell[1] += weight
+            cell[2] += 1
+    return totals
+
+
+def build_outcome_cube(offering_ids, batch_size=CUBE_BATCH_SIZE):
+    """Verilen şubelerin küp satırlarını baştan yazar. Dönen: yazılan satır sayısı"""
+    offering_ids = sorted(set(offering_ids))
+
+    written = 0
+    for start in range(0, len(offering_ids), batch_size):
+        chunk = offering_ids[start:start + batch_size]
+        # Okumadan önce alınır: hesap sırasında gelen değişiklik bir sonraki yenilemede görülür
+        built_at = timezone.now()
+        terms = {
+            offering_id: (course_id, year, semester)
+            for offering_id, course_id, year, semester in (
+                CourseOffering.objects
+                .filter(pk__in=chunk)
+                .values_list("id", "course_id", "year", "semester")
+            )
+        }
+
+        rows = []
+        for (offering_id, po_id, department_id, level), (score, coverage, count) in sorted(_cube_cells(chunk).items()):
+            course_id, year, semester = terms[offering_id]
+            rows.append(ProgramOutcomeAttainment(
+                department_id=department_id,
+                program_outcome_id=po_id,
+                offering_id=offering_id,
+                course_id=course_id,
+                year=year,
+                semester=semester,
+                cohort_level=level,
+                student_count=count,
+                mean_score=round(score / count, 2),
+                mean_coverage=round(coverage / count, 2),
+            ))
+
+        with transaction.atomic():
+            ProgramOutcomeAttainment.objects.filter(offering_id__in=chunk).delete()
+            ProgramOutcomeAttainment.objects.bulk_create(rows, batch_size=batch_size)
+            # Hücre üretmeyen şubeler de yazılmış sayılır, her yenilemede tekrar hesaplanmaz
+            CourseOffering.objects.filter(pk__in=chunk).update(outcome_cube_built_at=built_at)
+        written += len(rows)
+
+    return written
+
+
+def refresh_outcome_cube(offering_ids=None, batch_size=CUBE_BATCH_SIZE):
+    """Sadece eskimiş şubeleri yeniden yazar. Dönen: (yenilenen şube, yazılan satır)"""
+    stale = stale_cube_offerings(offering_ids)
+    return len(stale), build_outcome_cube(stale, batch_size)
+
+
+# ------------------------------------------------------------
+# Dilimleme / drill-down
+# ------------------------------------------------------------
+def attainment_rollup(group_by, **filters):
+    """
+    Küp satırlarını group_by alanlarına göre toplar. Ortalamalar öğrenci
+    sayısıyla ağırlıklıdır; student_count ders bazındaki sayımların
+    toplamıdır (aynı öğrenci birden fazla derste sayılabilir).
+    """
+    rows = (
+        ProgramOutcomeAttainment.objects
+        .filter(**filters)
+        .values(*group_by)
+        .annotate(
+            students=Sum("student_count"),
+            score_total=Sum(F("mean_score") * F("student_count"), output_field=FloatField()),
+            coverage_total=Sum(F("mean_coverage") * F("student_count"), output_field=FloatField()),
+        )
+        .order_by(*group_by)
+    )
+    return [
+        {
+            **{field: row[field] for field in group_by},
+            "student_count": row["students"],
+            "mean_score": round(row["score_total"] / row["students"], 2) if row["students"] else 0.0,
+            "mean_coverage": round(row["coverage_total"] / row["students"], 2) if row["students"] else 0.0,
+        }
+        for row in rows
+    ]
+
+
+def component_drilldown(course_id, program_outcome_id, year=None, semester=None, student_slice=None):
+    """
+    Dersin (istenirse bir dönemin) bileşenlerinin PO'ya katkısı:
+    graftaki yol ağırlığı (Σ LO ağırlığı × PO ağırlığı) ve not ortalaması.
+    Küpteki gibi sadece PO'nun bölümündeki öğrencilerin notları sayılır;
+    student_slice (küp alanları: bölüm, fakülte, sınıf) verilirse öğrenciler
+    drill-down yapılan küp satırındakilerle sınırlanır.
+    """
+    offerings = CourseOffering.objects.filter(course_id=course_id)
+    if year is not None:
+        offerings = offerings.filter(year=year)
+    if semester is not None:
+        offerings = offerings.filter(semester=semester)
+    offering_ids = list(offerings.values_list("id", flat=True))
+
+    graph_cache.sync()
+    path_weights = defaultdict(float)
+    for graph in get_offering_graphs(offering_ids).values():
+        lo_weights = {
+            lo_id: pw
+            for lo_id, programs in graph["lo_programs"].items()
+            for po_id, _, pw in programs
+            if po_id == program_outcome_id
+        }
+        for component_id, relations in graph["comp_relations"].items():
+            for lo_id, lw in relations:
+                if lo_id in lo_weights:
+                    path_weights[component_id] += lw * lo_weights[lo_id]
+    if not path_weights:
+        return []
+
+    student_filters = Q(departments=Subquery(
+        ProgramOutcome.objects.filter(pk=program_outcome_id).values("department_id")[:1]
+    ))
+    for field, value in (student_slice or {}).items():
+        if field not in STUDENT_SLICE_FILTERS:
+            raise CubeQueryError(f"Bileşen seviyesinde desteklenmeyen filtre: {field}")
+        condition = Q(**{STUDENT_SLICE_FILTERS[field]: value})
+        # Küpte sınıfı olmayan öğrenciler 0. sınıfa yazılır
+        if field == "cohort_level" and value == 0:
+            condition |= Q(student_level__isnull=True)
+        student_filters &= condition
+
+    labels = dict(CourseAssessmentComponent.COMPONENT_TYPES)
+    rows = (
+        CourseGrade.objects
+        .filter(
+            component_id__in=list(path_weights),
+            enrollment__status=Enrollment.Status.ENROLLED,
+            component__offering_id=F("enrollment__offering_id"),
+            # Alt sorgu: birden fazla bölümlü öğrencinin notu iki kez sayılmasın
+            enrollment__student__in=Student.objects.filter(student_filters),
+        )
+        .values(
+            "component_id", "component__type", "component__weight",
+            "component__offering_id", "component__offering__year", "component__offering__semester",
+        )
+        .annotate(mean_score=Avg("score"), student_count=Count("enrollment_id", distinct=True))
+        .order_by("component__offering_id", "component__type", "component_id")
+    )
+    return [
+        {
+            "component_id": row["component_id"],
+            "offering_id": row["component__offering_id"],
+            "year": row["component__offering__year"],
+            "semester": row["component__offering__semester"],
+            "type": row["component__type"],
+            "label": labels.get(row["component__type"], row["component__type"]),
+            "weight": row["component__weight"],
+            "po_weight": round(path_weights[row["component_id"]] * 100, 2),
+            "mean_score": round(float(row["mean_score"] or 0.0), 2),
+            "student_count": row["student_count"],
+        }
+        for row in rows
+    ]
+
+
+def attainment_drilldown(level, params, scope=None):
+    """
+    API girişi. level: faculty / department / course / component.
+    params: SLICE_FILTERS anahtarlarıyla gelen (metin) filtreler.
+    scope: kullanıcının yetki alanı, params'ın üzerine yazılır
+           (ör. {"department__faculty_id": 3}).
+    """
+    filters = {}
+    for key, field in SLICE_FILTERS.items():
+        value = params.get(key)
+        if value in (None, ""):
+            continue
+        if key != "semester":
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise CubeQueryError(f"Geçersiz {key}: {value}")
+        filters[field] = value
+    filters.update(scope or {})
+
+    if level == "component":
+        if "course_id" not in filters or "program_outcome_id" not in filters:
+            raise CubeQueryError("component seviyesi için course ve program_outcome gerekli.")
+        # Yetki alanındaki küpte satırı olmayan ders / PO için bileşen de gösterilmez
+        if not ProgramOutcomeAttainment.objects.filter(**filters).exists():
+            return []
+        # Bölüm / fakülte / sınıf dilimleri öğrenci filtresi olarak taşınır ki
+        # bileşen satırları drill-down yapılan küp satırıyla aynı öğrencileri saysın
+        return component_drilldown(
+            filters["course_id"], filters["program_outcome_id"], filters.get("year"), filters.get("semester"),
+            student_slice={k: v for k, v in filters.items() if k not in COMPONENT_LEVEL_FIELDS},
+        )
+
+    if level not in DRILLDOWN_LEVELS:
+        raise CubeQueryError(f"Geçersiz seviye: {level}")
+    required, group_by = DRILLDOWN_LEVELS[level]
+    if SLICE_FILTERS[required] not in filters:
+        raise CubeQueryError(f"{level} seviyesi için {required} gerekli.")
+    return attainment_rollup(group_by, **filters)
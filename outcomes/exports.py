@@ -0,0 +1,46 @@
+# outcomes/exports.py
+"""Bölüm PO başarı matrisi (öğrenci × program çıktısı) dışa aktarımı."""
+from itertools import groupby
+
+from courses.exports import EXPORT_CHUNK_SIZE, full_name
+from outcomes.models import ProgramOutcome, StudentProgramOutcomeScore
+from students.models import Student
+
+
+def department_po_matrix_export(department):
+    """(header, rows) — kayıtlı StudentProgramOutcomeScore satırlarından, öğrenci sırasında akar."""
+    outcomes = list(
+        ProgramOutcome.objects.filter(department=department).order_by("code").values_list("id", "code")
+    )
+    header = ["student_no", "ad_soyad"] + [f"PO{code}" for _, code in outcomes]
+    return header, _po_matrix_rows(department, [po_id for po_id, _ in outcomes])
+
+
+def _po_matrix_rows(department, po_ids):
+    students = (
+        Student.objects
+        .filter(departments=department)
+        .order_by("id")
+        .values_list("id", "student_no", "user__first_name", "user__last_name", "user__username")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    scores = groupby(
+        StudentProgramOutcomeScore.objects
+        .filter(program_outcome__department=department)
+        .order_by("student_id")
+        .values_list("student_id", "program_outcome_id", "score")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE),
+        key=lambda row: row[0],
+    )
+
+    # İki sıralı akış student_id üzerinden birleştirilir
+    current_id, current_rows = next(scores, (None, ()))
+    for student_id, student_no, first, last, username in students:
+        while current_id is not None and current_id < student_id:
+            current_id, current_rows = next(scores, (None, ()))
+
+        values = {}
+        if current_id == student_id:
+            values = {po_id: round(score, 2) for _, po_id, score in current_rows}
+
+        yield [student_no, full_name(first, last, username)] + [values.get(po_id) for po_id in po_ids]
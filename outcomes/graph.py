@@ -0,0 +1,197 @@
+# outcomes/graph.py
+"""
+Component -> LO -> PO ağırlık grafiği için süreç içi önbellek.
+
+Graf nadiren değişir ama her skor hesabında okunur. Derlenmiş (normalize
+edilmiş) graf şube ve bölüm bazında LRU önbellekte tutulur; geçerliliği
+veritabanındaki OutcomeGraphVersion satırıyla kontrol edilir. İlişkiler
+değiştiğinde sürüm artırılır ve tüm worker'lar bir sonraki okumada
+önbelleklerini boşaltır.
+"""
+import threading
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from courses.models import ComponentLearningRelation, LearningProgramRelation
+from outcomes.models import OutcomeGraphVersion, ProgramOutcome
+
+GRAPH_SCOPE = "global"
+
+# Eksik graf parçaları bu büyüklükte gruplar halinde yüklenir
+GRAPH_LOAD_BATCH_SIZE = 500
+
+
+def normalize_pct(weight) -> float:
+    """%60 ve 0.6 gibi iki yazımı da 0-1 aralığına çeker."""
+    w = float(weight or 0.0)
+    if w > 1:
+        w /= 100.0
+    return w
+
+
+def current_outcome_graph_version():
+    return (
+        OutcomeGraphVersion.objects
+        .filter(scope=GRAPH_SCOPE)
+        .values_list("version", flat=True)
+        .first()
+    ) or 0
+
+
+def current_outcome_graph_changed_at():
+    """İlişkilerin son değişme zamanı (hiç değişmediyse None)"""
+    return (
+        OutcomeGraphVersion.objects
+        .filter(scope=GRAPH_SCOPE)
+        .values_list("updated_at", flat=True)
+        .first()
+    )
+
+
+def bump_outcome_graph_version():
+    """Graf sürümünü artırır; tüm süreçlerdeki önbellekler geçersiz olur."""
+    # update() auto_now alanını doldurmaz; değişiklik zamanı elle yazılır
+    updated = (
+        OutcomeGraphVersion.objects
+        .filter(scope=GRAPH_SCOPE)
+        .update(version=F("version") + 1, updated_at=timezone.now())
+    )
+    if not updated:
+        _, created = OutcomeGraphVersion.objects.get_or_create(
+            scope=GRAPH_SCOPE, defaults={"version": 1}
+        )
+        if not created:
+            OutcomeGraphVersion.objects.filter(scope=GRAPH_SCOPE).update(
+                version=F("version") + 1, updated_at=timezone.now()
+            )
+
+
+class OutcomeGraphCache:
+    """Sürüm kontrollü, boyut sınırlı (LRU) graf önbelleği."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """Paylaşılan sürüm satırını okur; sürüm değiştiyse önbelleği boşaltır."""
+        version = current_outcome_graph_version()
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.version = None
+
+    def get_many(self, keys, loader):
+        """
+        keys için önbellekteki değerleri döner; eksikleri loader(eksik_keys)
+        ile tek seferde yükler. loader {key: value} dönmelidir.
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+                else:
+                    missing.append(key)
+
+        if missing:
+            loaded = loader(missing)
+            with self._lock:
+                for key in missing:
+                    value = loaded.get(key)
+                    found[key] = value
+                    self._entries[key] = value
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        return found
+
+    def __len__(self):
+        return len(self._entries)
+
+
+graph_cache = OutcomeGraphCache(getattr(settings, "OUTCOME_GRAPH_CACHE_SIZE", 256))
+
+
+def _load_offering_graphs(keys):
+    """
+    ("offering", id) anahtarları için:
+      comp_relations: {component_id: [(lo_id, ağırlık)]}
+      lo_programs:    {lo_id: [(po_id, department_id, ağırlık)]}
+    """
+    offering_ids = [key[1] for key in keys]
+    graphs = {key: {"comp_relations": {}, "lo_programs": {}} for key in keys}
+
+    lo_owners = defaultdict(set)
+    for start in range(0, len(offering_ids), GRAPH_LOAD_BATCH_SIZE):
+        rows = (
+            ComponentLearningRelation.objects
+            .filter(component__offering_id__in=offering_ids[start:start + GRAPH_LOAD_BATCH_SIZE])
+            .order_by("id")
+            .values_list("component__offering_id", "component_id", "learning_outcome_id", "weight")
+        )
+        for offering_id, comp_id, lo_id, weight in rows:
+            relations = graphs[("offering", offering_id)]["comp_relations"]
+            relations.setdefault(comp_id, []).append((lo_id, normalize_pct(weight)))
+            lo_owners[lo_id].add(offering_id)
+
+    lo_ids = list(lo_owners)
+    for start in range(0, len(lo_ids), GRAPH_LOAD_BATCH_SIZE):
+        rows = (
+            LearningProgramRelation.objects
+            .filter(learning_outcome_id__in=lo_ids[start:start + GRAPH_LOAD_BATCH_SIZE])
+            .order_by("id")
+            .values_list(
+                "learning_outcome_id", "program_outcome_id",
+                "program_outcome__department_id", "weight",
+            )
+        )
+        for lo_id, po_id, dep_id, weight in rows:
+            for offering_id in lo_owners[lo_id]:
+                programs = graphs[("offering", offering_id)]["lo_programs"]
+                programs.setdefault(lo_id, []).append((po_id, dep_id, normalize_pct(weight)))
+
+    return graphs
+
+
+def _load_department_graphs(keys):
+    """("department", id) anahtarları için id sıralı PO listesi: [(po_id, code, description)]"""
+    department_ids = [key[1] for key in keys]
+    graphs = {key: [] for key in keys}
+
+    for start in range(0, len(department_ids), GRAPH_LOAD_BATCH_SIZE):
+        rows = (
+            ProgramOutcome.objects
+            .filter(department_id__in=department_ids[start:start + GRAPH_LOAD_BATCH_SIZE])
+            .order_by("id")
+            .values_list("id", "department_id", "code", "description")
+        )
+        for po_id, dep_id, code, description in rows:
+            graphs[("department", dep_id)].append((po_id, code, description))
+
+    return graphs
+
+
+def get_offering_graphs(offering_ids):
+    """{offering_id: {"comp_relations", "lo_programs"}} — önbellekten."""
+    found = graph_cache.get_many([("offering", oid) for oid in offering_ids], _load_offering_graphs)
+    return {key[1]: graph for key, graph in found.items()}
+
+
+def get_department_graphs(department_ids):
+    """{department_id: [(po_id, code, description)]} — önbellekten."""
+    found = graph_cache.get_many([("department", did) for did in department_ids], _load_department_graphs)
+    return {key[1]: graph for key, graph in found.items()}
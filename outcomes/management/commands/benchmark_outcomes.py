@@ -0,0 +1,80 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from outcomes.benchmark import COMPONENT_LAYOUTS, generate_dataset, run_benchmarks, compare_reports
+
+
+class Command(BaseCommand):
+    help = (
+        "Sentetik veriyle outcome ve not hesaplamalarının süresini ve sorgu sayısını ölçer. "
+        "Veri asıl veritabanına değil, iş bitince silinen geçici bir test "
+        "veritabanına yazılır; sonuçlar JSON olarak yazılır."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=20000)
+        parser.add_argument("--offerings", type=int, default=2000)
+        parser.add_argument("--faculties", type=int, default=4)
+        parser.add_argument("--departments", type=int, default=20)
+        parser.add_argument("--components", type=int, default=3, choices=sorted(COMPONENT_LAYOUTS),
+                            help="Şube başına bileşen sayısı")
+        parser.add_argument("--courses-per-student", type=int, default=6)
+        parser.add_argument("--repeat", type=int, default=3, help="Her ölçümün tekrar sayısı")
+        parser.add_argument("--sample-size", type=int, default=100,
+                            help="Toplu hesaplamada kullanılacak öğrenci sayısı")
+        parser.add_argument("--skip-rebuild", action="store_true",
+                            help="Tüm öğrenciler için tam yeniden hesaplamayı ölçme")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", type=str, help="Sonuçların yazılacağı JSON dosyası")
+        parser.add_argument("--compare", type=str, help="Karşılaştırılacak önceki JSON sonucu")
+
+    def handle(self, *args, **options):
+        # Veri asıl veritabanını kilitlememek için geçici test veritabanında
+        # üretilip ölçülür; süreç yarıda kesilse de asıl veriye dokunulmaz
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write("Sentetik veri üretiliyor...")
+            dataset = generate_dataset(
+                students=options["students"],
+                offerings=options["offerings"],
+                faculties=options["faculties"],
+                departments=options["departments"],
+                components_per_offering=options["components"],
+                courses_per_student=options["courses_per_student"],
+                seed=options["seed"],
+            )
+            self.stdout.write(", ".join(f"{k}={v}" for k, v in dataset["sizes"].items()))
+
+            report = run_benchmarks(
+                dataset,
+                repeat=options["repeat"],
+                sample_size=options["sample_size"],
+                full_rebuild=not options["skip_rebuild"],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for result in report["results"]:
+            self.stdout.write(
+                f"{result['name']:<60} median {result['median_ms']:>10.2f} ms  "
+                f"sorgu {result['queries']}"
+            )
+
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as f:
+                previous = json.load(f)
+            self.stdout.write("\nÖnceki çalıştırmaya göre:")
+            for name, old_ms, new_ms, change, old_q, new_q in compare_reports(previous, report):
+                style = self.style.ERROR if change > 10 else self.style.SUCCESS
+                self.stdout.write(style(
+                    f"{name:<60} {old_ms:>10.2f} → {new_ms:>10.2f} ms ({change:+.1f}%)  "
+                    f"sorgu {old_q} → {new_q}"
+                ))
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Sonuçlar yazıldı: {options['output']}"))
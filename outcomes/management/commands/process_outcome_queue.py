@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from outcomes.services import (
+    OUTCOME_BATCH_SIZE,
+    process_program_outcome_queue,
+    process_grade_change_queue,
+)
+
+
+class Command(BaseCommand):
+    help = "PO yeniden hesaplama kuyruğunu ve not değişikliklerini işleyen worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=OUTCOME_BATCH_SIZE,
+                            help="Tek seferde işlenecek iş / değişiklik sayısı")
+        parser.add_argument("--sleep", type=float, default=2.0,
+                            help="Kuyruk boşken bekleme süresi (sn)")
+        parser.add_argument("--once", action="store_true",
+                            help="Kuyruğu bir kez boşalt ve çık")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total = 0
+
+        while True:
+            try:
+                processed = process_program_outcome_queue(batch_size)
+                processed += process_grade_change_queue(batch_size)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"❌ Kuyruk işlenirken hata: {e}"))
+                processed = 0
+                if options["once"]:
+                    break
+
+            total += processed
+            if processed:
+                self.stdout.write(f"{processed} iş işlendi")
+                continue
+
+            if options["once"]:
+                break
+            time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Toplam {total} iş işlendi."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from departments.models import Department
+from outcomes.services import OUTCOME_BATCH_SIZE, compute_and_save_program_outcomes_for_students
+from students.models import Student
+
+
+class Command(BaseCommand):
+    help = (
+        "Öğrencilerin LO ara toplamlarını ve PO skorlarını notlardan baştan hesaplar. "
+        "Artımlı güncellemeler bu tablolara dayandığı için ilk kurulumda bir kez çalıştırılmalıdır."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--department", type=str, help="Sadece bu bölüm kodundaki öğrenciler")
+        parser.add_argument("--batch-size", type=int, default=OUTCOME_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        students = Student.objects.order_by("id")
+
+        if options["department"]:
+            department = Department.objects.filter(code__iexact=options["department"]).first()
+            if not department:
+                self.stdout.write(self.style.ERROR(f"❌ Bölüm bulunamadı: {options['department']}"))
+                return
+            students = students.filter(departments=department)
+
+        student_ids = list(students.values_list("id", flat=True))
+        written = compute_and_save_program_outcomes_for_students(student_ids, options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(student_ids)} öğrenci için {written} PO skoru güncellendi."
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import CourseOffering
+from outcomes.cube import CUBE_BATCH_SIZE, build_outcome_cube, refresh_outcome_cube
+
+
+class Command(BaseCommand):
+    help = (
+        "PO başarı küpünü (ProgramOutcomeAttainment) günceller. Varsayılan olarak "
+        "sadece notu ya da LO/PO grafı değişen şubeler yeniden yazılır."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--offering", type=int, action="append", help="Sadece bu şube (tekrarlanabilir)")
+        parser.add_argument("--full", action="store_true", help="Güncel olsa da tüm şubeleri yeniden yaz")
+        parser.add_argument("--batch-size", type=int, default=CUBE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        offering_ids = options["offering"]
+
+        if options["full"]:
+            if offering_ids is None:
+                offering_ids = CourseOffering.objects.values_list("id", flat=True)
+            offering_ids = list(offering_ids)
+            written = build_outcome_cube(offering_ids, options["batch_size"])
+            refreshed = len(offering_ids)
+        else:
+            refreshed, written = refresh_outcome_cube(offering_ids, options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {refreshed} şube için {written} küp satırı yazıldı."))
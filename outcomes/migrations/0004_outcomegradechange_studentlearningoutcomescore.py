@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_initial'),
+        ('outcomes', '0003_outcomerecomputejob'),
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutcomeGradeChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('component', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outcome_changes', to='courses.courseassessmentcomponent')),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outcome_changes', to='courses.enrollment')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentLearningOutcomeScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score_sum', models.FloatField(default=0.0)),
+                ('weight_sum', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('learning_outcome', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_scores', to='outcomes.learningoutcome')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='learning_scores', to='students.student')),
+            ],
+            options={
+                'unique_together': {('student', 'learning_outcome')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:47
+
+from django.db import migrations, models
+from django.db.models import Case, F, When
+
+
+def fill_scores(apps, schema_editor):
+    StudentLearningOutcomeScore = apps.get_model("outcomes", "StudentLearningOutcomeScore")
+    StudentLearningOutcomeScore.objects.update(
+        score=Case(
+            When(weight_sum__gt=100, then=F("score_sum") * 100.0 / F("weight_sum")),
+            default=F("score_sum"),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outcomes', '0004_outcomegradechange_studentlearningoutcomescore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentlearningoutcomescore',
+            name='score',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
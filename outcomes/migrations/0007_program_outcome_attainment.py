@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_coursegrade_updated_at'),
+        ('departments', '0002_department_statistic_counts'),
+        ('outcomes', '0006_outcomegraphversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgramOutcomeAttainment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('semester', models.CharField(max_length=10)),
+                ('cohort_level', models.PositiveSmallIntegerField(default=0)),
+                ('student_count', models.PositiveIntegerField(default=0)),
+                ('mean_score', models.FloatField(default=0.0)),
+                ('mean_coverage', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='po_attainment', to='courses.course')),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='po_attainment', to='departments.department')),
+                ('offering', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='po_attainment', to='courses.courseoffering')),
+                ('program_outcome', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attainment', to='outcomes.programoutcome')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['department', 'program_outcome'], name='po_attainment_dept_po_idx'), models.Index(fields=['course', 'year', 'semester'], name='po_attainment_course_term_idx')],
+                'constraints': [models.UniqueConstraint(fields=('offering', 'program_outcome', 'cohort_level'), name='unique_po_attainment_cell')],
+            },
+        ),
+    ]
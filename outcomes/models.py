@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from departments.models import Department
 from courses.models import CourseOffering
 
@@ -89,3 +91,250 @@ class StudentProgramOutcomeScore(models.Model):
 
     def __str__(self):
         return f"{self.student} → {self.program_outcome.code}: {self.score:.2f}"
+
+
+# ============================================================
+# STUDENT LEARNING OUTCOME SCORE (ARA TOPLAMLAR)
+# ============================================================
+class StudentLearningOutcomeScore(models.Model):
+    """
+    Öğrencinin LO skorlarının materialize tablosu.
+      score_sum  = Σ not * LO ağırlığı
+      weight_sum = Σ LO ağırlığı (%)
+      score      = toplam ağırlık %100'ü aşarsa normalize edilmiş skor
+    Satır sadece öğrencinin o LO'ya bağlı en az bir notu varsa bulunur.
+    CourseGrade ve ComponentLearningRelation değişiklikleriyle güncel tutulur;
+    PO skorları ve LO raporları bu tablodan okunur.
+    """
+    student = models.ForeignKey(
+        "students.Student",
+        on_delete=models.CASCADE,
+        related_name="learning_scores"
+    )
+    learning_outcome = models.ForeignKey(
+        LearningOutcome,
+        on_delete=models.CASCADE,
+        related_name="student_scores"
+    )
+    score_sum = models.FloatField(default=0.0)
+    weight_sum = models.FloatField(default=0.0)
+    score = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'learning_outcome')
+
+    def __str__(self):
+        return f"{self.student} → {self.learning_outcome.code}: {self.score:.2f}"
+
+
+# ============================================================
+# PO YENİDEN HESAPLAMA KUYRUĞU
+# ============================================================
+class OutcomeRecomputeJob(models.Model):
+    """
+    Not girişinden sonra öğrencinin PO skorlarının arka planda
+    yeniden hesaplanması için kuyruk kaydı.
+    Aynı öğrenci için aynı anda tek bir bekleyen (PENDING) iş olabilir.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Bekliyor"
+        RUNNING = "RUNNING", "İşleniyor"
+        DONE = "DONE", "Tamamlandı"
+        FAILED = "FAILED", "Hata"
+
+    student = models.ForeignKey(
+        "students.Student",
+        on_delete=models.CASCADE,
+        related_name="outcome_jobs"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    worker = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["student"],
+                condition=models.Q(status="PENDING"),
+                name="unique_pending_outcome_job_per_student",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.student} ({self.get_status_display()})"
+
+
+class OutcomeGradeChange(models.Model):
+    """
+    Değişen (kayıt, bileşen) not hücresi.
+    Worker bu kayıtlardan sadece etkilenen LO / PO satırlarını günceller.
+    Aynı hücre birden fazla kez yazılabilir; işleme sırasında tekilleştirilir.
+    """
+    enrollment = models.ForeignKey(
+        "courses.Enrollment",
+        on_delete=models.CASCADE,
+        related_name="outcome_changes"
+    )
+    component = models.ForeignKey(
+        "courses.CourseAssessmentComponent",
+        on_delete=models.CASCADE,
+        related_name="outcome_changes"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.enrollment_id} / {self.component_id}"
+
+
+class OutcomeGraphVersion(models.Model):
+    """
+    Component -> LO -> PO ağırlık grafiğinin sürüm sayacı.
+    İlişkiler her değiştiğinde artırılır; süreç içi graf önbellekleri
+    bu satırı okuyarak diğer worker'lardaki değişiklikleri fark eder.
+    """
+    scope = models.CharField(max_length=50, unique=True, default="global")
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.scope} v{self.version}"
+
+
+# ============================================================
+# PO BAŞARI KÜPÜ
+# ============================================================
+class ProgramOutcomeAttainment(models.Model):
+    """
+    (bölüm, PO, ders, yıl, dönem, öğrenci sınıfı) hücresi için ortalama
+    PO başarısı, kapsama ve öğrenci sayısı. Şube bazında tutulur; aynı
+    dönemdeki şubeler sorgu sırasında öğrenci sayısıyla ağırlıklı toplanır.
+    outcomes.cube.refresh_outcome_cube ile sadece notu / grafı değişen
+    şubeler için yeniden yazılır.
+    """
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name="po_attainment")
+    program_outcome = models.ForeignKey(ProgramOutcome, on_delete=models.CASCADE, related_name="attainment")
+    offering = models.ForeignKey(CourseOffering, on_delete=models.CASCADE, related_name="po_attainment")
+    course = models.ForeignKey("courses.Course", on_delete=models.CASCADE, related_name="po_attainment")
+    year = models.PositiveSmallIntegerField()
+    semester = models.CharField(max_length=10)
+    # Student.student_level numarası; sınıfı girilmemiş öğrenciler 0
+    cohort_level = models.PositiveSmallIntegerField(default=0)
+
+    student_count = models.PositiveIntegerField(default=0)
+    mean_score = models.FloatField(default=0.0)
+    mean_coverage = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["offering", "program_outcome", "cohort_level"],
+                name="unique_po_attainment_cell",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["department", "program_outcome"], name="po_attainment_dept_po_idx"),
+            models.Index(fields=["course", "year", "semester"], name="po_attainment_course_term_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.program_outcome_id} / {self.offering_id} / {self.cohort_level}: {self.mean_score:.2f}"
+
+
+# ============================================================
+# SENKRONİZASYON (CourseGrade / ağırlık ilişkileri)
+# ============================================================
+# Toplu yazma yolları (bulk_create / bulk_update) sinyal üretmez ve
+# değişiklikleri kendileri kaydeder; buradaki alıcılar admin gibi
+# tekil kayıt düzenlemelerini yakalar. İşlem commit olduktan sonra
+# kuyruğa yazılır, böylece cascade silmelerde yetim kayıt oluşmaz.
+@receiver([post_save, post_delete], sender="courses.CourseGrade")
+def record_course_grade_change(sender, instance, **kwargs):
+    enrollment_id, component_id = instance.enrollment_id, instance.component_id
+
+    def _record():
+        from courses.models import Enrollment, CourseAssessmentComponent  # dairesel importtan kaçınmak için lokal import
+
+        if (
+            Enrollment.objects.filter(pk=enrollment_id).exists()
+            and CourseAssessmentComponent.objects.filter(pk=component_id).exists()
+        ):
+            OutcomeGradeChange.objects.create(enrollment_id=enrollment_id, component_id=component_id)
+
+    transaction.on_commit(_record)
+
+
+@receiver(post_delete, sender="courses.CourseGrade")
+def stamp_course_grade_deletion(sender, instance, **kwargs):
+    from courses.models import Enrollment  # dairesel importtan kaçınmak için lokal import
+
+    # Silinen not CourseGrade.updated_at'te görünmez; öğrencinin ve şubenin damgası ileri alınır.
+    # Kayıt cascade ile siliniyorsa bu noktada henüz veritabanındadır.
+    student_id, offering_id = (
+        Enrollment.objects
+        .filter(pk=instance.enrollment_id)
+        .values_list("student_id", "offering_id")
+        .first()
+    ) or (None, None)
+
+    def _stamp():
+        from outcomes.services import mark_grades_changed
+
+        mark_grades_changed([student_id], [offering_id])
+
+    transaction.on_commit(_stamp)
+
+
+@receiver([post_save, post_delete], sender="courses.Enrollment")
+def stamp_enrollment_change(sender, instance, **kwargs):
+    # Kayıt silme / durum değişikliği PO motorunun ve küpün okuduğu notları değiştirir
+    student_id, offering_id = instance.student_id, instance.offering_id
+
+    def _stamp():
+        from outcomes.services import mark_grades_changed
+
+        mark_grades_changed([student_id], [offering_id])
+
+    transaction.on_commit(_stamp)
+
+
+@receiver([post_save, post_delete], sender="courses.ComponentLearningRelation")
+def recompute_after_component_relation_change(sender, instance, **kwargs):
+    from courses.models import CourseAssessmentComponent  # dairesel importtan kaçınmak için lokal import
+    from outcomes.services import schedule_outcome_graph_change
+
+    offering_id = (
+        CourseAssessmentComponent.objects
+        .filter(pk=instance.component_id)
+        .values_list("offering_id", flat=True)
+        .first()
+    )
+    schedule_outcome_graph_change(offering_ids=[offering_id])
+
+
+@receiver([post_save, post_delete], sender="courses.LearningProgramRelation")
+def recompute_after_program_relation_change(sender, instance, **kwargs):
+    from outcomes.services import schedule_outcome_graph_change
+
+    schedule_outcome_graph_change(learning_outcome_ids=[instance.learning_outcome_id])
+
+
+@receiver([post_save, post_delete], sender=ProgramOutcome)
+def bump_graph_after_program_outcome_change(sender, instance, **kwargs):
+    from outcomes.services import schedule_outcome_graph_change
+
+    schedule_outcome_graph_change()
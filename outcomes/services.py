@@ -1,5 +1,19 @@
 # outcomes/services.py
+import os
+import socket
+import threading
 from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Avg, Count, F, Min, OuterRef, Q, Subquery
+
+try:
+    import numpy as np
+except ImportError:  # NumPy opsiyonel; yoksa saf Python motoru kullanılır
+    np = None
 
 from courses.models import (
     Enrollment,              # Öğrencinin derse kayıtları
@@ -8,176 +22,874 @@ from courses.models import (
     ComponentLearningRelation,     # Component -> LO (%)
     CourseOffering,
 )
-from outcomes.models import ProgramOutcome, LearningOutcome, StudentProgramOutcomeScore
+from outcomes.models import (
+    ProgramOutcome,
+    LearningOutcome,
+    StudentProgramOutcomeScore,
+    StudentLearningOutcomeScore,
+    OutcomeRecomputeJob,
+    OutcomeGradeChange,
+)
 from courses.models import LearningProgramRelation
+from outcomes.graph import (
+    graph_cache, get_offering_graphs, get_department_graphs, normalize_pct, current_outcome_graph_changed_at,
+    bump_outcome_graph_version,
+)
+from students.models import Student
+
+# Toplu hesaplama / yazma işlemlerinde tek seferde işlenen öğrenci sayısı
+OUTCOME_BATCH_SIZE = 500
+
 
 def compute_and_save_student_program_outcomes(student):
-    results = compute_student_program_outcomes(student)
-
-    for po_id, item in results.items():
-        StudentProgramOutcomeScore.objects.update_or_create(
-            student=student,
-            program_outcome_id=po_id,
-            defaults={
-                "score": item["score"],
-                "coverage": item["coverage"],
-            }
+    compute_and_save_program_outcomes_for_students([student])
+
+
+def compute_and_save_program_outcomes_for_students(students, batch_size=OUTCOME_BATCH_SIZE):
+    """
+    Öğrenci listesinin PO vektörlerini toplu hesaplar ve toplu kaydeder.
+    LO ara toplamları da (StudentLearningOutcomeScore) tamamen yenilenir.
+    Dönen: yazılan PO satırı sayısı
+    """
+    student_ids = list(dict.fromkeys(getattr(s, "pk", s) for s in students))
+
+    written = 0
+    for start in range(0, len(student_ids), batch_size):
+        chunk = student_ids[start:start + batch_size]
+        inputs = load_outcome_inputs(chunk)
+
+        results = {}
+        partials = {}
+        for student_id in chunk:
+            lo_sums, lo_weights = _lo_partials(
+                inputs["graded"].get(student_id, ()), inputs["comp_relations"]
+            )
+            for lo_id in lo_sums:
+                partials[(student_id, lo_id)] = (lo_sums[lo_id], lo_weights[lo_id])
+            results[student_id] = _student_po_vector(student_id, inputs, (lo_sums, lo_weights))
+
+        existing = (
+            StudentLearningOutcomeScore.objects
+            .filter(student_id__in=chunk)
         )
+        save_learning_outcome_partials(partials, existing, batch_size)
+        written += save_program_outcomes_for_students(results, batch_size, prune=True)
+
+    return written
 
-    return
 
-def _safe_pct_denominator(total: float) -> float:
+def mark_grades_changed(student_ids, offering_ids=()):
     """
-    Yüzde toplamları 100'ü geçerse normalize etmek için payda.
-    - Toplam <= 100 ise 100 baz alınır (yani artırma yok).
-    - Toplam  > 100 ise toplam baz alınır (yani bölünerek normalize edilir).
+    Student.grades_changed_at ve CourseOffering.grades_changed_at damgalarını
+    şimdiye çeker. Not silme ve kayıt değişiklikleri CourseGrade.updated_at'te
+    iz bırakmadığı için PO vektörü ve küp eskime kontrolleri bu damgaları da okur.
     """
-    try:
-        total = float(total or 0.0)
-    except Exception:
-        total = 0.0
-    return 100.0 if total <= 100.0 else total
+    now = timezone.now()
+    student_ids = {student_id for student_id in student_ids if student_id is not None}
+    if student_ids:
+        Student.objects.filter(pk__in=student_ids).update(grades_changed_at=now)
+    offering_ids = {offering_id for offering_id in offering_ids if offering_id is not None}
+    if offering_ids:
+        CourseOffering.objects.filter(pk__in=offering_ids).update(grades_changed_at=now)
+
+
+def stale_program_outcome_students(students):
+    """
+    Saklanan PO vektörü son not (CourseGrade.updated_at), not silme / kayıt
+    değişikliği (Student.grades_changed_at) ya da eşleme
+    (OutcomeGraphVersion.updated_at) değişikliğinden eski kalan öğrenci id'leri.
+    Öğrenci sayısından bağımsız iki sorgu.
+    """
+    student_ids = list(dict.fromkeys(getattr(s, "pk", s) for s in students))
+    if not student_ids:
+        return []
+
+    mapping_changed = current_outcome_graph_changed_at()
+    rows = (
+        Student.objects
+        .filter(pk__in=student_ids)
+        .annotate(
+            computed=Min("program_scores__updated_at"),
+            graded=Subquery(
+                CourseGrade.objects
+                .filter(enrollment__student=OuterRef("pk"))
+                .order_by("-updated_at")
+                .values("updated_at")[:1]
+            ),
+        )
+        .values_list("pk", "computed", "graded", "grades_changed_at")
+    )
 
+    stale = []
+    for student_id, computed, graded, changed in rows:
+        if computed is None:
+            # Hiç hesaplanmamış: sadece notu varsa hesaplanacak bir şey vardır
+            if graded is not None:
+                stale.append(student_id)
+            continue
+        latest = max((t for t in (graded, changed, mapping_changed) if t is not None), default=None)
+        if latest is not None and computed < latest:
+            stale.append(student_id)
+    return stale
+
+
+def refresh_stale_program_outcomes(students, batch_size=OUTCOME_BATCH_SIZE):
+    """
+    Sadece eskimiş öğrencilerin PO vektörlerini yeniden hesaplar.
+    Değeri değişmeyen satırlar yazılmadığı için hesaplanan öğrencilerin
+    satırları ayrıca güncel olarak işaretlenir. Dönen: hesaplanan öğrenci id'leri
+    """
+    stale = stale_program_outcome_students(students)
+    if stale:
+        compute_and_save_program_outcomes_for_students(stale, batch_size)
+        StudentProgramOutcomeScore.objects.filter(student_id__in=stale).update(updated_at=timezone.now())
+    return stale
+
+
+def save_learning_outcome_partials(partials, existing, batch_size=OUTCOME_BATCH_SIZE):
+    """
+    LO ara toplamlarını ve materialize LO skorlarını yazar.
+    partials: {(student_id, lo_id): (score_sum, weight_sum)}
+    existing: yenilenen kapsamdaki mevcut satırlar (queryset);
+              partials içinde olmayan satırlar silinir, değişmeyenlere dokunulmaz.
+    """
+    current = {}
+    for row_id, student_id, lo_id, score_sum, weight_sum in existing.values_list(
+        "id", "student_id", "learning_outcome_id", "score_sum", "weight_sum"
+    ):
+        current[(student_id, lo_id)] = (row_id, (score_sum, weight_sum))
+
+    stale_ids = [row_id for key, (row_id, _) in current.items() if key not in partials]
+    to_write = [
+        StudentLearningOutcomeScore(
+            student_id=student_id,
+            learning_outcome_id=lo_id,
+            score_sum=values[0],
+            weight_sum=values[1],
+            score=_normalized_score(*values),
+        )
+        for (student_id, lo_id), values in partials.items()
+        if current.get((student_id, lo_id), (None, None))[1] != values
+    ]
+
+    if not stale_ids and not to_write:
+        return
+
+    with transaction.atomic():
+        if stale_ids:
+            StudentLearningOutcomeScore.objects.filter(id__in=stale_ids).delete()
+        if to_write:
+            StudentLearningOutcomeScore.objects.bulk_create(
+                to_write,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=["student", "learning_outcome"],
+                update_fields=["score_sum", "weight_sum", "score", "updated_at"],
+            )
+
+
+def save_program_outcomes_for_students(results, batch_size=OUTCOME_BATCH_SIZE, prune=False):
+    """
+    {student_id: {po_id: {"score", "coverage", ...}}} sonucunu tek transaction'da yazar.
+    (student, program_outcome) üzerinden bulk upsert yapılır;
+    skoru ve kapsaması değişmemiş satırlara hiç dokunulmaz.
+    prune: vektörler tam ise, öğrencinin yeni vektöründe olmayan eski
+           satırlar (ör. kaydı silinmiş) silinir.
+    Dönen: yazılan satır sayısı
+    """
+    student_ids = list(results)
+    if not student_ids:
+        return 0
+
+    existing = {}
+    obsolete = []
+    for start in range(0, len(student_ids), batch_size):
+        rows = (
+            StudentProgramOutcomeScore.objects
+            .filter(student_id__in=student_ids[start:start + batch_size])
+            .values_list("id", "student_id", "program_outcome_id", "score", "coverage")
+        )
+        for row_id, student_id, po_id, score, coverage in rows:
+            existing[(student_id, po_id)] = (score, coverage)
+            if prune and po_id not in results[student_id]:
+                obsolete.append(row_id)
+
+    to_write = []
+    for student_id, vector in results.items():
+        for po_id, item in vector.items():
+            values = (item["score"], item["coverage"])
+            if existing.get((student_id, po_id)) == values:
+                continue
+            to_write.append(StudentProgramOutcomeScore(
+                student_id=student_id,
+                program_outcome_id=po_id,
+                score=item["score"],
+                coverage=item["coverage"],
+            ))
+
+    if not obsolete and not to_write:
+        return 0
+
+    # Silme ve yazma aynı transaction'da: yazma hata verirse eski satırlar yerinde kalır
+    with transaction.atomic():
+        if obsolete:
+            StudentProgramOutcomeScore.objects.filter(id__in=obsolete).delete()
+        if to_write:
+            StudentProgramOutcomeScore.objects.bulk_create(
+                to_write,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=["student", "program_outcome"],
+                update_fields=["score", "coverage", "updated_at"],
+            )
+
+    return len(to_write)
 
 def compute_student_learning_outcomes(student):
     """
-    1) LO skorlarını hesapla.
-       Her component için:
-         grade * (component->LO_weight / denom)
-       (component.weight kullanılmaz)
+    Öğrencinin LO skorları, materialize StudentLearningOutcomeScore tablosundan.
     Dönen: {lo_id: score_float}
     """
-    enrollments = (
+    return dict(
+        StudentLearningOutcomeScore.objects
+        .filter(student=student)
+        .values_list("learning_outcome_id", "score")
+    )
+
+
+def learning_outcome_summary(course):
+    """
+    Dersin LO'ları için materialize tablodan ortalama skor ve öğrenci sayısı.
+    Tek sorguda, öğrenci başına bileşen dolaşmadan hesaplanır.
+    """
+    return (
+        LearningOutcome.objects
+        .filter(course=course)
+        .annotate(
+            avg_score=Avg("student_scores__score"),
+            student_count=Count("student_scores"),
+        )
+        .order_by("order", "id")
+    )
+
+
+def compute_student_program_outcomes(student):
+    """
+    Tek öğrencinin PO vektörü.
+    Toplu motoru (compute_program_outcomes_for_students) tek elemanla çağırır.
+    """
+    return compute_program_outcomes_for_students([student]).get(student.pk, {})
+
+
+# ============================================================
+# TOPLU (BATCH) PO MOTORU
+# ============================================================
+def load_outcome_inputs(student_ids):
+    """
+    Verilen öğrenci id listesi için hesaplamaya gereken her şeyi
+    sabit sayıda sorguyla yükler:
+      - kayıtlar, notlar ve öğrenci bölümleri (3 sorgu),
+      - graf sürüm kontrolü (1 sorgu),
+      - component -> LO, LO -> PO ağırlıkları ve bölüm PO listeleri
+        süreç içi graf önbelleğinden; sadece önbellekte olmayanlar yüklenir.
+    """
+    student_ids = list(student_ids)
+
+    enrolled_students = set()
+    offering_ids = set()
+    for student_id, offering_id in (
         Enrollment.objects
-        .filter(student=student, status=Enrollment.Status.ENROLLED)
-        .select_related("offering", "offering__course")
+        .filter(student_id__in=student_ids, status=Enrollment.Status.ENROLLED)
+        .values_list("student_id", "offering_id")
+    ):
+        enrolled_students.add(student_id)
+        offering_ids.add(offering_id)
+
+    # Sadece kaydın kendi şubesine ait bileşen notları sayılır
+    grade_rows = (
+        CourseGrade.objects
+        .filter(
+            enrollment__student_id__in=student_ids,
+            enrollment__status=Enrollment.Status.ENROLLED,
+            component__offering_id=F("enrollment__offering_id"),
+        )
+        .order_by("id")
+        .values_list(
+            "enrollment__student_id", "enrollment_id",
+            "component_id", "component__type", "score",
+        )
+    )
+
+    cells = {}
+    for student_id, enr_id, comp_id, comp_type, score in grade_rows:
+        cells[(student_id, enr_id, comp_type, comp_id)] = float(score or 0.0)
+
+    graded = defaultdict(list)
+    for key in sorted(cells):
+        student_id, _, _, comp_id = key
+        graded[student_id].append((comp_id, cells[key]))
+
+    student_departments = defaultdict(set)
+    dep_rows = (
+        Student.departments.through.objects
+        .filter(student_id__in=student_ids)
+        .values_list("student_id", "department_id")
     )
+    for student_id, dep_id in dep_rows:
+        student_departments[student_id].add(dep_id)
+
+    graph_cache.sync()
+
+    comp_relations = {}
+    lo_programs = {}
+    for graph in get_offering_graphs(sorted(offering_ids)).values():
+        comp_relations.update(graph["comp_relations"])
+        lo_programs.update(graph["lo_programs"])
+
+    department_ids = sorted(set().union(*student_departments.values()))
+    department_pos = get_department_graphs(department_ids)
+
+    return {
+        "enrolled_students": enrolled_students,
+        "graded": graded,
+        "comp_relations": comp_relations,
+        "lo_programs": lo_programs,
+        "student_departments": student_departments,
+        "department_pos": department_pos,
+    }
+
+
+def _lo_partials(graded_cells, comp_relations, only=None):
+    """
+    Not hücrelerinden LO ara toplamları.
+    Dönen: ({lo_id: Σ not*ağırlık}, {lo_id: Σ ağırlık*100})
+    """
+    lo_sums = defaultdict(float)
+    lo_weights = defaultdict(float)
+
+    for comp_id, score in graded_cells:
+        for lo_id, lw in comp_relations.get(comp_id, ()):
+            if only is not None and lo_id not in only:
+                continue
+            lo_sums[lo_id] += score * lw
+            lo_weights[lo_id] += lw * 100
+
+    return lo_sums, lo_weights
+
+
+def _normalized_score(score_sum, weight_sum):
+    """Toplam ağırlık %100'ü aşarsa toplam ağırlığa bölerek normalize eder."""
+    if weight_sum > 100:
+        return score_sum / (weight_sum / 100.0)
+    return score_sum
+
+
+def _po_partials(lo_sums, lo_weights, lo_programs, departments):
+    """
+    LO ara toplamlarından PO skor ve kapsamaları.
+    LO'lar id sırasıyla dolaşılır; tam ve artımlı hesap aynı sonucu verir.
+    """
+    po_scores = defaultdict(float)
+    po_weights = defaultdict(float)
+
+    for lo_id in sorted(lo_sums):
+        lo_score = _normalized_score(lo_sums[lo_id], lo_weights[lo_id])
+        for po_id, dep_id, pw in lo_programs.get(lo_id, ()):
+            if dep_id not in departments:
+                continue
+            po_scores[po_id] += lo_score * pw
+            po_weights[po_id] += pw * 100
 
-    if not enrollments.exists():
+    return {
+        po_id: _normalized_score(po_scores[po_id], total_w)
+        for po_id, total_w in po_weights.items()
+    }, po_weights
+
+
+def _student_po_vector(student_id, inputs, lo_partials=None):
+    """Yüklenmiş girdilerden tek öğrencinin PO vektörünü bellekte hesaplar."""
+    if student_id not in inputs["enrolled_students"]:
         return {}
 
-    grades = CourseGrade.objects.filter(enrollment__in=enrollments)
-    grade_map = {(int(g.enrollment_id), int(g.component_id)): float(g.score or 0.0)
-                 for g in grades}
+    departments = inputs["student_departments"].get(student_id, set())
+
+    if lo_partials is None:
+        lo_partials = _lo_partials(inputs["graded"].get(student_id, ()), inputs["comp_relations"])
+    po_scores, po_weights = _po_partials(*lo_partials, inputs["lo_programs"], departments)
+
+    all_pos = sorted(
+        po for dep_id in departments
+        for po in inputs["department_pos"].get(dep_id, ())
+    )
+
+    ordered_results = {}
+    for po_id, code, description in all_pos:
+        ordered_results[po_id] = {
+            "code": code,
+            "description": description,
+            "coverage": round(po_weights.get(po_id, 0.0), 2),
+            "score": round(po_scores.get(po_id, 0.0), 2),
+        }
+
+    return ordered_results
 
-    enr_by_offering = {e.offering_id: e for e in enrollments}
-    lo_scores = defaultdict(float)
 
-    components = CourseAssessmentComponent.objects.filter(
-        course__in=[e.offering.course for e in enrollments]
+def compute_program_outcomes_for_students(students, batch_size=OUTCOME_BATCH_SIZE):
+    """
+    Birden fazla öğrencinin PO vektörlerini toplu hesaplar.
+    Her batch_size öğrenci için sabit sayıda sorgu atılır, hesap bellekte yapılır.
+    Dönen: {student_id: {po_id: {"code", "description", "coverage", "score"}}}
+    """
+    student_ids = list(dict.fromkeys(getattr(s, "pk", s) for s in students))
+
+    results = {}
+    for start in range(0, len(student_ids), batch_size):
+        chunk = student_ids[start:start + batch_size]
+        inputs = load_outcome_inputs(chunk)
+        for student_id in chunk:
+            results[student_id] = _student_po_vector(student_id, inputs)
+
+    return results
+
+
+# ============================================================
+# BÖLÜM BAZLI VEKTÖREL (NumPy) PO HESABI
+# ============================================================
+def _vectorized_po_matrix(student_ids, inputs, po_ids):
+    """
+    Öğrenci x PO skor ve kapsama matrislerini iki normalize matris çarpımıyla hesaplar.
+      G (öğrenci x bileşen) @ W (bileşen x LO)  -> LO skorları
+      LO skorları          @ V (LO x PO)        -> PO skorları
+    Normalizasyon saf Python motoruyla aynıdır: toplam ağırlık %100'ü aşarsa bölünür.
+    """
+    graded = inputs["graded"]
+    comp_relations = inputs["comp_relations"]
+    lo_programs = inputs["lo_programs"]
+
+    comp_index = {}
+    for student_id in student_ids:
+        for comp_id, _ in graded.get(student_id, ()):
+            comp_index.setdefault(comp_id, len(comp_index))
+
+    lo_index = {}
+    for comp_id in comp_index:
+        for lo_id, _ in comp_relations.get(comp_id, ()):
+            lo_index.setdefault(lo_id, len(lo_index))
+
+    po_index = {po_id: i for i, po_id in enumerate(po_ids)}
+
+    grades = np.zeros((len(student_ids), len(comp_index)))
+    mask = np.zeros_like(grades)
+    for row, student_id in enumerate(student_ids):
+        for comp_id, score in graded.get(student_id, ()):
+            grades[row, comp_index[comp_id]] = score
+            mask[row, comp_index[comp_id]] = 1.0
+
+    comp_lo = np.zeros((len(comp_index), len(lo_index)))
+    comp_lo_exists = np.zeros_like(comp_lo)
+    for comp_id, col in comp_index.items():
+        for lo_id, lw in comp_relations.get(comp_id, ()):
+            comp_lo[col, lo_index[lo_id]] += lw
+            comp_lo_exists[col, lo_index[lo_id]] = 1.0
+
+    lo_po = np.zeros((len(lo_index), len(po_index)))
+    for lo_id, row in lo_index.items():
+        for po_id, _, pw in lo_programs.get(lo_id, ()):
+            if po_id in po_index:
+                lo_po[row, po_index[po_id]] += pw
+
+    lo_weights = (mask @ comp_lo) * 100
+    lo_scores = (grades @ comp_lo) / np.where(lo_weights > 100, lo_weights / 100.0, 1.0)
+
+    # Öğrencinin hiç notu olmayan LO'lar PO kapsamasına girmez
+    lo_present = ((mask @ comp_lo_exists) > 0).astype(float)
+    po_weights = (lo_present @ lo_po) * 100
+    po_scores = (lo_scores @ lo_po) / np.where(po_weights > 100, po_weights / 100.0, 1.0)
+
+    return po_scores, po_weights
+
+
+def compute_department_program_outcomes(department, use_numpy=None, batch_size=OUTCOME_BATCH_SIZE):
+    """
+    Bölümdeki tüm öğrencilerin, o bölümün PO'larına göre skorları.
+    NumPy kuruluysa matris yolu, değilse toplu Python motoru kullanılır;
+    iki yol da compute_student_program_outcomes ile aynı sayıları verir
+    (matris yolunda toplama sırası farklı olduğu için yuvarlama sınırında ±0.01 olabilir).
+    Dönen: {student_id: {po_id: {"code", "description", "coverage", "score"}}}
+    """
+    student_ids = list(
+        Student.objects
+        .filter(departments=department)
+        .order_by("id")
+        .values_list("id", flat=True)
     )
 
-    for comp in components:
-        enr = next(
-            (e for e in enrollments if e.offering.course_id == comp.course_id),
-            None
+    if np is None or use_numpy is False:
+        department_po_ids = set(
+            ProgramOutcome.objects
+            .filter(department=department)
+            .values_list("id", flat=True)
         )
-        if not enr:
-            continue
+        return {
+            student_id: {
+                po_id: item for po_id, item in vector.items()
+                if po_id in department_po_ids
+            }
+            for student_id, vector in
+            compute_program_outcomes_for_students(student_ids, batch_size).items()
+        }
 
-        grade = grade_map.get((enr.id, comp.id))
-        if grade is None:
-            continue
+    results = {}
+    for start in range(0, len(student_ids), batch_size):
+        chunk = student_ids[start:start + batch_size]
+        inputs = load_outcome_inputs(chunk)
+        pos = inputs["department_pos"].get(department.pk, [])
+
+        enrolled = [sid for sid in chunk if sid in inputs["enrolled_students"]]
+        scores, weights = _vectorized_po_matrix(enrolled, inputs, [po[0] for po in pos])
+
+        for student_id in chunk:
+            results[student_id] = {}
+        for row, student_id in enumerate(enrolled):
+            for col, (po_id, code, description) in enumerate(pos):
+                results[student_id][po_id] = {
+                    "code": code,
+                    "description": description,
+                    "coverage": round(float(weights[row, col]), 2),
+                    "score": round(float(scores[row, col]), 2),
+                }
+
+    return results
+
+
+# ============================================================
+# PO YENİDEN HESAPLAMA KUYRUĞU
+# ============================================================
+def enqueue_program_outcome_recompute(students):
+    """
+    Öğrencileri arka plan kuyruğuna ekler.
+    Zaten bekleyen işi olan öğrenci için yeni satır açılmaz.
+    """
+    student_ids = list(dict.fromkeys(getattr(s, "pk", s) for s in students))
 
-        rel_qs = ComponentLearningRelation.objects.filter(component=comp)
-        total_lo_w = sum((r.weight or 0.0) for r in rel_qs)
-        denom = _safe_pct_denominator(total_lo_w)
+    OutcomeRecomputeJob.objects.bulk_create(
+        [OutcomeRecomputeJob(student_id=student_id) for student_id in student_ids],
+        batch_size=OUTCOME_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
 
-        for rel in rel_qs:
-            lw_part = float(rel.weight or 0.0) / denom
-            lo_scores[rel.learning_outcome_id] += grade * lw_part
 
-    return dict(lo_scores)
+_pending_graph = threading.local()
 
 
-def compute_student_program_outcomes(student):
+def _flush_outcome_graph_change():
+    """Commit sonrası: graf sürümü bir kez artırılır, etkilenen öğrenciler bir kez kuyruğa alınır."""
+    pending = getattr(_pending_graph, "changes", None)
+    _pending_graph.changes = None
+    if pending is None:
+        return
 
-    enrollments = (
+    bump_outcome_graph_version()
+    offering_ids, learning_outcome_ids = pending
+    if not offering_ids and not learning_outcome_ids:
+        return
+    enqueue_program_outcome_recompute(
         Enrollment.objects
-        .filter(student=student, status=Enrollment.Status.ENROLLED)
-        .select_related("offering", "offering__course")
+        .filter(
+            Q(offering_id__in=offering_ids)
+            | Q(offering__course__learning_outcomes__in=learning_outcome_ids),
+            status=Enrollment.Status.ENROLLED,
+        )
+        .values_list("student_id", flat=True)
+        .distinct()
     )
 
-    student_departments = student.departments.all()
 
-    if not enrollments.exists():
-        return {}
+def schedule_outcome_graph_change(offering_ids=(), learning_outcome_ids=()):
+    """
+    Component → LO / LO → PO eşlemeleri değişince çağrılır. Aynı transaction
+    içindeki tüm değişiklikler thread'e özel kümede toplanır; commit sonrası
+    tek sürüm artışı ve tek kuyruğa alma yapılır.
+    """
+    pending = getattr(_pending_graph, "changes", None)
+    if pending is None or not transaction.get_connection().in_atomic_block:
+        # Transaction dışında kalan küme geri alınmış bir transaction'dan artakalmıştır
+        pending = _pending_graph.changes = (set(), set())
+    pending[0].update(i for i in offering_ids if i is not None)
+    pending[1].update(i for i in learning_outcome_ids if i is not None)
 
-    grades = CourseGrade.objects.filter(enrollment__in=enrollments)
-    grade_map = {
-        (g.enrollment_id, g.component_id): float(g.score or 0.0)
-        for g in grades
-    }
+    # Her çağrı kendi callback'ini kaydeder (savepoint geri alınırsa onunla düşer);
+    # ilk çalışan kümeyi boşaltır, diğerleri boş geçer
+    transaction.on_commit(_flush_outcome_graph_change)
 
-    lo_scores = defaultdict(float)
-    lo_weights = defaultdict(float)
 
-    for enrollment in enrollments:
-        course = enrollment.offering.course
+def _worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
 
-        components = CourseAssessmentComponent.objects.filter(offering=enrollment.offering)
 
-        for comp in components:
-            score = grade_map.get((enrollment.id, comp.id))
-            if score is None:
-                continue
+def reclaim_stale_outcome_jobs(timeout=None):
+    """
+    started_at'i OUTCOME_JOB_TIMEOUT saniyeden eski RUNNING işler (worker
+    çökmüş / öldürülmüş) tekrar PENDING yapılır. Öğrencinin zaten bekleyen
+    işi varsa eski iş FAILED olarak kapatılır (tek PENDING kısıtı).
+    Dönen: kuyruğa geri alınan iş sayısı
+    """
+    if timeout is None:
+        timeout = getattr(settings, "OUTCOME_JOB_TIMEOUT", 900)
+    now = timezone.now()
+    stale = OutcomeRecomputeJob.objects.filter(
+        status=OutcomeRecomputeJob.Status.RUNNING,
+        started_at__lt=now - timedelta(seconds=timeout),
+    )
+    pending_students = OutcomeRecomputeJob.objects.filter(
+        status=OutcomeRecomputeJob.Status.PENDING,
+    ).values("student_id")
+
+    with transaction.atomic():
+        stale.filter(student_id__in=pending_students).update(
+            status=OutcomeRecomputeJob.Status.FAILED,
+            error="Zaman aşımı; öğrencinin bekleyen işi zaten var.",
+            finished_at=now,
+        )
+        return stale.update(
+            status=OutcomeRecomputeJob.Status.PENDING,
+            worker="",
+            started_at=None,
+        )
 
-            relations = ComponentLearningRelation.objects.filter(component=comp)
 
-            for rel in relations:
-                lw = float(rel.weight or 0.0)
-                if lw > 1:
-                    lw /= 100.0
+def process_program_outcome_queue(batch_size=OUTCOME_BATCH_SIZE):
+    """
+    Kuyruktan en fazla batch_size bekleyen işi alır, öğrencileri toplu
+    hesaplayıp kaydeder ve işlerin durumunu günceller. Önce zaman aşımına
+    uğramış RUNNING işler kuyruğa geri alınır.
+    Dönen: işlenen iş sayısı (kuyruk boşsa 0)
+    """
+    worker = _worker_name()
+    reclaim_stale_outcome_jobs()
+
+    with transaction.atomic():
+        job_ids = list(
+            OutcomeRecomputeJob.objects
+            .filter(status=OutcomeRecomputeJob.Status.PENDING)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        # Aynı işleri başka bir worker almışsa status filtresi onları dışarıda bırakır
+        OutcomeRecomputeJob.objects.filter(
+            id__in=job_ids,
+            status=OutcomeRecomputeJob.Status.PENDING,
+        ).update(
+            status=OutcomeRecomputeJob.Status.RUNNING,
+            worker=worker,
+            started_at=timezone.now(),
+        )
 
-                lo_scores[rel.learning_outcome_id] += score * lw
-                lo_weights[rel.learning_outcome_id] += lw * 100
+    jobs = OutcomeRecomputeJob.objects.filter(
+        id__in=job_ids,
+        status=OutcomeRecomputeJob.Status.RUNNING,
+        worker=worker,
+    )
+    student_ids = list(jobs.values_list("student_id", flat=True))
+    if not student_ids:
+        return 0
 
-    for lo_id, total_w in lo_weights.items():
-        if total_w > 100:
-            lo_scores[lo_id] /= (total_w / 100.0)
+    try:
+        compute_and_save_program_outcomes_for_students(student_ids, batch_size)
+    except Exception as e:
+        jobs.update(
+            status=OutcomeRecomputeJob.Status.FAILED,
+            error=str(e),
+            finished_at=timezone.now(),
+        )
+        raise
 
-    po_scores = defaultdict(float)
-    po_weights = defaultdict(float)
+    jobs.update(
+        status=OutcomeRecomputeJob.Status.DONE,
+        finished_at=timezone.now(),
+    )
+    return len(student_ids)
+
+
+# ============================================================
+# ARTIMLI (DELTA) PO GÜNCELLEME
+# ============================================================
+def record_grade_changes(cells):
+    """Değişen (enrollment_id, component_id) hücrelerini worker için kaydeder."""
+    OutcomeGradeChange.objects.bulk_create(
+        [
+            OutcomeGradeChange(enrollment_id=enr_id, component_id=comp_id)
+            for enr_id, comp_id in dict.fromkeys(cells)
+        ],
+        batch_size=OUTCOME_BATCH_SIZE,
+    )
 
-    for lo_id, lo_score in lo_scores.items():
-        mappings = LearningProgramRelation.objects.filter(
-            learning_outcome_id=lo_id,
-            program_outcome__department__in=student_departments
-        )
 
-        for m in mappings:
-            pw = float(m.weight or 0.0)
-            if pw > 1:
-                pw /= 100.0
+def apply_grade_changes(cells):
+    """
+    Değişen not hücrelerinden sadece etkilenen satırları günceller:
+      1) hücrelerin bileşenlerinden ulaşılan LO'lar için öğrencinin
+         LO ara toplamları notlardan yeniden hesaplanır,
+      2) bu LO'ların bağlı olduğu PO'lar, kayıtlı LO ara toplamlarından
+         yeniden hesaplanır.
+    Diğer LO / PO satırlarına dokunulmaz.
+    Dönen: yazılan PO satırı sayısı
+    """
+    cells = set(cells)
+    if not cells:
+        return 0
 
-            po_scores[m.program_outcome_id] += lo_score * pw
-            po_weights[m.program_outcome_id] += pw * 100
+    enrollment_students = dict(
+        Enrollment.objects
+        .filter(id__in={enr_id for enr_id, _ in cells})
+        .values_list("id", "student_id")
+    )
 
-    for po_id, total_w in po_weights.items():
-        if total_w > 100:
-            po_scores[po_id] /= (total_w / 100.0)
+    comp_los = defaultdict(set)
+    for comp_id, lo_id in (
+        ComponentLearningRelation.objects
+        .filter(component_id__in={comp_id for _, comp_id in cells})
+        .values_list("component_id", "learning_outcome_id")
+    ):
+        comp_los[comp_id].add(lo_id)
+
+    affected = defaultdict(set)   # student_id -> {lo_id}
+    for enr_id, comp_id in cells:
+        student_id = enrollment_students.get(enr_id)
+        if student_id is not None and comp_los.get(comp_id):
+            affected[student_id] |= comp_los[comp_id]
+
+    if not affected:
+        return 0
+
+    student_ids = list(affected)
+    lo_ids = set().union(*affected.values())
+
+    # 1) LO ara toplamları
+    comp_relations = defaultdict(list)
+    for comp_id, lo_id, weight in (
+        ComponentLearningRelation.objects
+        .filter(learning_outcome_id__in=lo_ids)
+        .order_by("id")
+        .values_list("component_id", "learning_outcome_id", "weight")
+    ):
+        comp_relations[comp_id].append((lo_id, normalize_pct(weight)))
+
+    grade_rows = (
+        CourseGrade.objects
+        .filter(
+            enrollment__student_id__in=student_ids,
+            enrollment__status=Enrollment.Status.ENROLLED,
+            component__offering_id=F("enrollment__offering_id"),
+            component_id__in=list(comp_relations),
+        )
+        .order_by("id")
+        .values_list(
+            "enrollment__student_id", "enrollment_id",
+            "component_id", "component__type", "score",
+        )
+    )
+    grid = {}
+    for student_id, enr_id, comp_id, comp_type, score in grade_rows:
+        grid[(student_id, enr_id, comp_type, comp_id)] = float(score or 0.0)
+
+    graded = defaultdict(list)
+    for key in sorted(grid):
+        graded[key[0]].append((key[3], grid[key]))
+
+    partials = {}
+    for student_id, student_los in affected.items():
+        lo_sums, lo_weights = _lo_partials(graded.get(student_id, ()), comp_relations, only=student_los)
+        for lo_id in lo_sums:
+            partials[(student_id, lo_id)] = (lo_sums[lo_id], lo_weights[lo_id])
+
+    scope = Q()
+    for student_id, student_los in affected.items():
+        scope |= Q(student_id=student_id, learning_outcome_id__in=student_los)
+    save_learning_outcome_partials(partials, StudentLearningOutcomeScore.objects.filter(scope))
+
+    # 2) Etkilenen PO'lar
+    student_departments = defaultdict(set)
+    for student_id, dep_id in (
+        Student.departments.through.objects
+        .filter(student_id__in=student_ids)
+        .values_list("student_id", "department_id")
+    ):
+        student_departments[student_id].add(dep_id)
+
+    lo_targets = defaultdict(list)
+    for lo_id, po_id, dep_id in (
+        LearningProgramRelation.objects
+        .filter(learning_outcome_id__in=lo_ids)
+        .values_list("learning_outcome_id", "program_outcome_id", "program_outcome__department_id")
+    ):
+        lo_targets[lo_id].append((po_id, dep_id))
+
+    affected_pos = {
+        student_id: {
+            po_id
+            for lo_id in student_los
+            for po_id, dep_id in lo_targets.get(lo_id, ())
+            if dep_id in student_departments[student_id]
+        }
+        for student_id, student_los in affected.items()
+    }
+    po_ids = set().union(*affected_pos.values())
+    if not po_ids:
+        return 0
+
+    lo_programs = defaultdict(list)
+    for lo_id, po_id, dep_id, weight in (
+        LearningProgramRelation.objects
+        .filter(program_outcome_id__in=po_ids)
+        .order_by("id")
+        .values_list(
+            "learning_outcome_id", "program_outcome_id",
+            "program_outcome__department_id", "weight",
+        )
+    ):
+        lo_programs[lo_id].append((po_id, dep_id, normalize_pct(weight)))
+
+    stored = defaultdict(lambda: (defaultdict(float), defaultdict(float)))
+    for student_id, lo_id, score_sum, weight_sum in (
+        StudentLearningOutcomeScore.objects
+        .filter(student_id__in=student_ids, learning_outcome_id__in=list(lo_programs))
+        .values_list("student_id", "learning_outcome_id", "score_sum", "weight_sum")
+    ):
+        stored[student_id][0][lo_id] = score_sum
+        stored[student_id][1][lo_id] = weight_sum
 
     results = {}
-    for po_id, score in po_scores.items():
-        po = ProgramOutcome.objects.get(id=po_id)
-        results[po_id] = {
-            "code": po.code,
-            "description": po.description,
-            "coverage": round(po_weights[po_id], 2),
-            "score": round(score, 2),
+    for student_id, student_pos in affected_pos.items():
+        po_scores, po_weights = _po_partials(
+            *stored[student_id], lo_programs, student_departments[student_id]
+        )
+        results[student_id] = {
+            po_id: {
+                "coverage": round(po_weights.get(po_id, 0.0), 2),
+                "score": round(po_scores.get(po_id, 0.0), 2),
+            }
+            for po_id in student_pos
         }
 
-    ordered_results = {}
-    all_pos = ProgramOutcome.objects.filter(
-        department__in=student_departments
-    ).order_by("id")
-
-    for po in all_pos:
-        ordered_results[po.id] = results.get(po.id, {
-            "code": po.code,
-            "description": po.description,
-            "coverage": 0.0,
-            "score": 0.0,
-        })
+    return save_program_outcomes_for_students(results)
 
-    return ordered_results
+
+def process_grade_change_queue(batch_size=OUTCOME_BATCH_SIZE):
+    """
+    Kayıtlı not değişikliklerinden en fazla batch_size tanesini işler.
+    Hesap güncel notlardan yapıldığı için aynı değişikliğin iki kez
+    işlenmesi zararsızdır.
+    Dönen: işlenen değişiklik kaydı sayısı
+    """
+    changes = list(
+        OutcomeGradeChange.objects
+        .values_list("id", "enrollment_id", "component_id")[:batch_size]
+    )
+    if not changes:
+        return 0
+
+    with transaction.atomic():
+        apply_grade_changes((enr_id, comp_id) for _, enr_id, comp_id in changes)
+        OutcomeGradeChange.objects.filter(id__in=[change[0] for change in changes]).delete()
+
+    return len(changes)
@@ -1,3 +1,631 @@
+from datetime import timedelta
+from unittest import skipUnless
+from unittest.mock import patch
+
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import SimpleUser
+from academics.models import Level
+from courses.models import (
+    Course,
+    CourseOffering,
+    CourseAssessmentComponent,
+    CourseGrade,
+    ComponentLearningRelation,
+    Enrollment,
+    LearningProgramRelation,
+)
+from departments.models import Department, Faculty
+from students.models import Student
+from .cube import CubeQueryError, attainment_drilldown, refresh_outcome_cube
+from .exports import department_po_matrix_export
+from .benchmark import generate_dataset, run_benchmarks, compare_reports
+from .graph import graph_cache, bump_outcome_graph_version
+from .models import (
+    ProgramOutcome,
+    LearningOutcome,
+    StudentProgramOutcomeScore,
+    StudentLearningOutcomeScore,
+    OutcomeRecomputeJob,
+    OutcomeGradeChange,
+    ProgramOutcomeAttainment,
+    OutcomeGraphVersion,
+)
+from .services import (
+    np,
+    compute_student_program_outcomes,
+    compute_program_outcomes_for_students,
+    compute_department_program_outcomes,
+    compute_and_save_program_outcomes_for_students,
+    save_program_outcomes_for_students,
+    enqueue_program_outcome_recompute,
+    process_program_outcome_queue,
+    record_grade_changes,
+    apply_grade_changes,
+    process_grade_change_queue,
+    compute_student_learning_outcomes,
+    learning_outcome_summary,
+    stale_program_outcome_students,
+    refresh_stale_program_outcomes,
+)
+
+
+class OutcomeFixtureMixin:
+    """
+    Küçük bir ders / LO / PO grafiği kurar:
+      Vize(%40) -> LO1 %60
+      Final(%60) -> LO1 %40, LO2 %100
+      PO1 <- LO1 %50, LO2 %50
+      PO2 <- LO1 %100, LO2 %50  (toplam > 100, normalize edilir)
+      PO3 eşlemesiz
+    """
+
+    def setUp(self):
+        graph_cache.clear()
+
+        self.faculty = Faculty.objects.create(full_name="Mühendislik")
+        self.department = Department.objects.create(
+            code="CSE", name="Bilgisayar", faculty=self.faculty
+        )
+        self.level = Level.objects.create(number=1, name="1. Sınıf")
+        self.course = Course.objects.create(
+            code="CSE101", name="Programlama", level=self.level, course_type="DEPARTMENT"
+        )
+        self.offering = CourseOffering.objects.create(
+            course=self.course, year=2025, semester="FALL"
+        )
+
+        self.midterm = CourseAssessmentComponent.objects.create(
+            offering=self.offering, type="MIDTERM", weight=40
+        )
+        self.final = CourseAssessmentComponent.objects.create(
+            offering=self.offering, type="FINAL", weight=60
+        )
+
+        self.lo1 = LearningOutcome.objects.create(course=self.course, code="LO1", description="LO1")
+        self.lo2 = LearningOutcome.objects.create(course=self.course, code="LO2", description="LO2")
+
+        ComponentLearningRelation.objects.create(component=self.midterm, learning_outcome=self.lo1, weight=60)
+        ComponentLearningRelation.objects.create(component=self.final, learning_outcome=self.lo1, weight=40)
+        ComponentLearningRelation.objects.create(component=self.final, learning_outcome=self.lo2, weight=100)
+
+        self.po1 = ProgramOutcome.objects.create(department=self.department, code=1, description="PO1")
+        self.po2 = ProgramOutcome.objects.create(department=self.department, code=2, description="PO2")
+        self.po3 = ProgramOutcome.objects.create(department=self.department, code=3, description="PO3")
+
+        LearningProgramRelation.objects.create(learning_outcome=self.lo1, program_outcome=self.po1, weight=50)
+        LearningProgramRelation.objects.create(learning_outcome=self.lo2, program_outcome=self.po1, weight=50)
+        LearningProgramRelation.objects.create(learning_outcome=self.lo1, program_outcome=self.po2, weight=100)
+        LearningProgramRelation.objects.create(learning_outcome=self.lo2, program_outcome=self.po2, weight=50)
+
+    def make_student(self, no, midterm=None, final=None):
+        user = SimpleUser.objects.create(username=f"ogr{no}", password="123", role="STUDENT")
+        student = Student.objects.create(user=user, student_no=str(no))
+        student.departments.add(self.department)
+        enrollment = Enrollment.objects.create(student=student, offering=self.offering)
+        if midterm is not None:
+            CourseGrade.objects.create(enrollment=enrollment, component=self.midterm, score=midterm)
+        if final is not None:
+            CourseGrade.objects.create(enrollment=enrollment, component=self.final, score=final)
+        return student
+
+
+class BatchProgramOutcomeTest(OutcomeFixtureMixin, TestCase):
+
+    def test_single_student_scores(self):
+        """LO1 = 50*.6 + 80*.4 = 62, LO2 = 80 → PO1 = 71, PO2 = 102/1.5 = 68."""
+        student = self.make_student(1, midterm=50, final=80)
+
+        results = compute_student_program_outcomes(student)
+
+        self.assertEqual(list(results), [self.po1.id, self.po2.id, self.po3.id])
+        self.assertEqual(results[self.po1.id]["score"], 71.0)
+        self.assertEqual(results[self.po1.id]["coverage"], 100.0)
+        self.assertEqual(results[self.po2.id]["score"], 68.0)
+        self.assertEqual(results[self.po2.id]["coverage"], 150.0)
+        self.assertEqual(results[self.po3.id]["score"], 0.0)
+
+    def test_missing_grade_is_skipped(self):
+        """Final notu yoksa sadece vize LO1'e katkı verir, LO2 hiç oluşmaz."""
+        student = self.make_student(1, midterm=50)
+
+        results = compute_student_program_outcomes(student)
+
+        self.assertEqual(results[self.po1.id]["score"], 15.0)
+        self.assertEqual(results[self.po1.id]["coverage"], 50.0)
+        self.assertEqual(results[self.po2.id]["score"], 30.0)
+
+    def test_student_without_enrollment_returns_empty(self):
+        user = SimpleUser.objects.create(username="bos", password="123", role="STUDENT")
+        student = Student.objects.create(user=user, student_no="999")
+        student.departments.add(self.department)
+
+        self.assertEqual(compute_student_program_outcomes(student), {})
+
+    def test_batch_query_count_is_constant(self):
+        students = [self.make_student(i, midterm=40 + i, final=70 + i) for i in range(1, 6)]
+
+        # kayıt + not + bölüm + sürüm, önbellek boşken + 3 graf sorgusu
+        with self.assertNumQueries(7):
+            single = compute_program_outcomes_for_students(students[:1])
+        with self.assertNumQueries(4):
+            batch = compute_program_outcomes_for_students(students)
+
+        self.assertEqual(single[students[0].id], batch[students[0].id])
+        self.assertEqual(len(batch), 5)
+
+
+class DepartmentProgramOutcomeTest(OutcomeFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.students = [
+            self.make_student(1, midterm=50, final=80),
+            self.make_student(2, midterm=50),
+            self.make_student(3, final=35.5),
+        ]
+        other = Department.objects.create(code="EEE", name="Elektrik", faculty=self.faculty)
+        self.other_po = ProgramOutcome.objects.create(department=other, code=1, description="EEE PO1")
+        LearningProgramRelation.objects.create(learning_outcome=self.lo1, program_outcome=self.other_po, weight=100)
+        self.students[0].departments.add(other)
+
+    def test_python_path_matches_single_student(self):
+        results = compute_department_program_outcomes(self.department, use_numpy=False)
+
+        for student in self.students:
+            expected = compute_student_program_outcomes(student)
+            expected.pop(self.other_po.id, None)
+            self.assertEqual(results[student.id], expected)
+
+    def test_falls_back_to_python_without_numpy(self):
+        expected = compute_department_program_outcomes(self.department, use_numpy=False)
+
+        # NumPy kurulu değilmiş gibi: varsayılan çağrı saf Python yoluna düşer
+        with patch("outcomes.services.np", None), \
+                patch("outcomes.services._vectorized_po_matrix") as matrix:
+            self.assertEqual(compute_department_program_outcomes(self.department), expected)
+        matrix.assert_not_called()
+
+    @skipUnless(np is not None, "NumPy kurulu değil")
+    def test_numpy_path_matches_python_path(self):
+        python_results = compute_department_program_outcomes(self.department, use_numpy=False)
+        numpy_results = compute_department_program_outcomes(self.department, use_numpy=True)
+
+        self.assertEqual(numpy_results.keys(), python_results.keys())
+        for student_id, vector in python_results.items():
+            self.assertEqual(list(numpy_results[student_id]), list(vector))
+            for po_id, item in vector.items():
+                self.assertAlmostEqual(numpy_results[student_id][po_id]["score"], item["score"], delta=0.01)
+                self.assertAlmostEqual(numpy_results[student_id][po_id]["coverage"], item["coverage"], delta=0.01)
+
+
+class BulkProgramOutcomeSaveTest(OutcomeFixtureMixin, TestCase):
+
+    def test_bulk_save_creates_then_skips_unchanged(self):
+        students = [self.make_student(i, midterm=50, final=80) for i in range(1, 4)]
+
+        written = compute_and_save_program_outcomes_for_students(students)
+        self.assertEqual(written, 9)
+        row = StudentProgramOutcomeScore.objects.get(student=students[0], program_outcome=self.po2)
+        self.assertEqual((row.score, row.coverage), (68.0, 150.0))
+
+        # Hiçbir şey değişmediyse sadece okuma sorguları atılır (4 girdi + LO + PO)
+        with self.assertNumQueries(6):
+            written = compute_and_save_program_outcomes_for_students(students)
+        self.assertEqual(written, 0)
+
+    def test_bulk_save_updates_only_changed_rows(self):
+        students = [self.make_student(i, midterm=50, final=80) for i in range(1, 3)]
+        compute_and_save_program_outcomes_for_students(students)
+
+        CourseGrade.objects.filter(
+            enrollment__student=students[0], component=self.midterm
+        ).update(score=100)
+
+        written = compute_and_save_program_outcomes_for_students(students)
+
+        self.assertEqual(written, 2)  # PO1 ve PO2; PO3 eşlemesiz olduğu için 0 kalır
+        self.assertEqual(StudentProgramOutcomeScore.objects.count(), 6)
+        row = StudentProgramOutcomeScore.objects.get(student=students[0], program_outcome=self.po1)
+        self.assertEqual(row.score, 86.0)
+
+
+class StaleProgramOutcomeTest(OutcomeFixtureMixin, TestCase):
+
+    def test_only_stale_students_are_recomputed(self):
+        students = [self.make_student(i, midterm=50, final=80) for i in range(1, 3)]
+        ids = [s.pk for s in students]
+        self.assertEqual(refresh_stale_program_outcomes(students), ids)
+
+        # Güncel vektörler: kontrol iki sorgu, yazma yok
+        with self.assertNumQueries(2):
+            self.assertEqual(refresh_stale_program_outcomes(students), [])
+
+        grade = CourseGrade.objects.get(enrollment__student=students[0], component=self.midterm)
+        grade.score = 100
+        grade.save()
+        self.assertEqual(refresh_stale_program_outcomes(students), [students[0].pk])
+        row = StudentProgramOutcomeScore.objects.get(student=students[0], program_outcome=self.po1)
+        self.assertEqual(row.score, 86.0)
+
+        # Eşleme değişikliği herkesi eskitir
+        bump_outcome_graph_version()
+        self.assertEqual(stale_program_outcome_students(students), ids)
+
+    def test_deleted_grade_and_enrollment_mark_student_stale(self):
+        students = [self.make_student(i, midterm=50, final=80) for i in range(1, 3)]
+        refresh_stale_program_outcomes(students)
+
+        # Son notun silinmesi CourseGrade.updated_at'te iz bırakmaz
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseGrade.objects.filter(enrollment__student=students[0], component=self.final).get().delete()
+        self.assertEqual(refresh_stale_program_outcomes(students), [students[0].pk])
+        row = StudentProgramOutcomeScore.objects.get(student=students[0], program_outcome=self.po1)
+        self.assertEqual(row.score, compute_student_program_outcomes(students[0])[self.po1.id]["score"])
+        self.assertNotEqual(row.score, 71.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.get(student=students[1]).delete()
+        self.assertEqual(stale_program_outcome_students(students), [students[1].pk])
+        # Kaydı kalmayan öğrencinin eski vektörü silinir
+        refresh_stale_program_outcomes(students)
+        self.assertFalse(StudentProgramOutcomeScore.objects.filter(student=students[1]).exists())
+
+    def test_failed_write_keeps_obsolete_rows(self):
+        student = self.make_student(1, midterm=50, final=80)
+        refresh_stale_program_outcomes([student])
+        before = set(StudentProgramOutcomeScore.objects.values_list("program_outcome_id", "score"))
+
+        vector = {self.po1.id: {"score": 10.0, "coverage": 100.0}}
+        with patch.object(StudentProgramOutcomeScore.objects, "bulk_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                save_program_outcomes_for_students({student.pk: vector}, prune=True)
+
+        # Silme, yazma ile aynı transaction'da geri alınır
+        self.assertEqual(set(StudentProgramOutcomeScore.objects.values_list("program_outcome_id", "score")), before)
+
+
+class OutcomeRecomputeQueueTest(OutcomeFixtureMixin, TestCase):
+
+    def test_enqueue_deduplicates_pending_jobs(self):
+        student = self.make_student(1, midterm=50, final=80)
+
+        enqueue_program_outcome_recompute([student, student])
+        enqueue_program_outcome_recompute([student.id])
+
+        self.assertEqual(OutcomeRecomputeJob.objects.filter(student=student).count(), 1)
+
+    def test_process_queue_saves_scores_and_marks_done(self):
+        students = [self.make_student(i, midterm=50, final=80) for i in range(1, 4)]
+        enqueue_program_outcome_recompute(students)
+
+        processed = process_program_outcome_queue(batch_size=2)
+        self.assertEqual(processed, 2)
+        self.assertEqual(process_program_outcome_queue(batch_size=2), 1)
+        self.assertEqual(process_program_outcome_queue(batch_size=2), 0)
+
+        self.assertFalse(
+            OutcomeRecomputeJob.objects.exclude(status=OutcomeRecomputeJob.Status.DONE).exists()
+        )
+        self.assertEqual(StudentProgramOutcomeScore.objects.count(), 9)
+
+        # Tamamlanmış iş varken öğrenci tekrar kuyruğa alınabilir
+        enqueue_program_outcome_recompute(students[:1])
+        self.assertEqual(
+            OutcomeRecomputeJob.objects.filter(status=OutcomeRecomputeJob.Status.PENDING).count(), 1
+        )
+
+    def test_stale_running_jobs_are_reclaimed(self):
+        students = [self.make_student(i, midterm=50, final=80) for i in range(1, 4)]
+        old = timezone.now() - timedelta(hours=1)
+        running = OutcomeRecomputeJob.Status.RUNNING
+        # Çökmüş worker'ın işi, hâlâ süren iş ve yeniden kuyruğa alınmış öğrencinin eski işi
+        crashed = OutcomeRecomputeJob.objects.create(student=students[0], status=running, worker="x:1", started_at=old)
+        active = OutcomeRecomputeJob.objects.create(student=students[1], status=running, worker="x:2", started_at=timezone.now())
+        superseded = OutcomeRecomputeJob.objects.create(student=students[2], status=running, worker="x:1", started_at=old)
+        enqueue_program_outcome_recompute(students[2:])
+
+        self.assertEqual(process_program_outcome_queue(), 2)
+
+        statuses = dict(OutcomeRecomputeJob.objects.values_list("id", "status"))
+        self.assertEqual(statuses[crashed.id], OutcomeRecomputeJob.Status.DONE)
+        self.assertEqual(statuses[active.id], running)
+        self.assertEqual(statuses[superseded.id], OutcomeRecomputeJob.Status.FAILED)
+        self.assertEqual(
+            set(StudentProgramOutcomeScore.objects.values_list("student_id", flat=True)),
+            {students[0].id, students[2].id},
+        )
+
+
+class IncrementalProgramOutcomeTest(OutcomeFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Sadece PO3'e bağlı, diğer bileşenlerden bağımsız bir LO
+        self.quiz = CourseAssessmentComponent.objects.create(offering=self.offering, type="QUIZ", weight=0)
+        self.lo3 = LearningOutcome.objects.create(course=self.course, code="LO3", description="LO3")
+        ComponentLearningRelation.objects.create(component=self.quiz, learning_outcome=self.lo3, weight=100)
+        LearningProgramRelation.objects.create(learning_outcome=self.lo3, program_outcome=self.po3, weight=100)
+
+        self.students = [self.make_student(i, midterm=50, final=80) for i in range(1, 4)]
+        compute_and_save_program_outcomes_for_students(self.students)
+
+    def scores(self):
+        return {
+            (row.student_id, row.program_outcome_id): (row.score, row.coverage)
+            for row in StudentProgramOutcomeScore.objects.all()
+        }
+
+    def test_full_recompute_stores_lo_partials(self):
+        row = StudentLearningOutcomeScore.objects.get(student=self.students[0], learning_outcome=self.lo1)
+        self.assertEqual((row.score_sum, row.weight_sum), (62.0, 100.0))
+        self.assertFalse(StudentLearningOutcomeScore.objects.filter(learning_outcome=self.lo3).exists())
+
+    def test_delta_matches_full_recompute(self):
+        student = self.students[1]
+        enrollment = student.enrollments.get()
+        CourseGrade.objects.filter(enrollment=enrollment, component=self.midterm).update(score=90)
+        CourseGrade.objects.create(enrollment=enrollment, component=self.quiz, score=40)
+
+        written = apply_grade_changes([(enrollment.id, self.midterm.id), (enrollment.id, self.quiz.id)])
+        self.assertEqual(written, 3)
+        delta_scores = self.scores()
+
+        compute_and_save_program_outcomes_for_students(self.students)
+        self.assertEqual(delta_scores, self.scores())
+        self.assertEqual(delta_scores[(student.id, self.po3.id)], (40.0, 100.0))
+
+    def test_delta_only_touches_affected_outcomes(self):
+        enrollment = self.students[0].enrollments.get()
+        CourseGrade.objects.create(enrollment=enrollment, component=self.quiz, score=70)
+
+        written = apply_grade_changes([(enrollment.id, self.quiz.id)])
+
+        # Sadece LO3 -> PO3 etkilenir
+        self.assertEqual(written, 1)
+        self.assertEqual(
+            StudentLearningOutcomeScore.objects.get(student=self.students[0], learning_outcome=self.lo3).score,
+            70.0,
+        )
+
+    def test_change_queue_is_drained(self):
+        enrollment = self.students[2].enrollments.get()
+        CourseGrade.objects.filter(enrollment=enrollment, component=self.final).update(score=20)
+
+        record_grade_changes([(enrollment.id, self.final.id), (enrollment.id, self.final.id)])
+        record_grade_changes([(enrollment.id, self.final.id)])
+
+        self.assertEqual(process_grade_change_queue(), 2)
+        self.assertFalse(OutcomeGradeChange.objects.exists())
+        # LO1 = 50*.6 + 20*.4 = 38, LO2 = 20 → PO1 = 29
+        self.assertEqual(self.scores()[(self.students[2].id, self.po1.id)], (29.0, 100.0))
+
+
+class LearningOutcomeScoreTableTest(OutcomeFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.students = [
+            self.make_student(1, midterm=50, final=80),
+            self.make_student(2, midterm=70, final=40),
+        ]
+        compute_and_save_program_outcomes_for_students(self.students)
+
+    def test_student_learning_outcomes_read_from_table(self):
+        with self.assertNumQueries(1):
+            scores = compute_student_learning_outcomes(self.students[0])
+
+        self.assertEqual(scores, {self.lo1.id: 62.0, self.lo2.id: 80.0})
+
+    def test_learning_outcome_summary(self):
+        summary = {lo.code: (lo.avg_score, lo.student_count) for lo in learning_outcome_summary(self.course)}
+
+        # LO1: 62 ve 70*.6 + 40*.4 = 58
+        self.assertEqual(summary["LO1"], (60.0, 2))
+        self.assertEqual(summary["LO2"], (60.0, 2))
+
+    def test_grade_save_records_change_after_commit(self):
+        grade = CourseGrade.objects.get(enrollment__student=self.students[0], component=self.midterm)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            grade.score = 10
+            grade.save()
+
+        self.assertEqual(
+            list(OutcomeGradeChange.objects.values_list("enrollment_id", "component_id")),
+            [(grade.enrollment_id, self.midterm.id)],
+        )
+
+    def test_relation_change_enqueues_offering_students(self):
+        bump_outcome_graph_version()
+        version = OutcomeGraphVersion.objects.get().version
+
+        with patch("outcomes.services.enqueue_program_outcome_recompute",
+                   wraps=enqueue_program_outcome_recompute) as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                ComponentLearningRelation.objects.filter(component=self.midterm).update(weight=30)
+                for relation in ComponentLearningRelation.objects.all():
+                    relation.save()
+                for relation in LearningProgramRelation.objects.all():
+                    relation.save()
+
+        # Aynı transaction'daki tüm eşleme değişiklikleri tek artış ve tek kuyruğa almada toplanır
+        self.assertEqual(OutcomeGraphVersion.objects.get().version, version + 1)
+        self.assertEqual(enqueue.call_count, 1)
+        self.assertEqual(
+            set(OutcomeRecomputeJob.objects.values_list("student_id", flat=True)),
+            {student.id for student in self.students},
+        )
+        process_program_outcome_queue()
+        self.assertEqual(compute_student_learning_outcomes(self.students[0])[self.lo1.id], 47.0)
+
+
+class OutcomeGraphCacheTest(OutcomeFixtureMixin, TestCase):
+
+    def test_version_bump_invalidates_cache(self):
+        student = self.make_student(1, midterm=50, final=80)
+        compute_student_program_outcomes(student)
+
+        # Önbellekteki graf, sürüm artırılana kadar kullanılmaya devam eder
+        LearningProgramRelation.objects.filter(program_outcome=self.po1).update(weight=100)
+        self.assertEqual(compute_student_program_outcomes(student)[self.po1.id]["coverage"], 100.0)
+
+        bump_outcome_graph_version()
+        results = compute_student_program_outcomes(student)
+        self.assertEqual(results[self.po1.id]["coverage"], 200.0)
+
+    def test_lru_eviction(self):
+        cache = type(graph_cache)(maxsize=2)
+        cache.sync()
+        loads = []
+
+        def loader(keys):
+            loads.extend(keys)
+            return {key: key for key in keys}
+
+        cache.get_many(["a", "b"], loader)
+        cache.get_many(["a"], loader)      # a en son kullanılan olur
+        cache.get_many(["c"], loader)      # b atılır
+
+        self.assertEqual(len(cache), 2)
+        cache.get_many(["a", "b"], loader)
+        self.assertEqual(loads, ["a", "b", "c", "b"])
+
+
+class OutcomeCubeTest(OutcomeFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.students = [self.make_student(1, midterm=50, final=80), self.make_student(2, midterm=100, final=100)]
+
+    def test_cube_matches_student_scores_and_refreshes_incrementally(self):
+        self.assertEqual(refresh_outcome_cube(), (1, 2))  # PO1, PO2; PO3 eşlemesiz
+
+        vectors = compute_program_outcomes_for_students(self.students)
+        cell = ProgramOutcomeAttainment.objects.get(program_outcome=self.po1)
+        self.assertEqual((cell.student_count, cell.cohort_level), (2, 0))
+        self.assertAlmostEqual(cell.mean_score, sum(v[self.po1.id]["score"] for v in vectors.values()) / 2, places=2)
+
+        # Değişiklik yoksa hiçbir şube yeniden yazılmaz
+        self.assertEqual(refresh_outcome_cube(), (0, 0))
+
+        grade = CourseGrade.objects.get(enrollment__student=self.students[0], component=self.midterm)
+        grade.score = 100
+        grade.save()
+        self.assertEqual(refresh_outcome_cube(), (1, 2))
+        self.assertEqual(ProgramOutcomeAttainment.objects.get(program_outcome=self.po1).mean_score, 93.0)
+
+    def test_deleted_grades_and_empty_builds(self):
+        refresh_outcome_cube()
+
+        # Not silme CourseGrade.updated_at'te görünmez; şube damgası küpü eskitir
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseGrade.objects.filter(enrollment__student=self.students[1]).delete()
+        self.assertEqual(refresh_outcome_cube(), (1, 2))
+        self.assertEqual(ProgramOutcomeAttainment.objects.get(program_outcome=self.po1).student_count, 1)
+
+        # Notu ve eşlemesi olup hücre üretmeyen şube bir kez yazılır, sonra eskimiş sayılmaz
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.filter(student__in=self.students).update(status=Enrollment.Status.COMPLETED)
+            Enrollment.objects.get(student=self.students[0]).save()
+        self.assertEqual(refresh_outcome_cube(), (1, 0))
+        self.assertFalse(ProgramOutcomeAttainment.objects.exists())
+        self.assertEqual(refresh_outcome_cube(), (0, 0))
+
+    def test_drilldown_levels(self):
+        refresh_outcome_cube()
+
+        faculty = attainment_drilldown("faculty", {"faculty": str(self.faculty.id)})
+        self.assertEqual([row["program_outcome__code"] for row in faculty], [1, 2])
+        self.assertEqual(faculty[0]["student_count"], 2)
+
+        course = attainment_drilldown("course", {"course": self.course.id, "program_outcome": self.po1.id})
+        self.assertEqual([(row["year"], row["semester"]) for row in course], [(2025, "FALL")])
+
+        components = attainment_drilldown(
+            "component", {"course": self.course.id, "program_outcome": self.po1.id}
+        )
+        self.assertEqual(
+            [(row["type"], row["po_weight"], row["mean_score"]) for row in components],
+            [("FINAL", 70.0, 90.0), ("MIDTERM", 30.0, 75.0)],
+        )
+
+        # Başka bölümün öğrencisi aynı derste olsa da bölüm başkanının bileşen ortalamasına girmez
+        other = Department.objects.create(code="EEE", name="Elektrik", faculty=self.faculty)
+        outsider = self.make_student(3, midterm=0, final=0)
+        outsider.departments.set([other])
+        components = attainment_drilldown(
+            "component", {"course": self.course.id, "program_outcome": self.po1.id},
+            scope={"department_id": self.department.id},
+        )
+        self.assertEqual(
+            [(row["type"], row["mean_score"], row["student_count"]) for row in components],
+            [("FINAL", 90.0, 2), ("MIDTERM", 75.0, 2)],
+        )
+
+        # Yetki alanı dışındaki ders için bileşen listesi boş döner
+        self.assertEqual(
+            attainment_drilldown(
+                "component", {"course": self.course.id, "program_outcome": self.po1.id},
+                scope={"department__faculty_id": self.faculty.id + 1},
+            ),
+            [],
+        )
+        with self.assertRaises(CubeQueryError):
+            attainment_drilldown("department", {})
+
+    def test_component_drilldown_keeps_cohort_slice(self):
+        self.students[0].student_level = Level.objects.create(number=2, name="2. Sınıf")
+        self.students[0].save()
+        refresh_outcome_cube()
+
+        for level, student in [(2, self.students[0]), (0, self.students[1])]:
+            params = {"course": self.course.id, "program_outcome": self.po1.id, "cohort_level": level}
+            cell = ProgramOutcomeAttainment.objects.get(program_outcome=self.po1, cohort_level=level)
+            components = attainment_drilldown("component", params)
+            # Bileşen satırları sadece drill-down yapılan sınıfın öğrencilerini sayar
+            self.assertEqual({row["student_count"] for row in components}, {cell.student_count})
+            self.assertEqual(
+                {row["type"]: row["mean_score"] for row in components},
+                {
+                    g.component.type: float(g.score)
+                    for g in CourseGrade.objects.filter(enrollment__student=student).select_related("component")
+                },
+            )
+
+
+class OutcomeExportTest(OutcomeFixtureMixin, TestCase):
+
+    def test_po_matrix_streams_one_row_per_student(self):
+        scored = self.make_student(1, midterm=50, final=80)
+        self.make_student(2)
+        compute_and_save_program_outcomes_for_students([scored])
+
+        header, rows = department_po_matrix_export(self.department)
+        self.assertEqual(header, ["student_no", "ad_soyad", "PO1", "PO2", "PO3"])
+        self.assertEqual(list(rows), [["1", "ogr1", 71.0, 68.0, 0.0], ["2", "ogr2", None, None, None]])
+
+
+class OutcomeBenchmarkTest(TestCase):
+
+    def test_small_benchmark_run(self):
+        dataset = generate_dataset(
+            students=12, offerings=4, faculties=1, departments=2,
+            components_per_offering=2, courses_per_student=2,
+        )
+        self.assertEqual(dataset["sizes"]["enrollments"], 24)
+        self.assertEqual(CourseGrade.objects.count(), dataset["sizes"]["grades"])
+
+        report = run_benchmarks(dataset, repeat=2, sample_size=5)
+
+        names = [r["name"] for r in report["results"]]
+        self.assertIn("compute_student_program_outcomes", names)
+        self.assertIn("hod dashboard", names)
+        for result in report["results"]:
+            self.assertEqual(len(result["queries"]), result["repeat"])
+            self.assertGreater(result["queries"][0], 0)
 
-# Create your tests here.
+        rows = compare_reports(report, report)
+        self.assertEqual(len(rows), len(report["results"]))
+        self.assertTrue(all(row[3] == 0.0 for row in rows))
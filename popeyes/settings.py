@@ -58,10 +58,13 @@ INSTALLED_APPS = [
     "grades",
     "courses",
     'outcomes',
+    'monitoring',
     'widget_tweaks',
 ]
 
 MIDDLEWARE = [
+    # En dışta: diğer middleware'lerin (oturum, mesajlar) sorguları da sayılır
+    "monitoring.middleware.QueryCountMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -146,3 +149,34 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Outcome ağırlık grafiği önbelleğinde tutulacak en fazla şube/bölüm grafı sayısı
+OUTCOME_GRAPH_CACHE_SIZE = 256
+# Bu süreden (sn) uzun RUNNING kalan PO işleri çökmüş sayılıp kuyruğa geri alınır
+OUTCOME_JOB_TIMEOUT = 900
+
+# İstek başına sorgu sayısı / süre ölçümü (admin: /admin/query-stats/, komut: query_stats)
+QUERY_INSTRUMENTATION = False
+# View başına tutulacak son istek sayısı
+QUERY_INSTRUMENTATION_WINDOW = 500
+# Tek istekte bu kadar tekrarlanan sorgu kalıbı N+1 olarak işaretlenir
+QUERY_INSTRUMENTATION_REPEAT_THRESHOLD = 10
+# Worker'ların ölçümlerini paylaştığı dizin; None ise sadece süreç içinde tutulur
+QUERY_INSTRUMENTATION_DIR = BASE_DIR / "query_stats"
+QUERY_INSTRUMENTATION_FLUSH_EVERY = 50
+
+# Derlenmiş harf notu skalası ve şube → not sistemi eşlemesi süreç içinde tutulur;
+# diğer süreçlerdeki değişiklikler için LetterScaleVersion en fazla bu aralıkta (sn) okunur
+LETTER_SCALE_VERSION_CHECK = 5
+
+# Şube / ders not istatistiklerinin cache süresi (sn). Anahtar veritabanındaki
+# grade_stats_version'ı içerdiği için not değişince tüm süreçlerde hemen geçersiz olur;
+# süre sadece eski sürüm girdilerinin bellekten düşmesi içindir
+GRADE_STATISTICS_CACHE_TIMEOUT = 3600
+
+# Not değişikliklerinden sonra CourseStatistic / TeacherPerformance satırlarını
+# commit sonrası otomatik yenile (kapalıysa refresh_department_reports komutu kullanılır)
+HOD_REPORTS_AUTO_REFRESH = False
+
+# Bölüm başkanı paneli özet sayılarının cache süresi (sn); kayıt / not değişince hemen silinir
+HOD_STATISTICS_CACHE_TTL = 300
@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 from accounts.views import login_view, logout_view
+from monitoring.views import query_stats
 
 urlpatterns = [
+    path("admin/query-stats/", admin.site.admin_view(query_stats), name="query_stats"),
     path("admin/", admin.site.urls),
 
     path('', login_view, name='login'),
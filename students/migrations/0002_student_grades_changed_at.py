@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='grades_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
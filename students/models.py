@@ -32,6 +32,10 @@ class Student(models.Model):
         related_name="students"
     )
 
+    # Not silme / kayıt değişikliklerinin son zamanı (outcomes sinyalleriyle yazılır).
+    # Kaydedilen notlar CourseGrade.updated_at'te; silinen not orada iz bırakmaz.
+    grades_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     def __str__(self):
         return f"{self.user.get_full_name()} — {self.student_no}"
 
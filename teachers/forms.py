@@ -111,4 +111,17 @@ class LearningOutcomeForm(forms.ModelForm):
             'description': 'Öğrenme Çıktısı Açıklaması',
             'bloom_level': 'Bloom Seviyesi',
             'order': 'Sıralama',
-        }
\ No newline at end of file
+        }
+
+class GradeImportForm(forms.Form):
+    """CSV / XLSX toplu not aktarımı (student_no, component, score)"""
+    file = forms.FileField(
+        label="Not Dosyası (CSV / XLSX)",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'}),
+    )
+    dry_run = forms.BooleanField(
+        label="Önce fark raporunu göster (kaydetme)",
+        required=False,
+        initial=True,
+    )
+    skip_invalid = forms.BooleanField(label="Hatalı satırları atla", required=False)
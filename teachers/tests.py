@@ -1,3 +1,163 @@
-from django.test import TestCase
+import json
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from accounts.models import SimpleUser
+from academics.models import Level
+from courses.models import Course, CourseOffering, CourseAssessmentComponent, CourseGrade, Enrollment
+from departments.models import Department, Faculty
+from outcomes.models import OutcomeGradeChange
+from students.models import Student
+from .models import Teacher
+
+
+class ManageGradesViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        faculty = Faculty.objects.create(full_name="Mühendislik")
+        department = Department.objects.create(code="CSE", name="Bilgisayar", faculty=faculty)
+        level = Level.objects.create(number=1, name="1. Sınıf")
+
+        user = SimpleUser.objects.create(username="hoca", password="123", role="TEACHER")
+        self.teacher = Teacher.objects.create(user=user, department=department)
+
+        course = Course.objects.create(code="CSE101", name="Programlama", level=level, course_type="DEPARTMENT")
+        self.offering = CourseOffering.objects.create(course=course, year=2025, semester="FALL")
+        self.offering.instructors.add(self.teacher)
+        self.midterm = CourseAssessmentComponent.objects.create(offering=self.offering, type="MIDTERM", weight=40)
+
+        self.enrollments = []
+        for i in range(2):
+            s_user = SimpleUser.objects.create(username=f"ogr{i}", password="123", role="STUDENT")
+            student = Student.objects.create(user=s_user, student_no=str(i))
+            self.enrollments.append(Enrollment.objects.create(student=student, offering=self.offering))
+
+        session = self.client.session
+        session["role"] = "TEACHER"
+        session["username"] = "hoca"
+        session.save()
+
+    def test_grid_save_records_only_changed_cells(self):
+        e1, e2 = self.enrollments
+        CourseGrade.objects.create(enrollment=e1, component=self.midterm, score=55)
+
+        url = reverse("teachers:grade_grid_save", args=[self.offering.id])
+        response = self.client.post(url, data=json.dumps({"cells": [
+            {"enrollment": e1.id, "component": self.midterm.id, "score": "55"},
+            {"enrollment": e2.id, "component": self.midterm.id, "score": "72.5"},
+        ]}), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CourseGrade.objects.get(enrollment=e2).score, 72.5)
+        self.assertEqual(CourseGrade.objects.count(), 2)
+
+        # Sadece değişen hücre kaydedilir
+        changes = list(OutcomeGradeChange.objects.values_list("enrollment_id", "component_id"))
+        self.assertEqual(changes, [(e2.id, self.midterm.id)])
+
+    def test_grades_page_is_read_only(self):
+        url = reverse("teachers:manage_grades", args=[self.offering.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        # Notlar sadece JSON grid ucundan yazılır
+        response = self.client.post(url, {f"grade_{self.enrollments[0].id}_{self.midterm.id}": "55"})
+        self.assertEqual(response.status_code, 405)
+        self.assertFalse(CourseGrade.objects.exists())
+
+    def test_import_upload_shows_diff_then_writes(self):
+        url = reverse("teachers:import_grades", args=[self.offering.id])
+        content = b"student_no,component,score\n0,MIDTERM,65\n1,MIDTERM,80\n"
+
+        response = self.client.post(url, {
+            "file": SimpleUploadedFile("notlar.csv", content), "dry_run": "on",
+        })
+        self.assertContains(response, "Fark Raporu")
+        self.assertEqual(CourseGrade.objects.count(), 0)
+
+        response = self.client.post(url, {"file": SimpleUploadedFile("notlar.csv", content)})
+        self.assertContains(response, "Aktarım Sonucu")
+        self.assertEqual(CourseGrade.objects.count(), 2)
+        self.assertEqual(OutcomeGradeChange.objects.count(), 2)
+
+    def test_export_streams_grade_grid_csv(self):
+        e1, _ = self.enrollments
+        CourseGrade.objects.create(enrollment=e1, component=self.midterm, score=55)
+
+        response = self.client.get(reverse("teachers:export_grades", args=[self.offering.id]))
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(content, [
+            "student_no,ad_soyad,Vize,ağırlıklı_toplam,tamamlanma",
+            "0,ogr0,55.00,22.00,100.00",
+            "1,ogr1,,,0.00",
+        ])
+
+    def test_grid_api_pages_by_enrollment_id(self):
+        e1, e2 = self.enrollments
+        CourseGrade.objects.create(enrollment=e1, component=self.midterm, score=55)
+        url = reverse("teachers:grade_grid_api", args=[self.offering.id])
+
+        first = self.client.get(url, {"limit": 1}).json()
+        self.assertEqual([r["enrollment"] for r in first["rows"]], [e1.id])
+        self.assertEqual(first["rows"][0]["scores"], {str(self.midterm.id): "55.00"})
+        self.assertEqual(first["next"], e1.id)
+
+        # Sayfa başına sabit sorgu: oturum + şube + sayfa id'leri + satırlar + notlar + risk
+        with self.assertNumQueries(6):
+            second = self.client.get(url, {"after": first["next"], "limit": 1}).json()
+        self.assertEqual([r["enrollment"] for r in second["rows"]], [e2.id])
+        self.assertIsNone(second["next"])
+
+    def test_grid_save_writes_only_posted_cells(self):
+        e1, e2 = self.enrollments
+        url = reverse("teachers:grade_grid_save", args=[self.offering.id])
+        response = self.client.post(url, data=json.dumps({"cells": [
+            {"enrollment": e2.id, "component": self.midterm.id, "score": "40"},
+            {"enrollment": e1.id, "component": self.midterm.id, "score": "150"},
+            {"enrollment": 999, "component": self.midterm.id, "score": "10"},
+        ]}), content_type="application/json")
+
+        data = response.json()
+        self.assertEqual(data["saved"], 1)
+        self.assertEqual([e["index"] for e in data["errors"]], [1, 2])
+        self.assertEqual(data["rows"][0]["weighted_total"], "16.00")
+        self.assertEqual(list(CourseGrade.objects.values_list("enrollment_id", "score")), [(e2.id, 40)])
+        self.assertEqual(OutcomeGradeChange.objects.count(), 1)
+
+        session = self.client.session
+        session["role"] = "STUDENT"
+        session.save()
+        self.assertEqual(self.client.get(reverse("teachers:grade_grid_api", args=[self.offering.id])).status_code, 403)
+
+    def test_grid_save_reports_malformed_cells_at_their_index(self):
+        e1, e2 = self.enrollments
+        url = reverse("teachers:grade_grid_save", args=[self.offering.id])
+        response = self.client.post(url, data=json.dumps({"cells": [
+            "55",
+            {"enrollment": e1.id, "component": self.midterm.id, "score": "NaN"},
+            {"enrollment": [e1.id], "component": self.midterm.id, "score": "10"},
+            {"enrollment": e1.id, "component": {"id": 1}, "score": "10"},
+            {"enrollment": True, "component": self.midterm.id, "score": "10"},
+            {"enrollment": e2.id, "component": self.midterm.id, "score": "Infinity"},
+            {"enrollment": e2.id, "component": self.midterm.id, "score": 45},
+        ]}), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["saved"], 1)
+        self.assertEqual(
+            [(e["index"], e["error"]) for e in data["errors"]],
+            [
+                (0, "Hücre bir nesne olmalı."),
+                (1, "Puan 0-100 arasında olmalı: NaN"),
+                (2, "Kayıt bu şubede değil."),
+                (3, "Bileşen bu şubede değil."),
+                (4, "Kayıt bu şubede değil."),
+                (5, "Puan 0-100 arasında olmalı: Infinity"),
+            ],
+        )
+        self.assertEqual(list(CourseGrade.objects.values_list("enrollment_id", "score")), [(e2.id, 45)])
 
-# Create your tests here.
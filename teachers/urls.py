@@ -25,6 +25,10 @@ urlpatterns = [
     path('courses/<int:offering_id>/components/', views.manage_components, name='manage_components'),
     path("courses/<int:offering_id>/learning-outcomes/", views.manage_learning_outcomes, name="manage_learning_outcomes"),
     path('courses/<int:offering_id>/grades/', views.manage_grades, name='manage_grades'),
+    path('courses/<int:offering_id>/grades/api/rows/', views.grade_grid_api, name='grade_grid_api'),
+    path('courses/<int:offering_id>/grades/api/save/', views.grade_grid_save, name='grade_grid_save'),
+    path('courses/<int:offering_id>/grades/import/', views.import_grades_view, name='import_grades'),
+    path('courses/<int:offering_id>/grades/export/', views.export_grades, name='export_grades'),
 
 
 
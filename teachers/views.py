@@ -1,8 +1,12 @@
+import json
+
 from django.contrib import messages
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET, require_POST
 from django.shortcuts import render, get_object_or_404, redirect
 from accounts.models import SimpleUser
-from django.db import models
-from grades.models import Grade, GradeComponent   
+from django.db import models, transaction
+from grades.models import Grade
 from courses.models import (
     Course,
     CourseAssessmentComponent,
@@ -20,12 +24,24 @@ from .forms import (
     TeacherProfileForm,
     TeacherScheduleForm,
     OfficeHourForm,
-    TeacherContactInfoForm
+    TeacherContactInfoForm,
+    GradeImportForm,
 )
 from django.db.models import Prefetch
+from courses.exports import export_response, grade_grid_export
+from courses.grade_import import GradeImportError, detect_format, import_grades
+from courses.services import (
+    GRID_MAX_CELLS,
+    GRID_PAGE_SIZE,
+    grade_grid_page,
+    grade_grid_rows,
+    save_grade_cells,
+)
 from outcomes.services import (
     compute_student_learning_outcomes,
-    compute_student_program_outcomes, compute_and_save_student_program_outcomes
+    compute_student_program_outcomes, compute_and_save_student_program_outcomes,
+    record_grade_changes,
+    learning_outcome_summary,
 )
 
 
@@ -356,76 +372,79 @@ def manage_components(request, offering_id):
     program_outcomes = ProgramOutcome.objects.all()
 
     if request.method == "POST":
-        types = request.POST.getlist("type[]")
-        weights = request.POST.getlist("weight[]")
-
-        existing_components = set(components.values_list("id", flat=True))
-        used_components = set()
-        total_component_weight = 0
-
-        # ===========================================
-        # 1️⃣ Component ve %LO kayıtları
-        # ===========================================
-        count = max(len(types), len(weights))
-        for i in range(count):
-            t = types[i] if i < len(types) else ""
-            w = weights[i] if i < len(weights) else ""
-
-            if not t or not w:
-                continue
-
-            total_component_weight += int(w)
-            comp_id = request.POST.get(f"component_id_{i}")
-
-            if comp_id:
-                comp, _ = CourseAssessmentComponent.objects.update_or_create(
-                    id=comp_id,
-                    defaults={"course": course, "type": t, "weight": w},
-                )
-            else:
-                comp = CourseAssessmentComponent.objects.create(
-                    offering=offering, type=t, weight=w
-                )
-            used_components.add(comp.id)
-
-            # Mevcut LO ilişkilerini sil ve yeniden ekle
-            ComponentLearningRelation.objects.filter(component=comp).delete()
-            lo_ids = request.POST.getlist(f"relation_lo_{i}[]")
-            lo_ws = request.POST.getlist(f"relation_lw_{i}[]")
-
-            for lo_id, lw in zip(lo_ids, lo_ws):
-                if lo_id:
-                    ComponentLearningRelation.objects.create(
-                        component=comp,
-                        learning_outcome_id=int(lo_id),
-                        weight=float(lw or 0.0),
+        # Tüm eşleme değişiklikleri tek transaction'da yazılır; graf sürümü ve
+        # PO kuyruğu commit sonrası bir kez güncellenir (bkz. schedule_outcome_graph_change)
+        with transaction.atomic():
+            types = request.POST.getlist("type[]")
+            weights = request.POST.getlist("weight[]")
+
+            existing_components = set(components.values_list("id", flat=True))
+            used_components = set()
+            total_component_weight = 0
+
+            # ===========================================
+            # 1️⃣ Component ve %LO kayıtları
+            # ===========================================
+            count = max(len(types), len(weights))
+            for i in range(count):
+                t = types[i] if i < len(types) else ""
+                w = weights[i] if i < len(weights) else ""
+
+                if not t or not w:
+                    continue
+
+                total_component_weight += int(w)
+                comp_id = request.POST.get(f"component_id_{i}")
+
+                if comp_id:
+                    comp, _ = CourseAssessmentComponent.objects.update_or_create(
+                        id=comp_id,
+                        defaults={"course": course, "type": t, "weight": w},
                     )
-
-        CourseAssessmentComponent.objects.filter(offering=offering).exclude(id__in=used_components).delete()
-
-        # ===========================================
-        # 2️⃣ Program Output (LO → PO)
-        # ===========================================
-        map_los = request.POST.getlist("po_map_lo[]")
-        map_ws = request.POST.getlist("po_map_w[]")
-        map_pos = request.POST.getlist("po_map_po[]")
-
-        LearningProgramRelation.objects.filter(learning_outcome__course=course).delete()
-
-        seen = set()
-        for lo_id, w, po_id in zip(map_los, map_ws, map_pos):
-            if not lo_id or not po_id:
-                continue
-            key = (lo_id, po_id)
-            if key in seen:
-                continue
-            seen.add(key)
-
-            LearningProgramRelation.objects.get_or_create(
-                learning_outcome_id=int(lo_id),
-                program_outcome_id=int(po_id),
-                defaults={"weight": float(w or 0.0)}
-            )
+                else:
+                    comp = CourseAssessmentComponent.objects.create(
+                        offering=offering, type=t, weight=w
+                    )
+                used_components.add(comp.id)
+
+                # Mevcut LO ilişkilerini sil ve yeniden ekle
+                ComponentLearningRelation.objects.filter(component=comp).delete()
+                lo_ids = request.POST.getlist(f"relation_lo_{i}[]")
+                lo_ws = request.POST.getlist(f"relation_lw_{i}[]")
+
+                for lo_id, lw in zip(lo_ids, lo_ws):
+                    if lo_id:
+                        ComponentLearningRelation.objects.create(
+                            component=comp,
+                            learning_outcome_id=int(lo_id),
+                            weight=float(lw or 0.0),
+                        )
+
+            CourseAssessmentComponent.objects.filter(offering=offering).exclude(id__in=used_components).delete()
+
+            # ===========================================
+            # 2️⃣ Program Output (LO → PO)
+            # ===========================================
+            map_los = request.POST.getlist("po_map_lo[]")
+            map_ws = request.POST.getlist("po_map_w[]")
+            map_pos = request.POST.getlist("po_map_po[]")
+
+            LearningProgramRelation.objects.filter(learning_outcome__course=course).delete()
+
+            seen = set()
+            for lo_id, w, po_id in zip(map_los, map_ws, map_pos):
+                if not lo_id or not po_id:
+                    continue
+                key = (lo_id, po_id)
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                LearningProgramRelation.objects.get_or_create(
+                    learning_outcome_id=int(lo_id),
+                    program_outcome_id=int(po_id),
+                    defaults={"weight": float(w or 0.0)}
+                )
 
         # ===========================================
         # Uyarı / başarı mesajı
@@ -473,8 +492,8 @@ def manage_learning_outcomes(request, offering_id):
 
     course = offering.course
 
-    # ✅ DOĞRU SORGU
-    outcomes = LearningOutcome.objects.filter(course=offering.course)
+    # ✅ DOĞRU SORGU — ortalama skorlar materialize LO tablosundan
+    outcomes = learning_outcome_summary(offering.course)
 
     if request.method == "POST":
         code = request.POST.get("code")
@@ -497,6 +516,7 @@ def manage_learning_outcomes(request, offering_id):
         "outcomes": outcomes,
     })
 
+@require_GET
 def manage_grades(request, offering_id):
     if request.session.get("role") != "TEACHER":
         return redirect("login")
@@ -524,43 +544,132 @@ def manage_grades(request, offering_id):
         offering=offering
     ).order_by("type")
 
-    enrollments = Enrollment.objects.filter(
-        offering=offering,
-        status=Enrollment.Status.ENROLLED
-    ).select_related("student")
+    # Satırlar sayfa açıldıktan sonra grade_grid_api ile parça parça yüklenir;
+    # not yazma yolu sadece grade_grid_save (JSON)
+    return render(request, "teachers/manage_grades.html", {
+        "course": course,
+        "offering": offering,
+        "components": components,
+        "page_size": GRID_PAGE_SIZE,
+    })
 
-    if request.method == "POST":
-        for enrollment in enrollments:
-            for comp in components:
-                field_name = f"grade_{enrollment.id}_{comp.id}"
-                score = request.POST.get(field_name)
-
-                if score is not None and score.strip() != "":
-                    score = float(score)
-                    grade, _ = CourseGrade.objects.get_or_create(
-                        enrollment=enrollment,
-                        component=comp
-                    )
-                    grade.score = score
-                    grade.save()
 
-        for enrollment in enrollments:
-            compute_and_save_student_program_outcomes(enrollment.student)
+def _grid_offering(request, offering_id):
+    """JSON uçları için öğretmenin aktif şubesi; yetki yoksa None"""
+    if request.session.get("role") != "TEACHER":
+        return None
+    return CourseOffering.objects.filter(
+        id=offering_id,
+        instructors__user__username=request.session.get("username"),
+        is_active=True,
+    ).first()
+
+
+def grade_grid_api(request, offering_id):
+    """GET ?after=<enrollment_id>&limit=50 — not tablosunun bir sayfası"""
+    offering = _grid_offering(request, offering_id)
+    if offering is None:
+        return JsonResponse({"error": "Yetkisiz."}, status=403)
+
+    try:
+        after = int(request.GET["after"]) if request.GET.get("after") else None
+        limit = int(request.GET.get("limit", GRID_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": "Geçersiz sayfa parametresi."}, status=400)
+
+    return JsonResponse(grade_grid_page(offering, after=after, limit=limit))
+
+
+@require_POST
+def grade_grid_save(request, offering_id):
+    """POST {"cells": [{"enrollment", "component", "score"}]} — sadece değişen hücreler"""
+    offering = _grid_offering(request, offering_id)
+    if offering is None:
+        return JsonResponse({"error": "Yetkisiz."}, status=403)
+
+    try:
+        cells = json.loads(request.body)["cells"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Geçersiz istek gövdesi."}, status=400)
+    if not isinstance(cells, list) or len(cells) > GRID_MAX_CELLS:
+        return JsonResponse({"error": f"En fazla {GRID_MAX_CELLS} hücre gönderilebilir."}, status=400)
+
+    result = save_grade_cells(offering, cells)
+    changed = result["diff"]["create"] + result["diff"]["update"]
+    record_grade_changes((g.enrollment_id, g.component_id) for g in changed)
+
+    return JsonResponse({
+        "saved": len(changed),
+        "errors": result["errors"],
+        # Toplam / tamamlanma / risk bilgisi değişen satırlar
+        "rows": grade_grid_rows(offering, {g.enrollment_id for g in changed}),
+    })
+
 
-        messages.success(request, "Notlar kaydedildi ve Outcome skorları güncellendi ✅")
+def import_grades_view(request, offering_id):
+    """manage_grades'in toplu karşılığı: CSV / XLSX yükleme, önce fark raporu"""
+    if request.session.get("role") != "TEACHER":
+        return redirect("login")
 
-    grades = CourseGrade.objects.filter(
-        enrollment__offering=offering
+    username = request.session.get("username")
+    user = SimpleUser.objects.filter(username=username).first()
+    teacher = Teacher.objects.filter(user=user).first()
+
+    if not teacher:
+        messages.error(request, "Öğretmen profili bulunamadı.")
+        return redirect("login")
+
+    offering = get_object_or_404(
+        CourseOffering,
+        id=offering_id,
+        instructors=teacher,
+        is_active=True
     )
 
-    grade_map = {
-        (int(g.enrollment_id), int(g.component_id)): float(g.score)
-        for g in grades
-    }
+    report = None
+    form = GradeImportForm(request.POST or None, request.FILES or None)
+    if request.method == "POST" and form.is_valid():
+        upload = form.cleaned_data["file"]
+        try:
+            report = import_grades(
+                offering,
+                upload.file,
+                detect_format(upload.name),
+                dry_run=form.cleaned_data["dry_run"],
+                skip_invalid=form.cleaned_data["skip_invalid"],
+            )
+        except GradeImportError as exc:
+            messages.error(request, str(exc))
+        else:
+            if report["written"]:
+                messages.success(
+                    request,
+                    f"{report['created'] + report['updated']} not aktarıldı, "
+                    "Outcome skorları arka planda güncelleniyor ✅",
+                )
+            elif report["error_count"] and not form.cleaned_data["skip_invalid"]:
+                messages.error(request, "Hatalı satırlar var, hiçbir not kaydedilmedi.")
 
-    return render(request, "teachers/manage_grades.html", {
-        "course": course,
-        "components": components,
-        "enrollments": enrollments,
-        "grades": grade_map,
+    return render(request, "teachers/import_grades.html", {
+        "course": offering.course,
+        "offering": offering,
+        "form": form,
+        "report": report,
     })
+
+
+def export_grades(request, offering_id):
+    """Şubenin not tablosu (kayıt × bileşen) — ?format=csv|xlsx"""
+    if request.session.get("role") != "TEACHER":
+        return redirect("login")
+
+    offering = get_object_or_404(
+        CourseOffering,
+        id=offering_id,
+        instructors__user__username=request.session.get("username"),
+    )
+
+    header, rows = grade_grid_export(offering)
+    filename = f"{offering.course.code}_{offering.year}_{offering.semester}_notlar"
+    return export_response(request.GET.get("format", "csv"), filename, header, rows)
+